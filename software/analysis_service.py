@@ -0,0 +1,459 @@
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import cv2
+import numpy as np
+
+from software.analyze_microplastics import analyze_image, analyze_microplastics, measure_image
+from software.image_decode import decode_image
+from software.result_cache import ResultCache
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Uploads larger than this are refused (a full-resolution JPEG is a few MB)
+MAX_UPLOAD_BYTES = 64 * 1024 * 1024
+
+# Request parameters forwarded to the analysis, all integers
+ANALYSIS_PARAMETERS = ("min_area", "max_area", "low_thresh", "high_thresh")
+
+# Set in each worker process by _init_worker
+_worker_cache = None
+
+
+class ServiceBusy(Exception):
+    """Raised when the service already has max_pending images waiting or in analysis."""
+
+
+def _init_worker(cache_dir):
+    """
+    Worker process initializer: open the shared result cache and run one tiny analysis,
+    so OpenCV, the segmentation LUTs and the morphology kernels are loaded before the
+    first real request arrives.
+    """
+    global _worker_cache
+    _worker_cache = ResultCache(cache_dir) if cache_dir else None
+    measure_image(np.zeros((8, 8, 3), dtype=np.uint8))
+
+
+def _warm():
+    """No-op task used to make the pool start all of its worker processes."""
+    return True
+
+
+def _analyze_path(image_path, params):
+    """Worker entry point: analyze an image file on the service's disk."""
+    return analyze_microplastics(image_path, cache=_worker_cache, **params)
+
+
+def _analyze_bytes(data, params):
+    """Worker entry point: analyze an uploaded, encoded image."""
+    return analyze_image(decode_image(data), **params)
+
+
+def parse_parameters(values):
+    """
+    Pick the analysis parameters out of a query string or JSON body.
+
+    Args:
+        values (dict): Parameter name → value (query-string lists are accepted).
+
+    Returns:
+        dict: Integer values for the ANALYSIS_PARAMETERS present.
+
+    Raises:
+        ValueError: If a parameter isn't an integer
+    """
+    params = {}
+    for name in ANALYSIS_PARAMETERS:
+        if name not in values:
+            continue
+        value = values[name]
+        if isinstance(value, list):
+            value = value[-1]
+        try:
+            params[name] = int(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{name} must be an integer")
+    return params
+
+
+class AnalysisService:
+    """
+    A pool of pre-warmed analysis worker processes shared by concurrent requests.
+
+    Workers are started and warmed up when the service is created, so no request pays
+    interpreter start-up, imports or LUT construction. Requests are handed straight to
+    the pool; once `max_pending` images are waiting or being analyzed, new work is
+    refused with ServiceBusy instead of queueing without bound.
+
+    If a worker process dies, the pool is broken and every task on it fails with
+    BrokenProcessPool. The service then shuts the pool down and starts a new one; while
+    that isn't possible, `healthy` is False and requests fail instead of hanging.
+
+    Example:
+        with AnalysisService(workers=4) as service:
+            count, category = service.analyze_path("captures/sample.jpg")
+    """
+
+    def __init__(self, workers=None, max_pending=64, cache_dir=None):
+        """
+        Args:
+            workers (int | None): Worker processes (None = one per CPU core).
+            max_pending (int): Images allowed to be queued or in analysis at once.
+            cache_dir (str | None): Share a ResultCache in this directory between workers
+                (used for path requests; uploads are always analyzed).
+
+        Raises:
+            ValueError: If workers or max_pending is less than 1
+        """
+        if workers is not None and workers < 1:
+            raise ValueError("workers must be at least 1")
+        if max_pending < 1:
+            raise ValueError("max_pending must be at least 1")
+        self.max_pending = max_pending
+        self.workers = workers or os.cpu_count() or 1
+        self.cache_dir = cache_dir
+        self._lock = threading.Lock()
+        self._restart_lock = threading.Lock()
+        self._pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._busy_s = 0.0
+        self.restarts = 0
+        self.started_at = time.time()
+        self._pool = self._start_pool()
+        self.healthy = True
+
+    def _start_pool(self):
+        """Start a pool and wait until every worker process is up and warmed."""
+        pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker, initargs=(self.cache_dir,))
+        try:
+            # One task per worker starts every process (each runs the initializer once)
+            for future in wait([pool.submit(_warm) for _ in range(self.workers)]).done:
+                future.result()
+        except BaseException:
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+        return pool
+
+    def _restart_pool(self, broken):
+        """
+        Replace a broken pool with a new one (once, however many requests noticed it).
+
+        Raises:
+            BrokenProcessPool: If the new pool can't be started either
+        """
+        with self._restart_lock:
+            if self._pool is not broken and self.healthy:
+                return
+            broken.shutdown(wait=False, cancel_futures=True)
+            try:
+                self._pool = self._start_pool()
+            except Exception as exc:
+                self.healthy = False
+                raise BrokenProcessPool(f"Analysis workers could not be restarted: {exc}") from exc
+            self.healthy = True
+            self.restarts += 1
+
+    def check(self):
+        """
+        Whether the workers can take tasks, restarting a pool whose worker has died.
+
+        Returns:
+            bool: The same as `healthy` afterwards.
+        """
+        pool = self._pool
+        try:
+            if self.healthy:
+                # Submitting to a broken pool fails straight away; the no-op itself is cheap
+                pool.submit(_warm)
+                return True
+            self._restart_pool(pool)
+        except BrokenProcessPool:
+            try:
+                self._restart_pool(pool)
+            except BrokenProcessPool:
+                pass
+        return self.healthy
+
+    def _release(self, images, failed=0):
+        with self._lock:
+            self._pending -= images
+            self.failed += failed
+
+    def _reserve(self, images):
+        with self._lock:
+            if self._pending + images > self.max_pending:
+                self.rejected += images
+                raise ServiceBusy(f"{self._pending} images already pending (limit {self.max_pending})")
+            self._pending += images
+
+    def _submit(self, function, argument, params):
+        """Submit one reserved image; the reservation is released when it finishes or can't start."""
+        started = time.perf_counter()
+        pool = self._pool
+        try:
+            if not self.healthy:
+                self._restart_pool(pool)
+                pool = self._pool
+            try:
+                future = pool.submit(function, argument, params)
+            except BrokenProcessPool:
+                # A worker died since the last task; retry once on a fresh pool
+                self._restart_pool(pool)
+                future = self._pool.submit(function, argument, params)
+        except BaseException:
+            # Without a future, no done callback would ever release the reservation
+            self._release(1, failed=1)
+            raise
+
+        def done(future):
+            with self._lock:
+                self._pending -= 1
+                self._busy_s += time.perf_counter() - started
+                if future.exception() is None:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+
+        future.add_done_callback(done)
+        return future
+
+    def analyze_path(self, image_path, **params):
+        """
+        Analyze an image file.
+
+        Returns:
+            tuple[int, str]: (count, category)
+
+        Raises:
+            ServiceBusy: If max_pending images are already pending
+            FileNotFoundError, ValueError: As for analyze_microplastics
+        """
+        self._reserve(1)
+        return self._submit(_analyze_path, str(image_path), params).result()
+
+    def analyze_bytes(self, data, **params):
+        """
+        Analyze an encoded image (e.g. the bytes of a JPEG upload).
+
+        Returns:
+            tuple[int, str]: (count, category)
+
+        Raises:
+            ServiceBusy: If max_pending images are already pending
+            ValueError: If the data can't be decoded or parameters are invalid
+        """
+        self._reserve(1)
+        return self._submit(_analyze_bytes, bytes(data), params).result()
+
+    def analyze_paths(self, image_paths, **params):
+        """
+        Analyze several image files at once, spread over the workers.
+
+        Returns:
+            list[dict]: One row per path, in input order, with image_path, count,
+            category and error (set instead of raising when one image fails).
+
+        Raises:
+            ServiceBusy: If the batch doesn't fit under max_pending
+        """
+        image_paths = [str(path) for path in image_paths]
+        self._reserve(len(image_paths))
+        futures = []
+        try:
+            for path in image_paths:
+                futures.append(self._submit(_analyze_path, path, params))
+        except BaseException:
+            # The images that were never submitted still hold their reservations
+            self._release(len(image_paths) - len(futures) - 1)
+            raise
+        rows = []
+        for path, future in zip(image_paths, futures):
+            row = {"image_path": path, "count": None, "category": None, "error": None}
+            try:
+                row["count"], row["category"] = future.result()
+            except (FileNotFoundError, ValueError, cv2.error) as exc:
+                row["error"] = str(exc)
+            rows.append(row)
+        return rows
+
+    def metrics(self):
+        """Queue depth and throughput counters."""
+        with self._lock:
+            pending = self._pending
+            finished = self.completed + self.failed
+            return {
+                "workers": self.workers,
+                "pending": pending,
+                # Images waiting for a free worker (the rest are being analyzed)
+                "queue_depth": max(0, pending - self.workers),
+                "max_pending": self.max_pending,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "restarts": self.restarts,
+                "mean_latency_s": round(self._busy_s / finished, 4) if finished else None,
+                "uptime_s": round(time.time() - self.started_at, 1),
+            }
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class AnalysisRequestHandler(BaseHTTPRequestHandler):
+    """
+    HTTP front end of an AnalysisService (the server's `service` attribute).
+
+    GET  /health         → {"status": "ok", "workers": N}, or status 503 with
+                           {"status": "unhealthy", ...} when the workers are down and
+                           can't be restarted
+    GET  /metrics        → AnalysisService.metrics()
+    POST /analyze        → {"count", "category", "elapsed_s"}. The body is either the
+                           encoded image (any non-JSON content type, parameters in the
+                           query string) or JSON {"image_path": ..., "min_area": ...}.
+    POST /analyze/batch  → {"results": [...]} for JSON {"image_paths": [...], ...}
+
+    Errors are returned as {"error": message} with status 400 (bad input), 404 (missing
+    file), 413 (upload too large), 503 (service busy) or 500 (anything else, e.g. an
+    OpenCV error or a crashed worker process).
+    """
+
+    server_version = "MicroplasticAnalysis/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if getattr(self.server, "verbose", True):
+            super().log_message(format, *args)
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_UPLOAD_BYTES:
+            raise OverflowError(f"Request body exceeds {MAX_UPLOAD_BYTES} bytes")
+        return self.rfile.read(length)
+
+    def do_GET(self):
+        service = self.server.service
+        path = urlsplit(self.path).path
+        if path == "/health":
+            if service.check():
+                self._send_json(HTTPStatus.OK, {"status": "ok", "workers": service.workers})
+            else:
+                self._send_json(
+                    HTTPStatus.SERVICE_UNAVAILABLE,
+                    {"status": "unhealthy", "workers": service.workers, "error": "Analysis workers are down"},
+                )
+        elif path == "/metrics":
+            self._send_json(HTTPStatus.OK, service.metrics())
+        else:
+            self._send_json(HTTPStatus.NOT_FOUND, {"error": f"Unknown endpoint: {path}"})
+
+    def do_POST(self):
+        service = self.server.service
+        url = urlsplit(self.path)
+        started = time.perf_counter()
+        try:
+            body = self._read_body()
+            is_json = self.headers.get("Content-Type", "").startswith("application/json")
+            request = json.loads(body or b"{}") if is_json else {}
+            if not isinstance(request, dict):
+                raise ValueError("JSON body must be an object")
+            params = parse_parameters({**parse_qs(url.query), **request})
+
+            if url.path == "/analyze":
+                if is_json:
+                    if "image_path" not in request:
+                        raise ValueError("JSON requests need an image_path")
+                    count, category = service.analyze_path(request["image_path"], **params)
+                else:
+                    count, category = service.analyze_bytes(body, **params)
+                payload = {"count": count, "category": category}
+            elif url.path == "/analyze/batch":
+                image_paths = request.get("image_paths")
+                if not isinstance(image_paths, list):
+                    raise ValueError("Batch requests need a JSON list of image_paths")
+                payload = {"results": service.analyze_paths(image_paths, **params)}
+            else:
+                self._send_json(HTTPStatus.NOT_FOUND, {"error": f"Unknown endpoint: {url.path}"})
+                return
+        except ServiceBusy as exc:
+            self._send_json(HTTPStatus.SERVICE_UNAVAILABLE, {"error": str(exc)})
+        except FileNotFoundError as exc:
+            self._send_json(HTTPStatus.NOT_FOUND, {"error": str(exc)})
+        except OverflowError as exc:
+            # The unread body would corrupt the next request on this connection
+            self.close_connection = True
+            self._send_json(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"error": str(exc)})
+        except ValueError as exc:
+            # Also covers malformed JSON (json.JSONDecodeError is a ValueError)
+            self._send_json(HTTPStatus.BAD_REQUEST, {"error": str(exc)})
+        except Exception as exc:
+            # Every request gets an answer, even when a worker fails unexpectedly
+            self.log_error("Analysis failed: %r", exc)
+            self._send_json(HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"Analysis failed: {exc}"})
+        else:
+            payload["elapsed_s"] = round(time.perf_counter() - started, 4)
+            self._send_json(HTTPStatus.OK, payload)
+
+
+def make_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT, verbose=True):
+    """
+    Create (but don't start) a threaded HTTP server for an AnalysisService.
+
+    Each connection is handled on its own thread, so requests run concurrently up to
+    the number of workers. Port 0 picks a free port (see server.server_address).
+    """
+    server = ThreadingHTTPServer((host, port), AnalysisRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    server.verbose = verbose
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve microplastic analysis over HTTP from a warm worker pool")
+    parser.add_argument("--host", type=str, default=DEFAULT_HOST, help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port to listen on")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of worker processes (default: one per CPU core)"
+    )
+    parser.add_argument("--max_pending", type=int, default=64, help="Images allowed to wait or run before requests get 503")
+    parser.add_argument("--cache_dir", type=str, default=None, help="Share a result cache in this directory between workers")
+    args = parser.parse_args()
+
+    with AnalysisService(workers=args.workers, max_pending=args.max_pending, cache_dir=args.cache_dir) as service:
+        server = make_server(service, args.host, args.port)
+        print(f"Serving analysis with {service.workers} warm workers on http://{args.host}:{server.server_address[1]}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -1,104 +1,165 @@
 import argparse
+
 import cv2
 import numpy as np
-import matplotlib.pyplot as plt
-import os
 
-def analyze_microplastics(image_path, min_area=10, max_area=5000, low_thresh=10, high_thresh=30, show_image_processing=False):
+from software.image_decode import decode_image, load_image, resolve_decode_scale, scale_area_limits
+from software.profiling import AnalysisProfile, StageProfiler, aggregate_stages, format_stage_table, stage_context
+from software.particles import categorize_counts, filter_particles, measure_hue, measure_particles
+from software.segmentation import color_lut, segment_hsv, range_mask
+
+# decode_image lives in software/image_decode.py; it is re-exported here because
+# analyze_image callers have always imported it from this module
+__all__ = [
+    "COLOR_RANGES",
+    "PIPELINE_VERSION",
+    "Analyzer",
+    "StageBuffers",
+    "analyze_image",
+    "analyze_microplastics",
+    "bilateral_filter",
+    "blur_mask",
+    "categorize",
+    "clean_mask",
+    "count_particles",
+    "decode_image",
+    "hue_of",
+    "measure",
+    "measure_image",
+    "profile_analysis",
+    "segment",
+    "show_processing",
+    "threshold_mask",
+    "to_hsv",
+]
+
+''' Define solvatochromic hue ranges '''
+# These ranges are based on the expected fluorescence emission of solvatochromic dyes like Nile Red.
+# The ranges are defined in HSV color space of (lower_bound, upper_bound), where:
+#   H: Hue of 0-179 (color type)
+#   S: Saturation of 0-255 (color intensity)
+#   V: Value of 0-255 (brightness)
+# 50 is a common threshold for Saturation and Value to ensure we are detecting bright colors.
+# Values in experiment:
+#   Excitation source: LED GREEN DIFFUSED 3MM ROUND T/H with peak @ 515 nm
+#   Emission filter Lee No. 105 Orange: 560 nm long-pass filter
+#   Nile Red:       Ex: 510-550 nm; Em: 580-650 nm
+#       Datasheet:  Ex: 515 nm;     Em: 585 nm
+#       🇯🇵 study:   Ex: 450–490 nm; Em: 515–565 nm
+#   Hydrophobic (non-polar) plastics, e.g. polyethylene (PE) & polypropylene (PP):  Em: 580-630 nm
+#   Hydrophilic (polar) plastics, e.g. polystyrene (PS):                            Em: 631+ nm
+COLOR_RANGES = {
+    "deep_red": [(340, 50, 50), (359, 255, 255)],   # (700, 661) nm
+    "red":      [(0, 50, 50), (22, 255, 255)],      # (660, 626) nm
+    "orange":   [(23, 50, 50), (51, 255, 255)],     # (625, 591) nm
+    "yellow":   [(52, 50, 50), (70, 255, 255)],     # (590, 566) nm
+    # "green":    [(71, 50, 50), (153, 255, 255)]      # (565, 500) nm
+    # "blue":     [(154, 50, 50), (179, 255, 255)]     # (500, 450) nm
+}
+
+# Bump whenever a change to the pipeline can change its results; cached results
+# (software/result_cache.py) from other versions are discarded
+PIPELINE_VERSION = 2
+
+def _validate_parameters(min_area, max_area, low_thresh, high_thresh):
+    """Validate and normalize the area and category parameters shared by the analysis entry points."""
+    # Input validation
+    if min_area > max_area:
+        raise ValueError("min_area cannot be greater than max_area")
+
+    # Ensure non-negative areas
+    min_area = max(0, min_area)
+    max_area = max(0, max_area)
+
+    # Ensure thresholds are non-negative and properly ordered
+    low_thresh = max(0, low_thresh)
+    high_thresh = max(low_thresh, high_thresh)
+
+    return min_area, max_area, low_thresh, high_thresh
+
+def _validate_image(image):
+    """Check that image is a decoded BGR uint8 array."""
+    if not isinstance(image, np.ndarray) or image.ndim != 3 or image.shape[2] != 3 or image.dtype != np.uint8:
+        raise ValueError("image must be a BGR uint8 array of shape (height, width, 3)")
+
+def analyze_microplastics(image_path, min_area=10, max_area=5000, low_thresh=10, high_thresh=30, show_image_processing=False, profiler=None, cache=None, decode_scale=1):
     """
     Analyze a fluorescence image for microplastic particles.
 
     Args:
         image_path (str): Path to the captured image file.
-        min_area (int): Minimum contour area to count (in pixels).
-        max_area (int): Maximum contour area to count.
+        min_area (int): Minimum particle area to count (in pixels).
+        max_area (int): Maximum particle area to count.
         low_thresh (int): Max count for 'Low' classification.
         high_thresh (int): Max count for 'Medium' classification.
         show_image_processing (bool): Whether to display the visualization plot.
+        profiler (StageProfiler | None): Records per-stage timings (decode included) when given.
+        cache (ResultCache | None): Reuse particle measurements of images analyzed before
+            with the same area limits (see software/result_cache.py). Ignored when
+            show_image_processing is set, since the plot needs every intermediate.
+        decode_scale (int | str): Decode the JPEG at 1/decode_scale of its resolution
+            (1, 2, 4 or 8), or "auto" to decode at 1/2 only when min_area is large
+            enough for counts to stay within 10% of full resolution (see
+            software/image_decode.py). min_area and max_area
+            stay in full-resolution pixels and are rescaled to match.
 
     Returns:
         particle_count (int): Number of detected particles.
         category (str): 'Low', 'Medium', or 'High'
 
     Raises:
-        ValueError: If min_area > max_area or if thresholds are invalid
+        ValueError: If min_area > max_area, thresholds or decode_scale are invalid
         FileNotFoundError: If the image file doesn't exist
     """
-    # Input validation
-    if min_area > max_area:
-        raise ValueError("min_area cannot be greater than max_area")
-    
-    # Ensure non-negative areas
-    min_area = max(0, min_area)
-    max_area = max(0, max_area)
-    
-    # Ensure thresholds are non-negative and properly ordered
-    low_thresh = max(0, low_thresh)
-    high_thresh = max(low_thresh, high_thresh)
+    _validate_parameters(min_area, max_area, low_thresh, high_thresh)
+    decode_scale = resolve_decode_scale(decode_scale, min_area)
+
+    if cache is not None and not show_image_processing:
+        return cache.analyze(image_path, min_area, max_area, low_thresh, high_thresh, profiler=profiler, decode_scale=decode_scale)
+
+    # Load image (reduced-size decodes skip most of the JPEG decoding work)
+    with stage_context(profiler)("decode"):
+        image = load_image(str(image_path), decode_scale)
+    min_area, max_area = scale_area_limits(min_area, max_area, decode_scale)
 
-    # Check if file exists
-    if not os.path.exists(image_path):
-        raise FileNotFoundError(f"Image file not found: {image_path}")
+    return analyze_image(image, min_area, max_area, low_thresh, high_thresh, show_image_processing, profiler=profiler)
 
-    # Load image
-    image = cv2.imread(image_path)
-    if image is None:
-        raise ValueError(f"Failed to load image: {image_path}")
+def profile_analysis(image_path, track_memory=True, **kwargs):
+    """
+    Analyze an image with per-stage instrumentation.
+
+    Args:
+        image_path (str): Path to the captured image file.
+        track_memory (bool): Also record peak memory per stage (slower).
+        **kwargs: Forwarded to analyze_microplastics.
 
-    print("Processing image for microplastics...")
+    Returns:
+        AnalysisProfile: count, category and a StageTiming per stage.
+    """
+    profiler = StageProfiler(track_memory=track_memory)
+    count, category = analyze_microplastics(image_path, profiler=profiler, **kwargs)
+    return AnalysisProfile(count, category, profiler.stages)
 
+def to_hsv(image, dst=None):
+    """Stage 1: convert a BGR image to HSV."""
     # Convert to HSV (Hue, Saturation, Value) color space
     # It separates color information (hue) from intensity (value), making it easier to isolate specific colors.
     # This allows us to create masks based on specific color ranges.
-    hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-
-    ''' Define solvatochromic hue ranges '''
-    # These ranges are based on the expected fluorescence emission of solvatochromic dyes like Nile Red.
-    # The ranges are defined in HSV color space of (lower_bound, upper_bound), where:
-    #   H: Hue of 0-179 (color type)
-    #   S: Saturation of 0-255 (color intensity)
-    #   V: Value of 0-255 (brightness)
-    # 50 is a common threshold for Saturation and Value to ensure we are detecting bright colors.
-    # Values in experiment:
-    #   Excitation source: LED GREEN DIFFUSED 3MM ROUND T/H with peak @ 515 nm
-    #   Emission filter Lee No. 105 Orange: 560 nm long-pass filter
-    #   Nile Red:       Ex: 510-550 nm; Em: 580-650 nm
-    #       Datasheet:  Ex: 515 nm;     Em: 585 nm
-    #       🇯🇵 study:   Ex: 450–490 nm; Em: 515–565 nm
-    #   Hydrophobic (non-polar) plastics, e.g. polyethylene (PE) & polypropylene (PP):  Em: 580-630 nm
-    #   Hydrophilic (polar) plastics, e.g. polystyrene (PS):                            Em: 631+ nm
-    color_ranges = {
-        "deep_red": [(340, 50, 50), (359, 255, 255)],   # (700, 661) nm
-        "red":      [(0, 50, 50), (22, 255, 255)],      # (660, 626) nm
-        "orange":   [(23, 50, 50), (51, 255, 255)],     # (625, 591) nm
-        "yellow":   [(52, 50, 50), (70, 255, 255)],     # (590, 566) nm
-        # "green":    [(71, 50, 50), (153, 255, 255)]      # (565, 500) nm
-        # "blue":     [(154, 50, 50), (179, 255, 255)]     # (500, 450) nm
-    }
-
-    # Create masks for each color range
-    # cv2.inRange(src, lowerb, upperb) creates a binary mask where pixels within the specified range are set to 255 (white),
-    # and pixels outside the range are set to 0 (black).
-    # The masks are combined to create a full mask that highlights all the relevant colors.
-    full_mask = np.zeros_like(hsv[:, :, 0])
-    masks = {}
-
-    # Iterate through each color range and create a mask
-    for name, (lower, upper) in color_ranges.items():
-        # Convert lower and upper bounds to numpy arrays for cv2.inRange
-        lower = np.array(lower)
-        upper = np.array(upper)
-        mask = cv2.inRange(hsv, lower, upper)
-        masks[name] = mask
-        full_mask = cv2.bitwise_or(full_mask, mask)
-    
-    # Deep red + red masks
-    red_deep_red_mask = cv2.bitwise_or(masks["deep_red"], masks["red"])
-
-    # Orange mask
-    yellow_orange_mask = cv2.bitwise_or(masks["orange"], masks["yellow"])
-
-    ''' Blur to reduce noise '''
+    return cv2.cvtColor(image, cv2.COLOR_BGR2HSV, dst=dst)
+
+def segment(hsv, color_ranges=COLOR_RANGES, full_mask=None, labels=None, scratch=None):
+    """Stage 2: build the combined color mask and per-pixel range labels."""
+    # Create the combined mask for all color ranges
+    # Each pixel's (H, S, V) is looked up in a per-channel table built once per color-range
+    # configuration (see software/segmentation.py). This gives the same result as running
+    # cv2.inRange(src, lowerb, upperb) per range and OR-ing the masks, in a single pass:
+    #   full_mask: 255 (white) where the pixel is inside any range, 0 (black) elsewhere
+    #   labels: bitset of the ranges each pixel falls in, used to build per-range masks on demand
+    #   Passing preallocated outputs (as Analyzer does) makes the stage allocation-free
+    return segment_hsv(hsv, color_ranges, full_mask, labels, scratch)
+
+def blur_mask(full_mask, ksize=3, dst=None):
+    """Stage 3: Gaussian blur to reduce noise."""
     # Fluorescence images often have speckle noise or small bright pixels not related to microplastics.
     # Blurring helps smooth out these high-frequency artifacts before thresholding.
     # Sharp edges or pixel spikes can confuse the thresholding process.
@@ -111,18 +172,21 @@ def analyze_microplastics(image_path, min_area=10, max_area=5000, low_thresh=10,
     #       Determines the extent of blurring; larger values result in more blur.
     #       A kernel size of (5, 5) is a common choice for moderate blurring.
     #   sigmaX: standard deviation in the X direction (0 means it is calculated based on ksize)
-    blurred = cv2.GaussianBlur(full_mask, (3, 3), 0)
+    return cv2.GaussianBlur(full_mask, (ksize, ksize), 0, dst=dst)
 
-    ''' Bilateral filter to preserve edges '''
+def bilateral_filter(full_mask):
+    """Debug-only stage: edge-preserving bilateral filter, shown in the visualization grid."""
     # The bilateral filter smooths the image while preserving edges, making it useful for fluorescence images.
+    # Its output doesn't feed the count, so it is only computed when intermediates are traced.
     # cv2.bilateralFilter(src, d, sigmaColor, sigmaSpace) applies a bilateral filter to the image.
     #   src: source image
     #   d: diameter of the pixel neighborhood used during filtering (must be odd)
     #   sigmaColor: filter sigma in color space (larger values mean more colors will be mixed)
     #   sigmaSpace: filter sigma in coordinate space (larger values mean farther pixels will influence each other)
-    bilateral_filtered = cv2.bilateralFilter(full_mask, d=3, sigmaColor=75, sigmaSpace=75)
+    return cv2.bilateralFilter(full_mask, d=3, sigmaColor=75, sigmaSpace=75)
 
-    ''' Threshold (Otsu’s method) '''
+def threshold_mask(blurred, dst=None):
+    """Stage 4: binarize the blurred mask with Otsu's method."""
     # Otsu's method automatically determines a threshold value to separate foreground from background.
     # It is particularly useful for images with bimodal histograms, like fluorescence images.
     # cv2.threshold(src, thresh_value, max_value, method)
@@ -130,92 +194,330 @@ def analyze_microplastics(image_path, min_area=10, max_area=5000, low_thresh=10,
     # method
     #   THRESH_BINARY: pixels > threshold → 255 (white); others → 0 (black)
     #   THRESH_OTSU: automatically calculates the optimal threshold to separate foreground from background based on image histogram
-    _, binary = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    _, binary = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU, dst=dst)
+    return binary
 
-    ''' Morphological cleanup '''
+def clean_mask(binary, ksize=3, dst=None, kernel=None):
+    """Stage 5: morphological opening to remove speckles."""
     # Morphological operations help remove small noise and enhance the structure of detected particles.
     # cv2.getStructuringElement(shape, ksize) creates a structuring element for morphological operations.
     #   shape: cv2.MORPH_ELLIPSE, which creates an elliptical structuring element, which is effective for circular particles.
-    #   ksize: size of the structuring element (3x3 in this case)
+    #   ksize: size of the structuring element (3x3 by default)
     # cv2.morphologyEx(src, op, kernel) applies a morphological operation to the image.
     #   src: source image (binary mask)
     #   op: morphological operation to apply
     #       cv2.MORPH_OPEN: removes small objects from the foreground (noise) while preserving larger structures.
-    #   kernel: structuring element created above
-    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
-    cleaned = cv2.morphologyEx(binary, cv2.MORPH_OPEN, kernel)
-
-    ''' Find contours '''
-    # cv2.findContours(image, mode, method) detects contours in a binary image.
-    #   mode: cv2.RETR_EXTERNAL retrieves only the outer contours (useful for counting particles)
-    #   method: cv2.CHAIN_APPROX_SIMPLE compresses horizontal, vertical, and diagonal segments and leaves only their endpoints.
-    #       This reduces memory usage and speeds up contour processing.
-    # The contours are stored in a list, where each contour is represented as an array of points.
-    # The second return value is the hierarchy of contours, which we don't need here.
-    contours, _ = cv2.findContours(cleaned, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-
-    # Count valid particles
-    count = 0
-    for shape in contours:
-        area = cv2.contourArea(shape)
-        if min_area < area < max_area:
-            count += 1
-
-    category = "Low" if count < low_thresh else "Medium" if count < high_thresh else "High"
-
-
-    ''' Visualize only if show_image_processing is True '''
-    if show_image_processing:
-        ''' Draw contours on the cleaned image '''
-        # This step visualizes the detected contours on the cleaned image.
-        # cv2.drawContours(image, contours, contourIdx, color, thickness)
-        #   image: the image on which to draw the contours
-        #   contours: list of contours to draw
-        #   contourIdx: -1 means draw all contours; you can specify an index to draw a specific contour
-        #   color: color of the contours (green in this case)
-        #   thickness: thickness of the contour lines in pixels
-        contour_img = image.copy()
-        cv2.drawContours(contour_img, contours, -1, (0, 255, 0), 1)
-
-        # Create a 2x4 grid of subplots
-        fig, axes = plt.subplots(2, 4, figsize=(16, 10))
-        axes[0, 0].imshow(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
-        axes[0, 0].set_title("Original image")
-        axes[0, 0].axis('off')
-
-        axes[0, 1].imshow(red_deep_red_mask, cmap='gray')
-        axes[0, 1].set_title("Red/deep red channels")
-        axes[0, 1].axis('off')
-
-        axes[0, 2].imshow(yellow_orange_mask, cmap='gray')
-        axes[0, 2].set_title("Yellow/orange channels")
-        axes[0, 2].axis('off')
-
-        axes[0, 3].imshow(full_mask, cmap='gray')
-        axes[0, 3].set_title("Combined mask")
-        axes[0, 3].axis('off')
-
-        axes[1, 0].imshow(blurred, cmap='gray')
-        axes[1, 0].set_title("Blurred image")
-        axes[1, 0].axis('off')
-
-        axes[1, 1].imshow(bilateral_filtered, cmap='gray')
-        axes[1, 1].set_title("Bilateral filter")
-        axes[1, 1].axis('off')
-
-        axes[1, 2].imshow(cleaned, cmap='gray')
-        axes[1, 2].set_title("Cleaned image")
-        axes[1, 2].axis('off')
-
-        axes[1, 3].imshow(cv2.cvtColor(contour_img, cv2.COLOR_BGR2RGB))
-        axes[1, 3].set_title("Contours detected")
-        axes[1, 3].axis('off')
-
-        plt.suptitle(f"Detected particles: {count} → Category: {category}", fontsize=14)
-        plt.tight_layout()
-        plt.show()
-
-    return count, category
+    #   kernel: structuring element created above (Analyzer passes in one it built once)
+    if kernel is None:
+        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (ksize, ksize))
+    return cv2.morphologyEx(binary, cv2.MORPH_OPEN, kernel, dst=dst)
+
+def measure(cleaned, components=None):
+    """Stage 6: label every particle and measure it into a feature table."""
+    # cv2.findContours(image, mode, method) with mode cv2.RETR_EXTERNAL keeps only the outer
+    # contours, so a particle inside a ring-shaped one isn't counted; each particle's area is
+    # cv2.contourArea of its outline. cv2.connectedComponentsWithStats labels the particles
+    # and gives their bounding boxes and centroids in one pass over the mask. The result is
+    # one PARTICLE_DTYPE row per particle (see software/particles.py), plus the label image.
+    return measure_particles(cleaned, components=components)
+
+def count_particles(particles, min_area, max_area):
+    """Stage 7: keep the particles whose contour area lies strictly between min_area and max_area."""
+    # A boolean mask over the table's area column; the count is the number of rows left
+    return filter_particles(particles, min_area, max_area)
+
+def categorize(count, low_thresh, high_thresh):
+    """Stage 8: map a particle count (or an array of counts) to 'Low', 'Medium' or 'High'."""
+    return categorize_counts(count, low_thresh, high_thresh)
+
+def hue_of(particles, components, hsv):
+    """Stage 9 (feature table only): mean hue of each counted particle."""
+    # Only the counted particles' pixels are summed; oversized blobs are skipped
+    return measure_hue(particles, components, hsv)
+
+class StageBuffers:
+    """
+    Output arrays of the pipeline stages, allocated for one frame size and then reused.
+
+    An 8 MP frame needs about 110 MB of buffers (135 MB with a calibration, whose
+    corrected frame gets its own buffer); release() frees them between bursts of work.
+    """
+
+    def __init__(self):
+        self.shape = None
+
+    def ensure(self, shape, corrected=False):
+        """
+        (Re)allocate the buffers for frames of shape (height, width) unless they already fit.
+
+        corrected also allocates the buffer of the calibrated frame (see software/calibration.py).
+        """
+        shape = tuple(shape)
+        if shape != self.shape:
+            height, width = shape
+            self.hsv = np.empty((height, width, 3), dtype=np.uint8)
+            # labels receives the hue channel during segmentation; sat and val are scratch
+            self.labels, self.sat, self.val, self.full_mask, self.blurred, self.binary, self.cleaned = (
+                np.empty((height, width), dtype=np.uint8) for _ in range(7)
+            )
+            self.components = np.empty((height, width), dtype=np.int32)
+            self.corrected = None
+            self.shape = shape
+        if corrected and self.corrected is None:
+            self.corrected = np.empty_like(self.hsv)
+
+    def release(self):
+        """Drop the buffers; the next ensure() allocates them again."""
+        self.__dict__.clear()
+        self.shape = None
+
+class Analyzer:
+    """
+    The analysis pipeline, configured once and run on many frames.
+
+    Parameters are validated and the segmentation LUTs and morphology kernel are built
+    when the analyzer is created, not per frame. Every stage writes into StageBuffers
+    that are allocated for the first frame and reused while the frame size stays the
+    same, so a capture or batch loop allocates almost nothing per frame.
+
+    An instance (and its buffers) must only be used from one thread at a time; give each
+    thread its own analyzer, as analyze_image does.
+
+    Example:
+        analyzer = Analyzer(min_area=10, max_area=5000)
+        for frame in frames:
+            count, category = analyzer.analyze(frame)
+    """
+
+    def __init__(self, min_area=10, max_area=5000, low_thresh=10, high_thresh=30, color_ranges=COLOR_RANGES, blur_ksize=3, morph_ksize=3, buffers=None, calibration=None):
+        """
+        Args:
+            min_area, max_area, low_thresh, high_thresh: As for analyze_image.
+            color_ranges (dict): Color ranges the mask is built from.
+            blur_ksize (int): Gaussian blur kernel size (odd).
+            morph_ksize (int): Opening kernel size.
+            buffers (StageBuffers | None): Buffers to write into, e.g. shared by several
+                analyzers used on the same thread.
+            calibration (Calibration | None): Dark/flat correction applied to every frame
+                before segmentation (see software/calibration.py). None skips it.
+
+        Raises:
+            ValueError: If min_area > max_area, a kernel size is invalid, or there are
+                more than MAX_COLOR_RANGES color ranges
+        """
+        self.min_area, self.max_area, self.low_thresh, self.high_thresh = _validate_parameters(
+            min_area, max_area, low_thresh, high_thresh
+        )
+        if blur_ksize < 1 or blur_ksize % 2 == 0:
+            raise ValueError("blur_ksize must be a positive odd number")
+        if morph_ksize < 1:
+            raise ValueError("morph_ksize must be positive")
+        # Builds (and caches) the lookup tables now, so a bad configuration fails here
+        color_lut(color_ranges)
+        self.color_ranges = color_ranges
+        self.blur_ksize = blur_ksize
+        self.kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (morph_ksize, morph_ksize))
+        self.buffers = buffers if buffers is not None else StageBuffers()
+        self.calibration = calibration
+
+    @property
+    def parameters(self):
+        """(min_area, max_area, low_thresh, high_thresh) after validation."""
+        return self.min_area, self.max_area, self.low_thresh, self.high_thresh
+
+    def _run(self, image, profiler, with_hue):
+        """Run stages 1-7 (and 9 when with_hue) and return every output by name."""
+        _validate_image(image)
+        buffers = self.buffers
+        buffers.ensure(image.shape[:2], corrected=self.calibration is not None)
+        stage = stage_context(profiler)
+        outputs = {}
+        if self.calibration is not None:
+            with stage("calibrate"):
+                image = outputs["corrected"] = self.calibration.apply(image, dst=buffers.corrected)
+        with stage("hsv"):
+            hsv = to_hsv(image, dst=buffers.hsv)
+        with stage("segment"):
+            full_mask, labels = segment(hsv, self.color_ranges, buffers.full_mask, buffers.labels, (buffers.sat, buffers.val))
+        with stage("blur"):
+            blurred = blur_mask(full_mask, self.blur_ksize, dst=buffers.blurred)
+        with stage("threshold"):
+            binary = threshold_mask(blurred, dst=buffers.binary)
+        with stage("morphology"):
+            cleaned = clean_mask(binary, dst=buffers.cleaned, kernel=self.kernel)
+        with stage("measure"):
+            particles, components = measure(cleaned, components=buffers.components)
+        with stage("count"):
+            particles = count_particles(particles, self.min_area, self.max_area)
+        if with_hue:
+            with stage("hue"):
+                particles = hue_of(particles, components, hsv)
+        return dict(
+            outputs,
+            hsv=hsv,
+            full_mask=full_mask,
+            labels=labels,
+            blurred=blurred,
+            binary=binary,
+            cleaned=cleaned,
+            components=components,
+            particles=particles,
+        )
+
+    def analyze(self, image, show_image_processing=False, trace=None, profiler=None):
+        """
+        Analyze one frame; arguments and return value as for analyze_image.
+
+        Traced intermediates are copied out of the buffers, so they survive the next frame.
+        """
+        if show_image_processing and trace is None:
+            trace = {}
+
+        print("Processing image for microplastics...")
+
+        outputs = self._run(image, profiler, with_hue=trace is not None)
+        count = len(outputs["particles"])
+        category = categorize(count, self.low_thresh, self.high_thresh)
+
+        if trace is not None:
+            trace.update({name: value.copy() for name, value in outputs.items()})
+            with stage_context(profiler)("bilateral"):
+                trace["bilateral_filtered"] = bilateral_filter(trace["full_mask"])
+
+        ''' Visualize only if show_image_processing is True '''
+        if show_image_processing:
+            show_processing(image, trace, count, category)
+
+        return count, category
+
+    def measure(self, image, profiler=None, hue=True):
+        """Per-particle feature table and category of one frame (see measure_image)."""
+        particles = self._run(image, profiler, with_hue=hue)["particles"]
+        return particles, categorize(len(particles), self.low_thresh, self.high_thresh)
+
+def analyze_image(image, min_area=10, max_area=5000, low_thresh=10, high_thresh=30, show_image_processing=False, trace=None, profiler=None, calibration=None):
+    """
+    Analyze an already-decoded fluorescence image for microplastic particles.
+
+    This is the in-memory core of analyze_microplastics: frames handed over by the
+    camera (or decoded with decode_image) are analyzed without touching the disk.
+    Each call runs a fresh Analyzer whose stage buffers are freed on return; loops over
+    many frames should hold an Analyzer instead, to reuse them.
+
+    Args:
+        image (np.ndarray): BGR image of shape (height, width, 3) and dtype uint8.
+        min_area (int): Minimum particle area to count (in pixels).
+        max_area (int): Maximum particle area to count.
+        low_thresh (int): Max count for 'Low' classification.
+        high_thresh (int): Max count for 'Medium' classification.
+        show_image_processing (bool): Whether to display the visualization plot.
+        trace (dict | None): Debug/trace mode. When a dict is given, every intermediate
+            stage output is stored in it ("hsv", "full_mask", "labels", "blurred",
+            "bilateral_filtered", "binary", "cleaned", "components", "particles").
+            "particles" is the feature table of the counted particles (see measure_image).
+            Display-only intermediates are computed only in this mode. With a
+            calibration, the corrected frame is stored as "corrected".
+        profiler (StageProfiler | None): Records wall time and peak memory per stage when given.
+        calibration (Calibration | None): Dark/flat correction applied before segmentation
+            (see software/calibration.py).
+
+    Returns:
+        particle_count (int): Number of detected particles.
+        category (str): 'Low', 'Medium', or 'High'
+
+    Raises:
+        ValueError: If min_area > max_area, or if image isn't a 3-channel uint8 array
+    """
+    analyzer = Analyzer(min_area, max_area, low_thresh, high_thresh, calibration=calibration)
+    return analyzer.analyze(image, show_image_processing, trace, profiler)
+
+def measure_image(image, min_area=10, max_area=5000, low_thresh=10, high_thresh=30, profiler=None, calibration=None, hue=True):
+    """
+    Analyze an image and return the per-particle feature table instead of just the count.
+
+    Args:
+        image (np.ndarray): BGR image of shape (height, width, 3) and dtype uint8.
+        min_area (int): Minimum particle area to count (in pixels).
+        max_area (int): Maximum particle area to count.
+        low_thresh (int): Max count for 'Low' classification.
+        high_thresh (int): Max count for 'Medium' classification.
+        profiler (StageProfiler | None): Records wall time and peak memory per stage when given.
+        calibration (Calibration | None): Dark/flat correction applied before segmentation.
+        hue (bool): Fill in mean_hue, which takes a pass over the frame. With False it
+            is left as NaN and the run costs the same as analyze_image.
+
+    Returns:
+        particles (np.ndarray): PARTICLE_DTYPE structured array with one row per counted
+            particle (label, area, cx, cy, left, top, width, height, mean_hue, size_class).
+            len(particles) is the count analyze_image returns.
+        category (str): 'Low', 'Medium', or 'High'
+
+    Raises:
+        ValueError: If min_area > max_area, or if image isn't a 3-channel uint8 array
+    """
+    return Analyzer(min_area, max_area, low_thresh, high_thresh, calibration=calibration).measure(image, profiler, hue)
+
+def show_processing(image, trace, count, category):
+    """
+    Plot the traced pipeline stages in a 2x4 grid.
+
+    matplotlib is imported here rather than at module level so headless runs don't pay
+    its import cost.
+
+    Args:
+        image (np.ndarray): Original BGR image.
+        trace (dict): Intermediates recorded by analyze_image(..., trace={}).
+        count (int): Detected particle count.
+        category (str): Concentration category.
+    """
+    import matplotlib.pyplot as plt
+
+    # Per-range masks are only materialized for the plot
+    red_deep_red_mask = range_mask(trace["labels"], COLOR_RANGES, "deep_red", "red")
+    yellow_orange_mask = range_mask(trace["labels"], COLOR_RANGES, "orange", "yellow")
+
+    ''' Draw the counted particles on the original image '''
+    # Outline each counted particle's pixels and mark its centroid (see software/overlays.py)
+    from software.overlays import draw_particles
+    contour_img = draw_particles(image.copy(), trace["particles"], trace["components"])
+
+    # Create a 2x4 grid of subplots
+    fig, axes = plt.subplots(2, 4, figsize=(16, 10))
+    axes[0, 0].imshow(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+    axes[0, 0].set_title("Original image")
+    axes[0, 0].axis('off')
+
+    axes[0, 1].imshow(red_deep_red_mask, cmap='gray')
+    axes[0, 1].set_title("Red/deep red channels")
+    axes[0, 1].axis('off')
+
+    axes[0, 2].imshow(yellow_orange_mask, cmap='gray')
+    axes[0, 2].set_title("Yellow/orange channels")
+    axes[0, 2].axis('off')
+
+    axes[0, 3].imshow(trace["full_mask"], cmap='gray')
+    axes[0, 3].set_title("Combined mask")
+    axes[0, 3].axis('off')
+
+    axes[1, 0].imshow(trace["blurred"], cmap='gray')
+    axes[1, 0].set_title("Blurred image")
+    axes[1, 0].axis('off')
+
+    axes[1, 1].imshow(trace["bilateral_filtered"], cmap='gray')
+    axes[1, 1].set_title("Bilateral filter")
+    axes[1, 1].axis('off')
+
+    axes[1, 2].imshow(trace["cleaned"], cmap='gray')
+    axes[1, 2].set_title("Cleaned image")
+    axes[1, 2].axis('off')
+
+    axes[1, 3].imshow(cv2.cvtColor(contour_img, cv2.COLOR_BGR2RGB))
+    axes[1, 3].set_title("Particles detected")
+    axes[1, 3].axis('off')
+
+    plt.suptitle(f"Detected particles: {count} → Category: {category}", fontsize=14)
+    plt.tight_layout()
+    plt.show()
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Analyze a captured image for microplastics")
@@ -230,7 +532,24 @@ if __name__ == "__main__":
         default="./tests/test-images/test_image_1.jpg",
         help="Path to the input image"
     )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Print wall time and peak memory for each pipeline stage"
+    )
+    parser.add_argument(
+        "--decode_scale",
+        default="1",
+        choices=["1", "2", "4", "8", "auto"],
+        help="Decode the JPEG at 1/N resolution ('auto' uses 1/2 from min_area 400, where counts stay within 10%% of full resolution)"
+    )
     args = parser.parse_args()
-
-    count, level = analyze_microplastics(args.image_path, show_image_processing=args.show_image_processing)
+    decode_scale = args.decode_scale if args.decode_scale == "auto" else int(args.decode_scale)
+
+    if args.profile:
+        profile = profile_analysis(args.image_path, show_image_processing=args.show_image_processing, decode_scale=decode_scale)
+        count, level = profile.count, profile.category
+        print(format_stage_table(aggregate_stages([profile])))
+    else:
+        count, level = analyze_microplastics(args.image_path, show_image_processing=args.show_image_processing, decode_scale=decode_scale)
     print(f"Detected particles: {count} → Category: {level}")
\ No newline at end of file
@@ -0,0 +1,300 @@
+import argparse
+import csv
+import glob
+import json
+import itertools
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import cv2
+
+from software.analyze_microplastics import analyze_image, analyze_microplastics, profile_analysis
+from software.image_decode import DECODE_SCALES, prefetch_images, resolve_decode_scale, scale_area_limits
+from software.profiling import aggregate_stages, format_stage_table
+from software.result_cache import DEFAULT_MAX_BYTES, ResultCache
+from software.results_store import ResultsStore, timestamp_from_path
+
+# Columns written to the batch summary, in order
+SUMMARY_FIELDS = ["image_path", "count", "category", "elapsed_s", "error"]
+
+
+def find_images(input_dir, pattern="*.jpg"):
+    """
+    List the images in a directory that match a glob pattern.
+
+    Args:
+        input_dir (str): Directory to search.
+        pattern (str): Glob pattern relative to input_dir (e.g. "*.jpg" or "**/*.jpg").
+
+    Returns:
+        list[str]: Sorted image paths.
+
+    Raises:
+        FileNotFoundError: If input_dir doesn't exist
+    """
+    if not os.path.isdir(input_dir):
+        raise FileNotFoundError(f"Input directory not found: {input_dir}")
+    return sorted(glob.glob(os.path.join(input_dir, pattern), recursive=True))
+
+
+def _analyze_one(image_path, analysis_kwargs, profile=False):
+    """Worker entry point: analyze one image and return a summary row."""
+    start = time.perf_counter()
+    count, category, error, stages = None, None, None, None
+    try:
+        if profile:
+            result = profile_analysis(image_path, **analysis_kwargs)
+            count, category = result.count, result.category
+            stages = result.as_dict()["stages"]
+        else:
+            count, category = analyze_microplastics(image_path, **analysis_kwargs)
+    except (FileNotFoundError, ValueError, cv2.error) as exc:
+        # A single unreadable or corrupt capture shouldn't abort a whole archive run
+        error = str(exc)
+    row = {
+        "image_path": str(image_path),
+        "count": count,
+        "category": category,
+        "elapsed_s": round(time.perf_counter() - start, 4),
+        "error": error,
+    }
+    if stages is not None:
+        row["stages"] = stages
+    return row
+
+
+def _analyze_prefetched(image_paths, depth, analysis_kwargs):
+    """Serial batch with decoding running ahead on a background thread."""
+    kwargs = {name: value for name, value in analysis_kwargs.items() if name not in ("show_image_processing", "cache")}
+    min_area = kwargs.pop("min_area", 10)
+    max_area = kwargs.pop("max_area", 5000)
+    decode_scale = resolve_decode_scale(kwargs.pop("decode_scale", 1), min_area)
+    scaled_min_area, scaled_max_area = scale_area_limits(min_area, max_area, decode_scale)
+    for image_path, image, error in prefetch_images(image_paths, decode_scale, depth):
+        start = time.perf_counter()
+        count, category = None, None
+        if error is not None:
+            error = str(error)
+        else:
+            try:
+                count, category = analyze_image(image, scaled_min_area, scaled_max_area, **kwargs)
+            except (ValueError, cv2.error) as exc:
+                error = str(exc)
+        yield {
+            "image_path": str(image_path),
+            "count": count,
+            "category": category,
+            # Decoding overlapped earlier images, so only the analysis is timed
+            "elapsed_s": round(time.perf_counter() - start, 4),
+            "error": error,
+        }
+
+
+def analyze_batch(image_paths, workers=None, profile=False, prefetch=0, **analysis_kwargs):
+    """
+    Analyze many images across a process pool, yielding results as they finish.
+
+    Args:
+        image_paths (iterable): Paths of the images to analyze.
+        workers (int | None): Number of worker processes (None = one per CPU core,
+            1 = analyze serially in the calling process).
+        profile (bool): Add per-stage timings to each row under "stages"
+            (aggregate them with software.profiling.aggregate_stages).
+        prefetch (int): For serial runs (workers=1), decode up to this many images ahead
+            on a background thread while earlier ones are analyzed (0 = off; ignored
+            with profile or a cache).
+        **analysis_kwargs: Forwarded to analyze_microplastics (min_area, max_area,
+            low_thresh, high_thresh, cache, decode_scale). Visualization is always disabled.
+
+    Yields:
+        dict: One summary row per image with the keys in SUMMARY_FIELDS. Rows arrive in
+        completion order, not input order. Images that fail to load or decode are
+        reported with `error` set instead of raising. At most two images per worker are
+        queued at a time; closing the generator early (or an exception in the caller)
+        cancels the queued ones instead of waiting for them.
+
+    Raises:
+        ValueError: If workers or prefetch is invalid
+    """
+    if workers is not None and workers < 1:
+        raise ValueError("workers must be at least 1")
+    if prefetch < 0:
+        raise ValueError("prefetch must be non-negative")
+    analysis_kwargs["show_image_processing"] = False
+
+    if workers == 1:
+        if prefetch and not profile and analysis_kwargs.get("cache") is None:
+            yield from _analyze_prefetched(image_paths, prefetch, analysis_kwargs)
+            return
+        for image_path in image_paths:
+            yield _analyze_one(image_path, analysis_kwargs, profile)
+        return
+
+    workers = workers or os.cpu_count() or 1
+    paths = iter(image_paths)
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        pending = set()
+        while True:
+            for path in itertools.islice(paths, 2 * workers - len(pending)):
+                pending.add(pool.submit(_analyze_one, path, analysis_kwargs, profile))
+            if not pending:
+                return
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
+class SummaryWriter:
+    """
+    Stream batch results to a CSV or JSONL file as they arrive.
+
+    The format is chosen from the file extension: `.jsonl` writes one JSON object per
+    line (including per-stage timings when profiled), anything else writes CSV with a
+    header row. Rows are flushed as they are written so a long run can be followed
+    (or resumed) from the partial file.
+    """
+
+    def __init__(self, summary_path):
+        self.summary_path = summary_path
+        self.is_jsonl = summary_path.endswith(".jsonl")
+        directory = os.path.dirname(summary_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(summary_path, "w", newline="")
+        self._csv = None
+        if not self.is_jsonl:
+            self._csv = csv.DictWriter(self._file, fieldnames=SUMMARY_FIELDS, extrasaction="ignore")
+            self._csv.writeheader()
+
+    def write(self, result):
+        if self.is_jsonl:
+            row = {key: result.get(key) for key in SUMMARY_FIELDS}
+            if "stages" in result:
+                row["stages"] = result["stages"]
+            self._file.write(json.dumps(row) + "\n")
+        else:
+            self._csv.writerow(result)
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyze a directory of captured images for microplastics")
+    parser.add_argument(
+        "--input_dir",
+        type=str,
+        default="./captures",
+        help="Directory containing the images to analyze"
+    )
+    parser.add_argument(
+        "--pattern",
+        type=str,
+        default="*.jpg",
+        help="Glob pattern for images inside input_dir (use '**/*.jpg' to recurse)"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of worker processes (default: one per CPU core)"
+    )
+    parser.add_argument(
+        "--summary",
+        type=str,
+        default="batch_summary.csv",
+        help="Summary output path (.csv or .jsonl)"
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Record per-stage timings and print p50/p95 per stage at the end"
+    )
+    parser.add_argument(
+        "--cache_dir",
+        type=str,
+        default=None,
+        help="Reuse particle measurements cached in this directory (re-runs only reprocess changed images)"
+    )
+    parser.add_argument(
+        "--cache_max_mb",
+        type=float,
+        default=DEFAULT_MAX_BYTES / 1024 / 1024,
+        help="Evict least recently used cache entries beyond this size"
+    )
+    parser.add_argument(
+        "--decode_scale",
+        default="1",
+        choices=[str(scale) for scale in DECODE_SCALES] + ["auto"],
+        help="Decode JPEGs at 1/N resolution ('auto' uses 1/2 from min_area 400, where counts stay within 10%% of full resolution); area limits are rescaled to match"
+    )
+    parser.add_argument(
+        "--prefetch",
+        type=int,
+        default=0,
+        help="With --workers 1, decode this many images ahead on a background thread"
+    )
+    parser.add_argument(
+        "--db",
+        type=str,
+        default=None,
+        help="Also append the results to this SQLite results store"
+    )
+    parser.add_argument("--min_area", type=int, default=10, help="Minimum particle area in pixels")
+    parser.add_argument("--max_area", type=int, default=5000, help="Maximum particle area in pixels")
+    parser.add_argument("--low_thresh", type=int, default=10, help="Max count for 'Low' classification")
+    parser.add_argument("--high_thresh", type=int, default=30, help="Max count for 'Medium' classification")
+    args = parser.parse_args()
+
+    image_paths = find_images(args.input_dir, args.pattern)
+    print(f"Analyzing {len(image_paths)} images from {args.input_dir}...")
+
+    cache = ResultCache(args.cache_dir, int(args.cache_max_mb * 1024 * 1024)) if args.cache_dir else None
+    store = ResultsStore(args.db) if args.db else None
+    start = time.perf_counter()
+    profiles = []
+    with SummaryWriter(args.summary) as writer:
+        for result in analyze_batch(
+            image_paths,
+            workers=args.workers,
+            profile=args.profile,
+            prefetch=args.prefetch,
+            decode_scale=args.decode_scale if args.decode_scale == "auto" else int(args.decode_scale),
+            min_area=args.min_area,
+            max_area=args.max_area,
+            low_thresh=args.low_thresh,
+            high_thresh=args.high_thresh,
+            cache=cache,
+        ):
+            writer.write(result)
+            if "stages" in result:
+                profiles.append(result)
+            if result["error"]:
+                print(f"{result['image_path']}: failed ({result['error']})")
+            else:
+                if store is not None:
+                    store.add_result(
+                        result["count"],
+                        result["category"],
+                        captured_at=timestamp_from_path(result["image_path"]),
+                        image_path=result["image_path"],
+                    )
+                print(f"{result['image_path']}: {result['count']} → {result['category']} ({result['elapsed_s']:.2f}s)")
+
+    if store is not None:
+        store.close()
+    elapsed = time.perf_counter() - start
+    if profiles:
+        print(format_stage_table(aggregate_stages(profiles)))
+    print(f"Analyzed {len(image_paths)} images in {elapsed:.1f}s → summary written to {args.summary}")
@@ -0,0 +1,230 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from software.analyze_microplastics import analyze_image
+
+DEFAULT_IMAGE_DIR = Path(__file__).resolve().parent.parent / "tests" / "test-images"
+
+# Metrics compared against a baseline, and whether bigger is better
+TRACKED_METRICS = {
+    "throughput_ips": True,
+    "latency_p50_s": False,
+    "latency_p95_s": False,
+    "peak_bytes": False,
+}
+
+
+def load_benchmark_images(image_dir=DEFAULT_IMAGE_DIR, scales=(1.0,), pattern="*.jpg"):
+    """
+    Load the benchmark images, synthetically upscaled to each requested scale.
+
+    Args:
+        image_dir (str | Path): Directory of source images (defaults to tests/test-images).
+        scales (iterable[float]): Resize factors; 2.0 doubles width and height.
+        pattern (str): Glob pattern of images inside image_dir.
+
+    Returns:
+        dict: Scale → list of (image name, BGR image).
+
+    Raises:
+        FileNotFoundError: If no images match
+    """
+    paths = sorted(Path(image_dir).glob(pattern))
+    if not paths:
+        raise FileNotFoundError(f"No benchmark images matching {pattern} in {image_dir}")
+    originals = [(path.name, cv2.imread(str(path))) for path in paths]
+
+    cases = {}
+    for scale in scales:
+        if scale == 1.0:
+            cases[scale] = originals
+        else:
+            cases[scale] = [
+                (name, cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_LINEAR))
+                for name, image in originals
+            ]
+    return cases
+
+
+def _peak_bytes(analyze, image, analysis_kwargs):
+    """Peak traced memory of one analysis run (measured separately so tracing doesn't skew timings)."""
+    # A held Analyzer (analyze=analyzer.analyze) allocated its stage buffers before
+    # tracing started; release them so this run allocates, and counts, them again
+    buffers = getattr(getattr(analyze, "__self__", None), "buffers", None)
+    if buffers is not None:
+        buffers.release()
+    tracemalloc.start()
+    try:
+        analyze(image, **analysis_kwargs)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_benchmark(cases, repeat=3, warmup=1, analyze=analyze_image, **analysis_kwargs):
+    """
+    Time the analysis over every image at every scale.
+
+    Args:
+        cases (dict): Output of load_benchmark_images.
+        repeat (int): Timed runs per image.
+        warmup (int): Untimed runs per image before timing (fills caches, LUTs, etc).
+        analyze (callable): Analysis function taking a BGR image (defaults to analyze_image).
+        **analysis_kwargs: Forwarded to analyze.
+
+    Returns:
+        dict: {"environment": {...}, "cases": {"<scale>x": metrics}} where metrics has
+        images, megapixels, throughput_ips, latency_p50_s, latency_p95_s and peak_bytes.
+    """
+    results = {}
+    # The pipeline prints a line per image; keep the benchmark output readable
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for scale, images in cases.items():
+            latencies = []
+            peaks = []
+            for _, image in images:
+                for _ in range(warmup):
+                    analyze(image, **analysis_kwargs)
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    analyze(image, **analysis_kwargs)
+                    latencies.append(time.perf_counter() - start)
+                peaks.append(_peak_bytes(analyze, image, analysis_kwargs))
+
+            latencies = np.asarray(latencies)
+            results[f"{scale:g}x"] = {
+                "images": len(images),
+                "megapixels": round(float(np.mean([img.shape[0] * img.shape[1] for _, img in images])) / 1e6, 3),
+                "throughput_ips": float(len(latencies) / latencies.sum()),
+                "latency_p50_s": float(np.percentile(latencies, 50)),
+                "latency_p95_s": float(np.percentile(latencies, 95)),
+                "peak_bytes": int(max(peaks)),
+            }
+
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "opencv": cv2.__version__,
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+        },
+        "cases": results,
+    }
+
+
+def compare_to_baseline(results, baseline, tolerance=0.2):
+    """
+    Flag metrics that got worse than the baseline by more than `tolerance`.
+
+    Args:
+        results (dict): Output of run_benchmark.
+        baseline (dict): A previously saved run_benchmark result.
+        tolerance (float): Allowed relative slowdown, e.g. 0.2 = 20%.
+
+    Returns:
+        list[str]: One message per regression (empty when everything is within tolerance).
+        Cases missing from either side are skipped.
+    """
+    regressions = []
+    for case, metrics in results["cases"].items():
+        reference = baseline.get("cases", {}).get(case)
+        if reference is None:
+            continue
+        for metric, higher_is_better in TRACKED_METRICS.items():
+            old, new = reference.get(metric), metrics.get(metric)
+            if not old or new is None:
+                continue
+            change = (old - new) / old if higher_is_better else (new - old) / old
+            if change > tolerance:
+                regressions.append(f"{case} {metric}: {old:.4g} → {new:.4g} ({change:+.0%} worse)")
+    return regressions
+
+
+def save_results(results, path):
+    directory = os.path.dirname(str(path))
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def format_results(results):
+    """Render run_benchmark results as a fixed-width text table."""
+    lines = [f"{'case':<6} {'images':>6} {'MP':>7} {'img/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'peak MB':>9}"]
+    for case, m in results["cases"].items():
+        lines.append(
+            f"{case:<6} {m['images']:>6} {m['megapixels']:>7.2f} {m['throughput_ips']:>8.2f} "
+            f"{m['latency_p50_s'] * 1000:>9.2f} {m['latency_p95_s'] * 1000:>9.2f} {m['peak_bytes'] / 1e6:>9.2f}"
+        )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the microplastics analysis pipeline")
+    parser.add_argument(
+        "--image_dir",
+        type=str,
+        default=str(DEFAULT_IMAGE_DIR),
+        help="Directory of benchmark images"
+    )
+    parser.add_argument(
+        "--scales",
+        type=float,
+        nargs="+",
+        default=[1.0, 2.0, 4.0],
+        help="Upscale factors to benchmark (e.g. 1 2 4)"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per image")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed warm-up runs per image")
+    parser.add_argument(
+        "--save",
+        type=str,
+        default=None,
+        help="Write results to this JSON file (e.g. to record a new baseline)"
+    )
+    parser.add_argument(
+        "--baseline",
+        type=str,
+        default=None,
+        help="Compare against a saved JSON baseline and exit non-zero on regressions"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="Allowed relative slowdown before a metric is flagged (default: 0.2 = 20%%)"
+    )
+    args = parser.parse_args()
+
+    cases = load_benchmark_images(args.image_dir, args.scales)
+    results = run_benchmark(cases, repeat=args.repeat, warmup=args.warmup)
+    print(format_results(results))
+
+    if args.save:
+        save_results(results, args.save)
+        print(f"Results saved to {args.save}")
+
+    if args.baseline:
+        regressions = compare_to_baseline(results, load_results(args.baseline), args.tolerance)
+        if regressions:
+            print(f"Regressions beyond {args.tolerance:.0%} tolerance:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} tolerance")
@@ -0,0 +1,274 @@
+import argparse
+import json
+import os
+import re
+import socket
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from software.frame_stacking import stack_frames
+
+DEFAULT_CALIBRATION_DIR = "calibration"
+
+# Reference frames stacked (median) into each calibration frame
+DEFAULT_REFERENCE_FRAMES = 8
+
+# The flat frame is smoothed before the gain is computed, so dust and the membrane's
+# texture aren't baked into the correction; only the slow LED falloff remains
+DEFAULT_FLAT_SIGMA = 25.0
+
+# Pixels the flat frame barely lights (dead corners, vignetting) would otherwise get
+# huge gains that only amplify noise
+MAX_GAIN = 8.0
+
+DARK_FILE = "dark.npy"
+GAIN_FILE = "gain.npy"
+META_FILE = "calibration.json"
+
+
+def settings_name(controls):
+    """
+    Directory name for a set of camera controls, e.g. "AnalogueGain-2.0_ExposureTime-20000".
+
+    Frames are only comparable with references captured at the same exposure, gain and
+    white balance, so every setting gets its own calibration. Empty controls (full auto
+    mode) map to "auto".
+    """
+    if not controls:
+        return "auto"
+    parts = []
+    for name, value in sorted(controls.items()):
+        if isinstance(value, (tuple, list)):
+            value = ",".join(str(v) for v in value)
+        parts.append(f"{name}-{value}")
+    return re.sub(r"[^\w.,-]", "", "_".join(parts))
+
+
+def calibration_path(directory=DEFAULT_CALIBRATION_DIR, device=None, settings="auto"):
+    """Directory holding the calibration of one device and setting."""
+    return Path(directory) / (device or socket.gethostname()) / settings
+
+
+@dataclass
+class Calibration:
+    """
+    Precomputed dark-frame and flat-field correction of one device and camera setting.
+
+    corrected = (raw - dark) * gain, with the subtraction saturating at 0. `dark` is the
+    median dark frame (uint8) and `gain` the per-pixel, per-channel float32 factor that
+    evens out the illumination. Either may be None to apply only the other.
+    """
+    dark: np.ndarray | None
+    gain: np.ndarray | None
+    device: str | None = None
+    settings: str | None = None
+
+    @property
+    def shape(self):
+        reference = self.dark if self.dark is not None else self.gain
+        return None if reference is None else reference.shape
+
+    def apply(self, image, dst=None):
+        """
+        Correct a BGR uint8 frame in two vectorized passes.
+
+        Args:
+            image (np.ndarray): Raw BGR frame with the calibration's shape.
+            dst (np.ndarray | None): Preallocated uint8 output (may be image itself).
+
+        Returns:
+            np.ndarray: Corrected BGR uint8 frame.
+
+        Raises:
+            ValueError: If the frame's shape doesn't match the calibration's
+        """
+        if self.shape is None:
+            return image
+        if image.shape != self.shape:
+            raise ValueError(f"Calibration is for frames of shape {self.shape}, got {image.shape}")
+        if self.dark is not None:
+            # The second pass then works in place on the first one's output
+            image = dst = cv2.subtract(image, self.dark, dst=dst)
+        if self.gain is not None:
+            image = cv2.multiply(image, self.gain, dst=dst, dtype=cv2.CV_8U)
+        return image
+
+
+def correct_frame(image, calibration=None, dst=None):
+    """Apply a calibration, or return the frame untouched when there is none (the fast path)."""
+    if calibration is None:
+        return image
+    return calibration.apply(image, dst=dst)
+
+
+def build_calibration(dark_frames=None, flat_frames=None, flat_sigma=DEFAULT_FLAT_SIGMA, max_gain=MAX_GAIN):
+    """
+    Compute the correction maps from reference frames.
+
+    Args:
+        dark_frames (list[np.ndarray] | None): Frames taken with the LEDs off.
+        flat_frames (list[np.ndarray] | None): Frames of a blank membrane under the LEDs.
+        flat_sigma (float): Gaussian smoothing of the flat frame in pixels (0 = none).
+        max_gain (float): Upper bound of the per-pixel gain.
+
+    Returns:
+        Calibration: The maps, not yet tied to a device or setting.
+
+    Raises:
+        ValueError: If neither kind of frame is given, or their shapes differ
+    """
+    if not dark_frames and not flat_frames:
+        raise ValueError("Dark or flat frames are needed")
+    dark = stack_frames(dark_frames, method="median") if dark_frames else None
+    gain = None
+    if flat_frames:
+        flat = stack_frames(flat_frames, method="median").astype(np.float32)
+        if dark is not None:
+            if dark.shape != flat.shape:
+                raise ValueError("Dark and flat frames must have the same shape")
+            flat -= dark
+        if flat_sigma > 0:
+            flat = cv2.GaussianBlur(flat, (0, 0), flat_sigma)
+        np.maximum(flat, 1.0, out=flat)
+        # Scale every channel to its mean level, so the correction evens out the
+        # illumination without changing the overall brightness
+        gain = (flat.reshape(-1, 3).mean(axis=0) / flat).astype(np.float32)
+        np.minimum(gain, max_gain, out=gain)
+    return Calibration(dark, gain)
+
+
+def save_calibration(calibration, directory=DEFAULT_CALIBRATION_DIR, device=None, settings="auto", frames=None):
+    """
+    Store a calibration as .npy maps (memory-mappable) plus a small JSON description.
+
+    Returns:
+        Path: The calibration's directory.
+    """
+    path = calibration_path(directory, device, settings)
+    path.mkdir(parents=True, exist_ok=True)
+    for name, array in ((DARK_FILE, calibration.dark), (GAIN_FILE, calibration.gain)):
+        if array is None:
+            (path / name).unlink(missing_ok=True)
+        else:
+            # Write then rename, so a reader never maps a half-written file
+            partial = path / (name + ".partial")
+            with open(partial, "wb") as f:
+                np.save(f, np.ascontiguousarray(array))
+            os.replace(partial, path / name)
+    meta = {
+        "device": device or socket.gethostname(),
+        "settings": settings,
+        "shape": list(calibration.shape),
+        "created_at": time.time(),
+        "frames": frames,
+    }
+    (path / META_FILE).write_text(json.dumps(meta, indent=2))
+    return path
+
+
+@lru_cache(maxsize=8)
+def _load_maps(path, versions):
+    """Memory-map a calibration's maps; cached until one of the files changes (versions)."""
+    maps = []
+    for name in (DARK_FILE, GAIN_FILE):
+        file = Path(path) / name
+        maps.append(np.load(file, mmap_mode="r") if file.exists() else None)
+    return maps
+
+
+def load_calibration(directory=DEFAULT_CALIBRATION_DIR, device=None, settings="auto"):
+    """
+    Load the calibration of a device and setting, memory-mapped from disk.
+
+    The maps are paged in by the OS as frames are corrected, so loading is instant and
+    the pages are shared between processes. Repeated loads of an unchanged calibration
+    return the same maps.
+
+    Returns:
+        Calibration | None: None when no calibration exists (analysis then skips the
+        correction entirely).
+    """
+    path = calibration_path(directory, device, settings)
+    versions = tuple(
+        (path / name).stat().st_mtime_ns if (path / name).exists() else None for name in (DARK_FILE, GAIN_FILE)
+    )
+    if versions == (None, None):
+        return None
+    dark, gain = _load_maps(str(path), versions)
+    return Calibration(dark, gain, device or socket.gethostname(), settings)
+
+
+def capture_calibration(camera, lights, frames=DEFAULT_REFERENCE_FRAMES, flat_sigma=DEFAULT_FLAT_SIGMA, settle_s=0.25):
+    """
+    Capture flat frames (LEDs on, blank membrane in place) and dark frames (LEDs off).
+
+    Both kinds must share one exposure, gain and white balance, so once the LEDs have
+    settled the camera's settings are locked (CameraSession.lock_settings) before any
+    reference frame is taken. In auto mode that is the exposure the camera converged on
+    under the LEDs, as it would for a sample; the calibration is still stored under the
+    session's requested settings (e.g. "auto"), which is what analysis looks it up by.
+
+    Args:
+        camera: Open CameraSession; its settings stay locked afterwards.
+        lights: Object with on()/off(), e.g. monitor.GpioLights.
+        frames (int): Frames of each kind, median-stacked.
+        flat_sigma (float): See build_calibration.
+        settle_s (float): LED stabilization time before the settings are locked.
+
+    Returns:
+        Calibration: The maps, with `settings` named after the camera's requested controls.
+    """
+    settings = settings_name(camera.controls)
+    lights.on()
+    try:
+        if settle_s:
+            time.sleep(settle_s)
+        camera.lock_settings()
+        flat_frames = list(camera.capture_burst(frames))
+    finally:
+        lights.off()
+    dark_frames = list(camera.capture_burst(frames))
+    calibration = build_calibration(dark_frames, flat_frames, flat_sigma)
+    calibration.settings = settings
+    return calibration
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Capture and store dark/flat calibration frames for this device")
+    parser.add_argument("--dir", type=str, default=DEFAULT_CALIBRATION_DIR, help="Calibration directory")
+    parser.add_argument("--device", type=str, default=None, help="Device name (default: host name)")
+    parser.add_argument("--frames", type=int, default=DEFAULT_REFERENCE_FRAMES, help="Frames of each kind to stack")
+    parser.add_argument("--shutter_us", type=int, default=None, help="Manual exposure time in microseconds")
+    parser.add_argument("--gain", type=float, default=None, help="Manual analogue gain")
+    parser.add_argument("--awbgains", type=str, default=None, help="Manual AWB gains as 'red,blue'")
+    parser.add_argument("--flat_sigma", type=float, default=DEFAULT_FLAT_SIGMA, help="Smoothing of the flat frame in pixels")
+    parser.add_argument(
+        "--fake",
+        nargs="*",
+        default=None,
+        help="Use a fake camera and LEDs, replaying the given images (for development without hardware)"
+    )
+    args = parser.parse_args()
+
+    from software.camera_session import CameraSession, FakeCameraBackend
+    from software.monitor import FakeLights, GpioLights
+
+    if args.fake is not None:
+        camera = CameraSession(backend=FakeCameraBackend(frames=args.fake), shutter_us=args.shutter_us, gain=args.gain, awbgains=args.awbgains)
+        lights = FakeLights()
+    else:
+        camera = CameraSession(shutter_us=args.shutter_us, gain=args.gain, awbgains=args.awbgains)
+        lights = GpioLights()
+    input("Place a blank membrane in the holder and press Enter...")
+    try:
+        with camera:
+            calibration = capture_calibration(camera, lights, args.frames, args.flat_sigma)
+    finally:
+        lights.close()
+    path = save_calibration(calibration, args.dir, args.device, calibration.settings, frames=args.frames)
+    print(f"Saved calibration for {calibration.shape[1]}x{calibration.shape[0]} frames to {path}")
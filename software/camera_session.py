@@ -0,0 +1,261 @@
+import itertools
+
+import cv2
+import numpy as np
+
+
+class Picamera2Backend:
+    """
+    Camera backend that keeps a Picamera2 (libcamera) camera open between captures.
+
+    picamera2 is imported when the backend starts, so this module can be imported on
+    machines without the Raspberry Pi camera stack.
+    """
+
+    def __init__(self, camera_num: int = 0, size: tuple[int, int] | None = None):
+        """
+        Args:
+            camera_num: Index of the camera to open.
+            size: Still resolution as (width, height); None uses the sensor's full resolution.
+        """
+        self.camera_num = camera_num
+        self.size = size
+        self._camera = None
+
+    def start(self, controls: dict):
+        from picamera2 import Picamera2
+
+        self._camera = Picamera2(self.camera_num)
+        # "RGB888" is laid out as BGR in memory, which is what OpenCV expects
+        main = {"format": "RGB888"}
+        if self.size is not None:
+            main["size"] = tuple(self.size)
+        self._camera.configure(self._camera.create_still_configuration(main=main))
+        if controls:
+            self._camera.set_controls(controls)
+        self._camera.start()
+
+    def set_controls(self, controls: dict):
+        self._camera.set_controls(controls)
+
+    def capture_array(self):
+        return self._camera.capture_array("main")
+
+    def capture_metadata(self):
+        return self._camera.capture_metadata()
+
+    def stop(self):
+        if self._camera is not None:
+            self._camera.stop()
+            self._camera.close()
+            self._camera = None
+
+
+class FakeCameraBackend:
+    """
+    Stand-in camera backend for tests and development on machines without a camera.
+
+    Replays the given frames (arrays or image paths) in a loop, or returns black frames
+    of `shape` when no frames are given. Applied controls are recorded so tests can
+    check what the session asked for.
+    """
+
+    def __init__(self, frames=None, shape: tuple[int, int, int] = (480, 640, 3)):
+        loaded = []
+        for frame in frames or []:
+            if not isinstance(frame, np.ndarray):
+                path = str(frame)
+                frame = cv2.imread(path)
+                if frame is None:
+                    raise FileNotFoundError(f"Image file not found: {path}")
+            loaded.append(frame)
+        self.frames = loaded or [np.zeros(shape, dtype=np.uint8)]
+        self.controls = {}
+        self.start_count = 0
+        self.capture_count = 0
+        self.running = False
+        self._cycle = None
+
+    def start(self, controls: dict):
+        self.controls = dict(controls)
+        self.start_count += 1
+        self.running = True
+        self._cycle = itertools.cycle(self.frames)
+
+    def set_controls(self, controls: dict):
+        self.controls.update(controls)
+
+    def capture_array(self):
+        if not self.running:
+            raise RuntimeError("Fake camera is not running")
+        self.capture_count += 1
+        return next(self._cycle).copy()
+
+    def capture_metadata(self):
+        # Pretend auto exposure converged on fixed values
+        return {
+            "ExposureTime": self.controls.get("ExposureTime", 10000),
+            "AnalogueGain": self.controls.get("AnalogueGain", 1.0),
+            "ColourGains": self.controls.get("ColourGains", (1.5, 1.5)),
+        }
+
+    def stop(self):
+        self.running = False
+
+
+def camera_controls(shutter_us: int | None = None, gain: float | None = None, awbgains: str | None = None):
+    """
+    Translate capture_image-style settings into libcamera controls.
+
+    Args:
+        shutter_us: Manual exposure time in microseconds (disables AE when set).
+        gain: Manual analogue gain (disables AGC when set).
+        awbgains: Manual AWB gains as "red,blue" (disables AWB when set).
+
+    Returns:
+        dict: libcamera control names mapped to values.
+
+    Raises:
+        ValueError: If awbgains isn't in "red,blue" form
+    """
+    controls = {}
+    if shutter_us is not None:
+        controls["ExposureTime"] = int(shutter_us)
+    if gain is not None:
+        controls["AnalogueGain"] = float(gain)
+    if shutter_us is not None or gain is not None:
+        controls["AeEnable"] = False
+    if awbgains:
+        try:
+            red, blue = (float(value) for value in awbgains.split(","))
+        except ValueError:
+            raise ValueError(f"awbgains must be 'red,blue', got: {awbgains}") from None
+        controls["ColourGains"] = (red, blue)
+        controls["AwbEnable"] = False
+    return controls
+
+
+class CameraSession:
+    """
+    Long-lived capture session that keeps the camera open across many captures.
+
+    Unlike capture_image, which launches libcamera-still (and pays camera start-up and
+    AE/AWB convergence) for every frame, a session configures the camera once and then
+    returns frames from `capture()` until it is closed.
+
+    Example:
+        with CameraSession(shutter_us=20000, gain=2.0, awbgains="1.8,1.2") as camera:
+            for _ in range(10):
+                count, category = analyze_image(camera.capture())
+    """
+
+    def __init__(
+        self,
+        backend=None,
+        shutter_us: int | None = None,
+        gain: float | None = None,
+        awbgains: str | None = None,
+    ):
+        """
+        Args:
+            backend: Camera backend (defaults to Picamera2Backend; use FakeCameraBackend in tests).
+            shutter_us: Manual exposure time in microseconds, fixed for the whole session.
+            gain: Manual analogue gain, fixed for the whole session.
+            awbgains: Manual AWB gains as "red,blue", fixed for the whole session.
+        """
+        self.backend = backend if backend is not None else Picamera2Backend()
+        self.controls = camera_controls(shutter_us, gain, awbgains)
+        self.is_open = False
+        self.frame_count = 0
+
+    def open(self):
+        """Start the camera with the session's controls. Does nothing if already open."""
+        if not self.is_open:
+            try:
+                self.backend.start(self.controls)
+            except Exception as exc:
+                raise RuntimeError("Failed to open camera. Check camera connection and permissions.") from exc
+            self.is_open = True
+        return self
+
+    def lock_settings(self):
+        """
+        Freeze the exposure, gain and white balance the camera has converged on.
+
+        Use this after opening a session in auto mode so every later frame is captured
+        with identical settings.
+
+        Returns:
+            dict: The controls now applied to the camera.
+        """
+        self._require_open()
+        metadata = self.backend.capture_metadata()
+        locked = {"AeEnable": False, "AwbEnable": False}
+        for name in ("ExposureTime", "AnalogueGain", "ColourGains"):
+            if name in metadata:
+                locked[name] = metadata[name]
+        self.backend.set_controls(locked)
+        self.controls.update(locked)
+        return dict(self.controls)
+
+    def capture(self):
+        """
+        Capture one frame from the open camera.
+
+        Returns:
+            np.ndarray: BGR uint8 image of shape (height, width, 3).
+
+        Raises:
+            RuntimeError: If the session isn't open or the camera returns no frame.
+        """
+        self._require_open()
+        frame = self.backend.capture_array()
+        if frame is None:
+            raise RuntimeError("Image capture failed. Camera returned no frame.")
+        if frame.ndim == 3 and frame.shape[2] == 4:
+            # Drop the padding channel of XBGR/XRGB formats
+            frame = frame[:, :, :3]
+        self.frame_count += 1
+        return frame
+
+    def capture_burst(self, count: int):
+        """
+        Capture `count` frames back to back with the session's fixed settings.
+
+        Frames are yielded one at a time, so a consumer that folds them into a running
+        stack (see software/frame_stacking.py) only ever holds one frame.
+
+        Yields:
+            np.ndarray: BGR uint8 frames.
+
+        Raises:
+            ValueError: If count is less than 1
+            RuntimeError: If the session isn't open or the camera returns no frame.
+        """
+        if count < 1:
+            raise ValueError("count must be at least 1")
+        self._require_open()
+        for _ in range(count):
+            yield self.capture()
+
+    def close(self):
+        """Stop the camera and release it. Safe to call more than once."""
+        if self.is_open:
+            self.backend.stop()
+            self.is_open = False
+
+    def _require_open(self):
+        if not self.is_open:
+            raise RuntimeError("Camera session is not open")
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+if __name__ == "__main__":
+    with CameraSession() as camera:
+        frame = camera.capture()
+    print(f"Frame captured successfully: {frame.shape[1]}x{frame.shape[0]}")
@@ -1,7 +1,57 @@
 import os
 import subprocess
+import threading
 from datetime import datetime
 
+import cv2
+import numpy as np
+
+def _sample_path(output_dir):
+    """Create output_dir if needed and return a timestamped `sample_YYYYMMDD_HHMMSS.jpg` path inside it."""
+    os.makedirs(output_dir, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return f"{output_dir}/sample_{timestamp}.jpg"
+
+def _build_command(
+    output: str,
+    timeout_ms: int,
+    shutter_us: int | None,
+    gain: float | None,
+    iso: int | None,
+    metering: str | None,
+    roi: str | None,
+    awb: str | None,
+    awbgains: str | None,
+):
+    """Build the libcamera-still command line; `output` is a file path or "-" for stdout."""
+    cmd = [
+        "libcamera-still",
+        "-o", output,
+        "--nopreview",
+        "--timeout", str(timeout_ms),
+    ]
+
+    # Manual exposure controls
+    if shutter_us is not None:
+        cmd += ["--shutter", str(shutter_us)]
+    if gain is not None:
+        cmd += ["--gain", str(gain)]
+    if iso is not None:
+        cmd += ["--iso", str(iso)]
+
+    # Metering / ROI / AWB controls
+    if metering:
+        cmd += ["--metering", metering]
+    if roi:
+        # ROI is normalized floats: "x,y,w,h" in [0,1]
+        cmd += ["--roi", roi]
+    if awb:
+        cmd += ["--awb", awb]
+    if awbgains:
+        cmd += ["--awbgains", awbgains]
+
+    return cmd
+
 def capture_image(
     output_dir: str = "captures",
     timeout_ms: int = 1000,
@@ -35,36 +85,8 @@ def capture_image(
         RuntimeError: If image capture fails.
     """
 
-    os.makedirs(output_dir, exist_ok=True)
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    image_path = f"{output_dir}/sample_{timestamp}.jpg"
-    
-    # Build libcamera-still command
-    cmd = [
-        "libcamera-still",
-        "-o", image_path,
-        "--nopreview",
-        "--timeout", str(timeout_ms),
-    ]
-
-    # Manual exposure controls
-    if shutter_us is not None:
-        cmd += ["--shutter", str(shutter_us)]
-    if gain is not None:
-        cmd += ["--gain", str(gain)]
-    if iso is not None:
-        cmd += ["--iso", str(iso)]
-
-    # Metering / ROI / AWB controls
-    if metering:
-        cmd += ["--metering", metering]
-    if roi:
-        # ROI is normalized floats: "x,y,w,h" in [0,1]
-        cmd += ["--roi", roi]
-    if awb:
-        cmd += ["--awb", awb]
-    if awbgains:
-        cmd += ["--awbgains", awbgains]
+    image_path = _sample_path(output_dir)
+    cmd = _build_command(image_path, timeout_ms, shutter_us, gain, iso, metering, roi, awb, awbgains)
 
     print(f"Capturing image to {image_path}...")
     result = subprocess.run(cmd)
@@ -74,6 +96,71 @@ def capture_image(
     
     return image_path
 
+def capture_frame(
+    timeout_ms: int = 1000,
+    shutter_us: int | None = None,
+    gain: float | None = None,
+    iso: int | None = None,
+    metering: str | None = None,
+    roi: str | None = None,
+    awb: str | None = None,
+    awbgains: str | None = None,
+):
+    """
+    Capture an image with libcamera-still and return it in memory, without writing a file.
+
+    libcamera-still streams the encoded frame to stdout, which is decoded straight into a
+    BGR array ready for analyze_image. Use save_image_async to persist the frame if needed.
+
+    Args:
+        Same camera controls as capture_image.
+
+    Returns:
+        np.ndarray: Captured BGR image.
+
+    Raises:
+        RuntimeError: If image capture fails or the frame can't be decoded.
+    """
+    cmd = _build_command("-", timeout_ms, shutter_us, gain, iso, metering, roi, awb, awbgains)
+
+    print("Capturing image to memory...")
+    result = subprocess.run(cmd, stdout=subprocess.PIPE)
+
+    if result.returncode != 0:
+        raise RuntimeError("Image capture failed. Check camera connection and permissions.")
+
+    data = np.frombuffer(result.stdout or b"", dtype=np.uint8)
+    image = cv2.imdecode(data, cv2.IMREAD_COLOR) if data.size else None
+    if image is None:
+        raise RuntimeError("Image capture failed. Camera returned an unreadable frame.")
+
+    return image
+
+def save_image_async(image, output_dir: str = "captures"):
+    """
+    Write a captured frame to `output_dir` as a JPEG on a background thread.
+
+    The write runs on a non-daemon thread, so it always completes before the
+    interpreter exits. The caller must not modify `image` until the thread finishes.
+
+    Args:
+        image: BGR image array to save.
+        output_dir: Directory to save the image.
+
+    Returns:
+        image_path (str): Path the image is being written to.
+        writer (threading.Thread): Started writer thread; join() it to wait for the file.
+    """
+    image_path = _sample_path(output_dir)
+
+    def _write():
+        if not cv2.imwrite(image_path, image):
+            print(f"Failed to save image to {image_path}")
+
+    writer = threading.Thread(target=_write, name="capture-writer")
+    writer.start()
+    return image_path, writer
+
 if __name__ == "__main__":
     image_path = capture_image()
     print(f"Image captured successfully: {image_path}")
\ No newline at end of file
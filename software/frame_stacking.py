@@ -0,0 +1,158 @@
+import cv2
+import numpy as np
+
+STACK_METHODS = ("median", "mean")
+
+
+def _gray(frame):
+    """Float32 grayscale copy used for alignment."""
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY).astype(np.float32)
+
+
+def estimate_shift(reference_gray, frame_gray, window=None):
+    """
+    Sub-pixel translation of a frame relative to the reference, by phase correlation.
+
+    Args:
+        reference_gray (np.ndarray): float32 grayscale reference frame.
+        frame_gray (np.ndarray): float32 grayscale frame of the same size.
+        window (np.ndarray | None): Hanning window from cv2.createHanningWindow, which
+            suppresses the edge effects of the FFT (reuse one across a burst).
+
+    Returns:
+        tuple[float, float]: (dx, dy) such that frame ≈ reference shifted by (dx, dy).
+    """
+    (dx, dy), _ = cv2.phaseCorrelate(reference_gray, frame_gray, window)
+    return dx, dy
+
+
+def align_frame(frame, shift):
+    """Shift a frame back by `shift` (as returned by estimate_shift), with sub-pixel interpolation."""
+    dx, dy = shift
+    matrix = np.float32([[1, 0, -dx], [0, 1, -dy]])
+    height, width = frame.shape[:2]
+    return cv2.warpAffine(frame, matrix, (width, height), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REFLECT)
+
+
+def stack_frames(frames, method="median", align=False):
+    """
+    Combine a burst of frames of the same sample into one lower-noise frame.
+
+    The median rejects speckle that appears in a minority of frames; the mean averages
+    sensor noise down by sqrt(K). Both run as one vectorized operation over the K
+    frames (the median uses a partial sort along the frame axis, not a full sort).
+
+    Args:
+        frames (list[np.ndarray]): K BGR uint8 frames of identical shape.
+        method (str): "median" or "mean".
+        align (bool): Register every frame to the first with sub-pixel phase correlation
+            before stacking (for camera or stage vibration between frames).
+
+    Returns:
+        np.ndarray: Stacked BGR uint8 frame.
+
+    Raises:
+        ValueError: If frames is empty, shapes differ, or method is unknown
+    """
+    if method not in STACK_METHODS:
+        raise ValueError(f"method must be one of {', '.join(STACK_METHODS)}")
+    frames = list(frames)
+    if not frames:
+        raise ValueError("At least one frame is needed")
+    if any(frame.shape != frames[0].shape for frame in frames):
+        raise ValueError("All frames must have the same shape")
+    if len(frames) == 1:
+        return frames[0].copy()
+
+    if align:
+        reference = _gray(frames[0])
+        window = cv2.createHanningWindow(reference.shape[::-1], cv2.CV_32F)
+        frames = [frames[0]] + [align_frame(frame, estimate_shift(reference, _gray(frame), window)) for frame in frames[1:]]
+
+    stack = np.stack(frames)
+    count = len(frames)
+    if method == "mean":
+        mean = stack.mean(axis=0, dtype=np.float32)
+        return np.clip(np.rint(mean), 0, 255).astype(np.uint8)
+
+    middle = count // 2
+    if count % 2:
+        return np.partition(stack, middle, axis=0)[middle]
+    # Even K: average the two middle values
+    parted = np.partition(stack, [middle - 1, middle], axis=0)
+    return ((parted[middle - 1].astype(np.uint16) + parted[middle] + 1) // 2).astype(np.uint8)
+
+
+class StackAccumulator:
+    """
+    Streaming mean stack: memory is one float32 frame plus the alignment reference,
+    whatever the number of frames added.
+
+    Example:
+        accumulator = StackAccumulator(align=True)
+        for frame in camera.capture_burst(16):
+            accumulator.add(frame)
+        stacked = accumulator.result()
+    """
+
+    def __init__(self, align=False):
+        self.align = align
+        self.count = 0
+        self._sum = None
+        self._reference = None
+        self._window = None
+        self.shifts = []
+
+    def add(self, frame):
+        """Add one BGR uint8 frame to the stack."""
+        if self._sum is None:
+            self._sum = np.zeros(frame.shape, dtype=np.float32)
+            if self.align:
+                self._reference = _gray(frame)
+                self._window = cv2.createHanningWindow(self._reference.shape[::-1], cv2.CV_32F)
+        elif frame.shape != self._sum.shape:
+            raise ValueError("All frames must have the same shape")
+        elif self.align:
+            shift = estimate_shift(self._reference, _gray(frame), self._window)
+            self.shifts.append(shift)
+            frame = align_frame(frame, shift)
+        cv2.accumulate(frame, self._sum)
+        self.count += 1
+
+    def result(self):
+        """
+        Mean of the frames added so far.
+
+        Returns:
+            np.ndarray: BGR uint8 frame.
+
+        Raises:
+            ValueError: If no frame has been added
+        """
+        if self.count == 0:
+            raise ValueError("No frames have been added")
+        return cv2.convertScaleAbs(self._sum, alpha=1.0 / self.count)
+
+
+def capture_stacked(camera, count, method="median", align=False):
+    """
+    Capture a burst from an open CameraSession and stack it.
+
+    The mean is accumulated frame by frame as the burst arrives, so memory doesn't grow
+    with `count`; the median needs every frame at once.
+
+    Args:
+        camera (CameraSession): Open session; keep the sample lit for the whole call.
+        count (int): Frames in the burst.
+        method (str): "median" or "mean".
+        align (bool): Register frames to the first before stacking.
+
+    Returns:
+        np.ndarray: Stacked BGR uint8 frame.
+    """
+    if method == "mean":
+        accumulator = StackAccumulator(align=align)
+        for frame in camera.capture_burst(count):
+            accumulator.add(frame)
+        return accumulator.result()
+    return stack_frames(list(camera.capture_burst(count)), method=method, align=align)
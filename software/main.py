@@ -1,18 +1,84 @@
+import time
+from pathlib import Path
+
 from software.illuminate_sample import illuminate_sample, cleanup
-from software.capture_image import capture_image
-from software.analyze_microplastics import analyze_microplastics
+from software.capture_image import capture_frame, save_image_async
+from software.camera_session import CameraSession
+from software.analyze_microplastics import analyze_image, measure_image
+from software.frame_stacking import StackAccumulator, stack_frames
+from software.calibration import correct_frame
+
+def _capture_burst(count, method="median"):
+    """
+    Capture `count` frames through one camera session and stack them.
+
+    The camera is started once for the whole burst instead of once per frame. The first
+    frame is taken with auto exposure and white balance; the settings it converged on
+    are then locked, so the rest of the burst matches it. The mean is accumulated as the
+    frames arrive, so it holds one frame at a time; the median needs the whole burst.
+    """
+    with CameraSession() as camera:
+        first = camera.capture()
+        camera.lock_settings()
+        if method == "mean":
+            accumulator = StackAccumulator()
+            accumulator.add(first)
+            for frame in camera.capture_burst(count - 1):
+                accumulator.add(frame)
+            return accumulator.result()
+        return stack_frames([first, *camera.capture_burst(count - 1)], method=method)
+
+def run_capture_and_analysis(save_capture=True, burst=1, stack_method="median", store=None, calibration=None, renderer=None):
+    """
+    Illuminate the sample, capture a frame in memory and analyze it.
 
-def run_capture_and_analysis():
+    Args:
+        save_capture (bool): Also persist the frame under captures/ as a JPEG. The write
+            happens on a background thread while the frame is being analyzed.
+        burst (int): Capture this many frames under the same illumination and stack them
+            into one lower-noise frame before analysis. The burst runs through one
+            CameraSession with the exposure locked after the first frame.
+        stack_method (str): "median" or "mean" (see software/frame_stacking.py).
+        store (ResultsStore | None): Append the result, with its per-particle table, to
+            this results store (see software/results_store.py).
+        calibration (Calibration | None): Dark/flat correction applied to the frame before
+            analysis (see software/calibration.py); the saved capture stays uncorrected.
+        renderer (OverlayRenderer | None): Queue an overlay and thumbnail of the result
+            (see software/overlays.py). They are drawn on a background thread after the
+            count is printed.
+    """
+    writer = None
     try:
         illuminate_sample()
-        # Capture image with lights on
-        path = capture_image()
-        count, level = analyze_microplastics(path)
+        # Capture image with lights on, straight into memory
+        if burst > 1:
+            frame = _capture_burst(burst, stack_method)
+        else:
+            frame = capture_frame()
+        path = None
+        if save_capture:
+            path, writer = save_image_async(frame)
+        frame = correct_frame(frame, calibration)
+        if store is None and renderer is None:
+            count, level = analyze_image(frame)
+        else:
+            # The store keeps each particle's hue; an overlay only needs positions and
+            # sizes, so rendering alone doesn't pay for the hue pass
+            particles, level = measure_image(frame) if store is not None else measure_image(frame, hue=False)
+            count = len(particles)
+            if store is not None:
+                store.add_result(count, level, image_path=path, particles=particles)
         print(f"Detected particles: {count} → Category: {level}")
+        if renderer is not None:
+            name = Path(path).stem if path else time.strftime("sample_%Y%m%d_%H%M%S")
+            renderer.submit(frame, particles, name, category=level)
     finally:
         # Ensure lights are turned off even if capture fails
         illuminate_sample(lights=False)
         cleanup()
+        # Make sure the capture has reached the disk before returning
+        if writer is not None:
+            writer.join()
 
 if __name__ == "__main__":
-    run_capture_and_analysis()
\ No newline at end of file
+    run_capture_and_analysis()
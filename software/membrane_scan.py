@@ -0,0 +1,274 @@
+import argparse
+from collections import deque
+from dataclasses import dataclass, field
+
+import cv2
+import numpy as np
+
+from software.analyze_microplastics import Analyzer, _validate_image
+from software.frame_stacking import _gray
+from software.image_decode import load_image
+
+# Centroids of one particle seen in two overlapping frames differ by the registration
+# error, and by up to half the particle's size when one frame only sees part of it
+MATCH_RADIUS = 6.0
+
+# Earlier frames whose particles a new frame is de-duplicated against. In a serpentine
+# scan the first frame of a row overlaps the last frame of the previous row, but also
+# the first frame of the row before, so the window must span two rows of the scan.
+# Only centroids are kept, so a generous window costs little memory.
+DEFAULT_WINDOW = 32
+
+# Frames are registered on a downscaled copy; phase correlation is sub-pixel, so the
+# error stays around a pixel of the full-resolution frame
+DEFAULT_REGISTER_SCALE = 2
+
+# Phase-correlation peaks below this are treated as failed registrations
+MIN_RESPONSE = 0.05
+
+
+@dataclass
+class ScanFrame:
+    """Result of adding one frame to a scan."""
+    index: int
+    # Top-left corner of the frame in scan (mosaic) coordinates, in pixels
+    position: tuple[float, float]
+    # Phase-correlation peak of the registration (1.0 for the first frame or a given position)
+    response: float
+    particles: int
+    new: int
+    duplicates: int
+    total: int
+
+
+@dataclass
+class _WindowFrame:
+    """What the de-duplication window keeps of an earlier frame: its footprint and particle centroids."""
+    left: float
+    top: float
+    right: float
+    bottom: float
+    centroids: np.ndarray = field(repr=False)
+    radii: np.ndarray = field(repr=False)
+
+
+class MembraneScan:
+    """
+    Whole-membrane count from a sequence of overlapping frames, built up frame by frame.
+
+    Each new frame is registered against the previous one by phase correlation, which
+    places it in scan coordinates, and is analyzed straight away. Registration needs
+    consecutive frames to be shifted by less than half a frame in each direction;
+    for larger steps pass the stage position to add_frame. Its particles' centroids
+    are moved into scan coordinates and compared with the particles of the last `window`
+    frames. A particle whose centroid lies inside an earlier frame's footprint and within
+    the match radius of a particle already counted there is a duplicate. Everything else
+    is added to the running total.
+
+    Only the previous frame (downscaled, for registration) and the centroids of the
+    window are kept, so memory stays the same however large the scan grows. The optional
+    mosaic preview is stored at 1/mosaic_scale resolution.
+
+    Example:
+        scan = MembraneScan(mosaic_scale=8)
+        with CameraSession() as camera:
+            for _ in range(12):
+                move_stage_to_next_field()
+                print(scan.add_frame(camera.capture()).total)
+        cv2.imwrite("mosaic.jpg", scan.mosaic)
+    """
+
+    def __init__(
+        self,
+        analyzer=None,
+        match_radius=MATCH_RADIUS,
+        window=DEFAULT_WINDOW,
+        register_scale=DEFAULT_REGISTER_SCALE,
+        min_response=MIN_RESPONSE,
+        mosaic_scale=None,
+        **analysis_kwargs,
+    ):
+        """
+        Args:
+            analyzer (Analyzer | None): Analyzer used for every frame (defaults to one
+                built from analysis_kwargs).
+            match_radius (float): Minimum centroid distance (pixels) below which two
+                particles in overlapping frames are the same particle.
+            window (int): Earlier frames to de-duplicate against.
+            register_scale (int): Downscale factor of the registration copies.
+            min_response (float): Registrations with a weaker phase-correlation peak raise
+                ValueError (pass the frame's position to add_frame instead).
+            mosaic_scale (int | None): Also stitch a preview mosaic at 1/mosaic_scale resolution.
+            **analysis_kwargs: min_area, max_area, ... for the default analyzer.
+
+        Raises:
+            ValueError: If window, register_scale or mosaic_scale is less than 1
+        """
+        if window < 1 or register_scale < 1 or (mosaic_scale is not None and mosaic_scale < 1):
+            raise ValueError("window, register_scale and mosaic_scale must be at least 1")
+        self.analyzer = analyzer if analyzer is not None else Analyzer(**analysis_kwargs)
+        self.match_radius = match_radius
+        self.register_scale = register_scale
+        self.min_response = min_response
+        self.mosaic_scale = mosaic_scale
+        self.total = 0
+        self.frames = 0
+        self.positions = []
+        self._window = deque(maxlen=window)
+        self._previous = None
+        self._hanning = None
+        self._mosaic = None
+        self._mosaic_origin = (0, 0)
+
+    def _registration_copy(self, frame):
+        gray = _gray(frame)
+        if self.register_scale > 1:
+            gray = cv2.resize(gray, None, fx=1 / self.register_scale, fy=1 / self.register_scale, interpolation=cv2.INTER_AREA)
+        return gray
+
+    def register(self, frame):
+        """
+        Position of a frame in scan coordinates, from its shift relative to the previous frame.
+
+        Returns:
+            position (tuple[float, float]): (x, y) of the frame's top-left corner.
+            response (float): Phase-correlation peak (higher is more reliable).
+        """
+        return self._register(self._registration_copy(frame))
+
+    def _register(self, gray):
+        if self._previous is None:
+            return (0.0, 0.0), 1.0
+        previous_gray, (x, y) = self._previous
+        if previous_gray.shape != gray.shape:
+            raise ValueError("All frames of a scan must have the same size")
+        if self._hanning is None or self._hanning.shape != gray.shape:
+            self._hanning = cv2.createHanningWindow(gray.shape[::-1], cv2.CV_32F)
+        (dx, dy), response = cv2.phaseCorrelate(previous_gray, gray, self._hanning)
+        # The content moves opposite to the camera
+        return (x - dx * self.register_scale, y - dy * self.register_scale), response
+
+    def add_frame(self, frame, position=None):
+        """
+        Register, analyze and de-duplicate the next frame of the scan.
+
+        Args:
+            frame (np.ndarray): BGR uint8 frame overlapping the previous one.
+            position (tuple[float, float] | None): Known (x, y) of the frame's top-left
+                corner in scan pixels, e.g. from a motorized stage; skips registration.
+
+        Returns:
+            ScanFrame: Counts for this frame and the running total.
+
+        Raises:
+            ValueError: If the frame isn't a BGR uint8 array, differs in size from the
+                previous frames, or can't be registered
+        """
+        _validate_image(frame)
+        gray = self._registration_copy(frame)
+        if position is None:
+            position, response = self._register(gray)
+            if response < self.min_response:
+                raise ValueError(
+                    f"Frame {self.frames} could not be registered (response {response:.3f}); "
+                    "make sure consecutive frames overlap, or pass its position"
+                )
+        else:
+            position, response = (float(position[0]), float(position[1])), 1.0
+        particles, _ = self.analyzer.measure(frame)
+
+        x, y = position
+        height, width = frame.shape[:2]
+        centroids = np.column_stack([particles["cx"] + x, particles["cy"] + y])
+        radii = 0.5 * np.maximum(particles["width"], particles["height"]).astype(np.float64)
+        duplicate = self._duplicates(centroids, radii, (x, y, x + width, y + height))
+        new = int(np.count_nonzero(~duplicate))
+
+        self._window.append(_WindowFrame(x, y, x + width, y + height, centroids, radii))
+        self._previous = (gray, position)
+        if self.mosaic_scale is not None:
+            self._paste(frame, position)
+        self.total += new
+        self.positions.append(position)
+        result = ScanFrame(self.frames, position, response, len(particles), new, int(np.count_nonzero(duplicate)), self.total)
+        self.frames += 1
+        return result
+
+    def _duplicates(self, centroids, radii, footprint):
+        """Which of a frame's particles were already counted in a window frame."""
+        duplicate = np.zeros(len(centroids), dtype=bool)
+        left, top, right, bottom = footprint
+        for earlier in self._window:
+            # Only the overlap of the two footprints can hold particles seen twice
+            overlap = (max(left, earlier.left), max(top, earlier.top), min(right, earlier.right), min(bottom, earlier.bottom))
+            if overlap[0] >= overlap[2] or overlap[1] >= overlap[3]:
+                continue
+            candidates = np.flatnonzero(~duplicate & _inside(centroids, overlap, self.match_radius))
+            known = np.flatnonzero(_inside(earlier.centroids, overlap, self.match_radius))
+            if not len(candidates) or not len(known):
+                continue
+            distance = np.linalg.norm(centroids[candidates, None, :] - earlier.centroids[None, known, :], axis=2)
+            # A particle one frame only saw part of can have its centroid up to half its size away
+            limit = np.maximum(self.match_radius, np.maximum(radii[candidates, None], earlier.radii[None, known]))
+            duplicate[candidates[(distance <= limit).any(axis=1)]] = True
+        return duplicate
+
+    def _paste(self, frame, position):
+        """Add the frame to the preview mosaic, growing the canvas as the scan extends."""
+        scale = self.mosaic_scale
+        small = cv2.resize(frame, None, fx=1 / scale, fy=1 / scale, interpolation=cv2.INTER_AREA)
+        col, row = int(round(position[0] / scale)), int(round(position[1] / scale))
+        if self._mosaic is None:
+            self._mosaic = np.zeros_like(small)
+            self._mosaic_origin = (col, row)
+        origin_col, origin_row = self._mosaic_origin
+        height, width = self._mosaic.shape[:2]
+        # Grow the canvas (shifting the origin when the scan moves up or left)
+        grow_left = max(0, origin_col - col)
+        grow_top = max(0, origin_row - row)
+        grow_right = max(0, col + small.shape[1] - (origin_col + width))
+        grow_bottom = max(0, row + small.shape[0] - (origin_row + height))
+        if grow_left or grow_top or grow_right or grow_bottom:
+            self._mosaic = cv2.copyMakeBorder(self._mosaic, grow_top, grow_bottom, grow_left, grow_right, cv2.BORDER_CONSTANT, value=0)
+            self._mosaic_origin = origin_col, origin_row = origin_col - grow_left, origin_row - grow_top
+        top, left = row - origin_row, col - origin_col
+        self._mosaic[top:top + small.shape[0], left:left + small.shape[1]] = small
+
+    @property
+    def mosaic(self):
+        """Stitched preview of the frames so far at 1/mosaic_scale resolution (None without mosaic_scale)."""
+        return self._mosaic
+
+
+def _inside(centroids, box, margin):
+    """Centroids within margin of the box (left, top, right, bottom)."""
+    left, top, right, bottom = box
+    x, y = centroids[:, 0], centroids[:, 1]
+    return (x >= left - margin) & (x < right + margin) & (y >= top - margin) & (y < bottom + margin)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Count particles over a whole membrane from overlapping frames")
+    parser.add_argument("images", nargs="+", help="Frames in scan order")
+    parser.add_argument("--match_radius", type=float, default=MATCH_RADIUS, help="Centroid distance (pixels) of duplicate particles")
+    parser.add_argument("--window", type=int, default=DEFAULT_WINDOW, help="Earlier frames checked for duplicates")
+    parser.add_argument("--mosaic", type=str, default=None, help="Write a preview mosaic to this image file")
+    parser.add_argument("--mosaic_scale", type=int, default=8, help="Downscale factor of the preview mosaic")
+    parser.add_argument("--min_area", type=int, default=10, help="Minimum particle area in pixels")
+    parser.add_argument("--max_area", type=int, default=5000, help="Maximum particle area in pixels")
+    args = parser.parse_args()
+
+    scan = MembraneScan(
+        match_radius=args.match_radius,
+        window=args.window,
+        mosaic_scale=args.mosaic_scale if args.mosaic else None,
+        min_area=args.min_area,
+        max_area=args.max_area,
+    )
+    for image_path in args.images:
+        result = scan.add_frame(load_image(image_path))
+        print(f"{image_path}: at ({result.position[0]:.0f}, {result.position[1]:.0f}), "
+              f"{result.new} new + {result.duplicates} already counted → total {result.total}")
+    if args.mosaic:
+        cv2.imwrite(args.mosaic, scan.mosaic)
+        print(f"Mosaic written to {args.mosaic}")
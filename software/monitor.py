@@ -0,0 +1,376 @@
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import cv2
+
+from software.analyze_microplastics import analyze_image
+from software.calibration import DEFAULT_CALIBRATION_DIR, load_calibration, settings_name
+from software.camera_session import CameraSession, FakeCameraBackend
+from software.frame_stacking import STACK_METHODS, capture_stacked
+from software.results_store import ResultsStore
+
+# Time the LEDs need to reach full brightness before a frame is exposed
+LED_SETTLE_S = 0.25
+
+
+class GpioLights:
+    """
+    The sample LEDs from software/illuminate_sample.py, switched without its fixed delays.
+
+    illuminate_sample is imported when the lights are created (it claims the GPIO pins on
+    import), so this module can be imported on machines without gpiozero.
+    """
+
+    def __init__(self):
+        from software import illuminate_sample
+
+        self._module = illuminate_sample
+        self._leds = (illuminate_sample.led_gen, illuminate_sample.led_3mm, illuminate_sample.led_diff)
+
+    def on(self):
+        for led in self._leds:
+            led.on()
+
+    def off(self):
+        for led in self._leds:
+            led.off()
+
+    def close(self):
+        self.off()
+        self._module.cleanup()
+
+
+class FakeLights:
+    """
+    Stand-in for the LEDs in tests: records every on/off switch and the total lit time.
+    """
+
+    def __init__(self):
+        self.is_on = False
+        self.events = []
+        self.lit_s = 0.0
+        self._on_since = None
+
+    def on(self):
+        if not self.is_on:
+            self.is_on = True
+            self._on_since = time.perf_counter()
+            self.events.append("on")
+
+    def off(self):
+        if self.is_on:
+            self.is_on = False
+            self.lit_s += time.perf_counter() - self._on_since
+            self.events.append("off")
+
+    def close(self):
+        self.off()
+
+
+@dataclass
+class MonitorResult:
+    """Analysis result of one monitored frame."""
+    index: int
+    captured_at: float
+    count: int
+    category: str
+    # Time from lights on to frame in memory, and time spent in analysis
+    capture_s: float
+    analysis_s: float
+
+
+@dataclass
+class MonitorStats:
+    """Running totals of a monitoring session."""
+    captured: int = 0
+    analyzed: int = 0
+    failed: int = 0
+    lit_s: float = 0.0
+    # Times capture waited because the analysis queue was full
+    backpressure_waits: int = 0
+    started_at: float = field(default_factory=time.perf_counter)
+    finished_at: float | None = None
+
+    @property
+    def frames_per_minute(self):
+        """Sustained analysis rate over the run (so far, while it is still running)."""
+        elapsed = (self.finished_at or time.perf_counter()) - self.started_at
+        return 60.0 * self.analyzed / elapsed if elapsed > 0 else 0.0
+
+
+class Monitor:
+    """
+    Continuous capture/analysis scheduler.
+
+    One asyncio task captures frames and puts them on a bounded queue; `workers` tasks
+    take frames off the queue and analyze them in an executor. Capture of frame N+1
+    therefore overlaps with analysis of frame N, and when analysis falls behind, the
+    full queue makes capture wait (backpressure) instead of piling frames up in memory.
+
+    The LEDs are switched on just before each exposure (plus `settle_s` for them to
+    stabilize) and off as soon as the frame is in memory, so they stay dark while frames
+    are analyzed or the scheduler waits for the next interval.
+
+    The camera is opened on the first run and left open, so consecutive runs don't pay
+    camera start-up again; close it (and the lights) when monitoring is over.
+
+    Example:
+        monitor = Monitor(CameraSession(backend=FakeCameraBackend()), FakeLights())
+        results = monitor.run(max_frames=10)
+    """
+
+    def __init__(
+        self,
+        camera,
+        lights,
+        analyze=analyze_image,
+        interval_s=0.0,
+        queue_size=2,
+        workers=1,
+        settle_s=LED_SETTLE_S,
+        executor=None,
+        on_result=None,
+        burst=1,
+        stack_method="median",
+        align=False,
+        **analysis_kwargs,
+    ):
+        """
+        Args:
+            camera: CameraSession (opened by the monitor if it isn't open yet).
+            lights: Object with on()/off()/close(), e.g. GpioLights or FakeLights.
+            analyze (callable): Analysis function taking a BGR frame (defaults to analyze_image).
+            interval_s (float): Minimum time between capture starts; 0 captures as fast as
+                the analysis keeps up.
+            queue_size (int): Frames allowed to wait for analysis before capture blocks.
+            workers (int): Frames analyzed concurrently.
+            settle_s (float): LED stabilization time before each exposure.
+            executor (Executor | None): Where analysis runs. Defaults to a thread pool of
+                `workers` threads (OpenCV releases the GIL); pass a ProcessPoolExecutor to
+                use separate processes (analyze and its kwargs must then be picklable).
+            on_result (callable | None): Called with each MonitorResult as it is ready.
+            burst (int): Frames captured per sample under one illumination window and
+                stacked into one frame before analysis (1 = single frame).
+            stack_method (str): "median" or "mean" (see software/frame_stacking.py).
+            align (bool): Register burst frames with sub-pixel phase correlation before stacking.
+            **analysis_kwargs: Forwarded to analyze (min_area, max_area, ...).
+
+        Raises:
+            ValueError: If queue_size, workers or burst is less than 1, interval_s/settle_s is
+                negative, or stack_method is unknown
+        """
+        if queue_size < 1 or workers < 1 or burst < 1:
+            raise ValueError("queue_size, workers and burst must be at least 1")
+        if stack_method not in STACK_METHODS:
+            raise ValueError(f"stack_method must be one of {', '.join(STACK_METHODS)}")
+        if interval_s < 0 or settle_s < 0:
+            raise ValueError("interval_s and settle_s must be non-negative")
+        self.camera = camera
+        self.lights = lights
+        self.analyze = analyze
+        self.analysis_kwargs = analysis_kwargs
+        self.interval_s = interval_s
+        self.queue_size = queue_size
+        self.workers = workers
+        self.settle_s = settle_s
+        self.executor = executor
+        self.on_result = on_result
+        self.burst = burst
+        self.stack_method = stack_method
+        self.align = align
+        self.stats = MonitorStats()
+        self._stop = None
+
+    def stop(self):
+        """
+        Ask a running monitor to finish after the frames already captured.
+
+        Call it from the event loop (e.g. from on_result or another task); from other
+        threads use loop.call_soon_threadsafe(monitor.stop).
+        """
+        if self._stop is not None:
+            self._stop.set()
+
+    def _capture(self):
+        if self.burst == 1:
+            return self.camera.capture()
+        return capture_stacked(self.camera, self.burst, self.stack_method, self.align)
+
+    async def _capture_loop(self, queue, capture_executor, max_frames, duration_s):
+        loop = asyncio.get_running_loop()
+        deadline = None if duration_s is None else time.perf_counter() + duration_s
+        index = 0
+        try:
+            while not self._stop.is_set():
+                if max_frames is not None and index >= max_frames:
+                    break
+                if deadline is not None and time.perf_counter() >= deadline:
+                    break
+                started = time.perf_counter()
+
+                self.lights.on()
+                try:
+                    if self.settle_s:
+                        await asyncio.sleep(self.settle_s)
+                    # The camera is driven from one dedicated thread; the event loop stays free
+                    frame = await loop.run_in_executor(capture_executor, self._capture)
+                finally:
+                    self.lights.off()
+                    self.stats.lit_s += time.perf_counter() - started
+                captured_at = time.time()
+                capture_s = time.perf_counter() - started
+                self.stats.captured += 1
+
+                if queue.full():
+                    self.stats.backpressure_waits += 1
+                await queue.put((index, captured_at, capture_s, frame))
+                index += 1
+
+                if self.interval_s:
+                    remaining = self.interval_s - (time.perf_counter() - started)
+                    if remaining > 0:
+                        try:
+                            await asyncio.wait_for(self._stop.wait(), remaining)
+                        except asyncio.TimeoutError:
+                            pass
+        finally:
+            # One sentinel per worker so every analysis task finishes
+            for _ in range(self.workers):
+                await queue.put(None)
+
+    async def _analysis_loop(self, queue, executor, results):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            index, captured_at, capture_s, frame = item
+            started = time.perf_counter()
+            try:
+                count, category = await loop.run_in_executor(
+                    executor, _analyze_frame, self.analyze, frame, self.analysis_kwargs
+                )
+            except (ValueError, cv2.error) as exc:
+                # A bad frame shouldn't end a long monitoring run, whether it's rejected by
+                # validation or OpenCV chokes on it
+                self.stats.failed += 1
+                print(f"Frame {index}: analysis failed ({exc})")
+                continue
+            result = MonitorResult(index, captured_at, count, category, capture_s, time.perf_counter() - started)
+            self.stats.analyzed += 1
+            results.append(result)
+            if self.on_result is not None:
+                self.on_result(result)
+
+    async def run_async(self, max_frames=None, duration_s=None):
+        """
+        Monitor until max_frames are analyzed, duration_s has passed, or stop() is called.
+
+        Returns:
+            list[MonitorResult]: Results in completion order.
+        """
+        self._stop = asyncio.Event()
+        self.stats = MonitorStats()
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        results = []
+        owns_executor = self.executor is None
+        executor = self.executor or ThreadPoolExecutor(max_workers=self.workers)
+        capture_executor = ThreadPoolExecutor(max_workers=1)
+        try:
+            self.camera.open()
+            await asyncio.gather(
+                self._capture_loop(queue, capture_executor, max_frames, duration_s),
+                *(self._analysis_loop(queue, executor, results) for _ in range(self.workers)),
+            )
+        finally:
+            self.lights.off()
+            self.stats.finished_at = time.perf_counter()
+            capture_executor.shutdown(wait=True)
+            if owns_executor:
+                executor.shutdown(wait=True)
+        return results
+
+    def run(self, max_frames=None, duration_s=None):
+        """Blocking wrapper around run_async."""
+        return asyncio.run(self.run_async(max_frames=max_frames, duration_s=duration_s))
+
+
+def _analyze_frame(analyze, frame, analysis_kwargs):
+    """Executor entry point (module level so process pools can pickle it)."""
+    return analyze(frame, **analysis_kwargs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Continuously capture and analyze samples")
+    parser.add_argument("--frames", type=int, default=None, help="Stop after this many frames")
+    parser.add_argument("--duration", type=float, default=None, help="Stop after this many seconds")
+    parser.add_argument("--interval", type=float, default=0.0, help="Minimum seconds between captures")
+    parser.add_argument("--queue_size", type=int, default=2, help="Frames allowed to wait for analysis")
+    parser.add_argument("--workers", type=int, default=1, help="Frames analyzed concurrently")
+    parser.add_argument("--burst", type=int, default=1, help="Frames stacked per sample")
+    parser.add_argument("--stack", choices=STACK_METHODS, default="median", help="How burst frames are combined")
+    parser.add_argument("--align", action="store_true", help="Align burst frames before stacking")
+    parser.add_argument("--db", type=str, default=None, help="Append every result to this SQLite results store")
+    parser.add_argument(
+        "--calibration_dir",
+        type=str,
+        default=DEFAULT_CALIBRATION_DIR,
+        help="Apply this device's dark/flat calibration from here, if one exists (see software/calibration.py)"
+    )
+    parser.add_argument(
+        "--fake",
+        nargs="*",
+        default=None,
+        help="Use a fake camera and LEDs, replaying the given images (for development without hardware)"
+    )
+    args = parser.parse_args()
+
+    if args.fake is not None:
+        camera = CameraSession(backend=FakeCameraBackend(frames=args.fake))
+        lights = FakeLights()
+        settle_s = 0.0
+    else:
+        camera = CameraSession()
+        lights = GpioLights()
+        settle_s = LED_SETTLE_S
+    # One sample per interval: commit each so the history is readable straight away
+    store = ResultsStore(args.db, batch_size=1) if args.db else None
+    calibration = load_calibration(args.calibration_dir, settings=settings_name(camera.controls))
+    if calibration is not None:
+        print(f"Applying calibration {calibration.device}/{calibration.settings}")
+
+    def report(result):
+        print(f"Frame {result.index}: {result.count} → {result.category} "
+              f"(capture {result.capture_s * 1000:.0f} ms, analysis {result.analysis_s * 1000:.0f} ms)")
+        if store is not None:
+            store.add_result(result.count, result.category, captured_at=result.captured_at)
+
+    monitor = Monitor(
+        camera,
+        lights,
+        analyze=analyze_image,
+        interval_s=args.interval,
+        queue_size=args.queue_size,
+        workers=args.workers,
+        settle_s=settle_s,
+        on_result=report,
+        burst=args.burst,
+        stack_method=args.stack,
+        align=args.align,
+        calibration=calibration,
+    )
+    try:
+        monitor.run(max_frames=args.frames, duration_s=args.duration)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        camera.close()
+        lights.close()
+        if store is not None:
+            store.close()
+    stats = monitor.stats
+    print(f"Analyzed {stats.analyzed} frames ({stats.frames_per_minute:.1f} frames/min, "
+          f"LEDs lit {stats.lit_s:.1f}s, {stats.backpressure_waits} backpressure waits)")
@@ -0,0 +1,302 @@
+import argparse
+import os
+import queue
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from software.analyze_microplastics import measure_image
+from software.image_decode import load_image
+
+DEFAULT_OUTPUT_DIR = "overlays"
+
+# Overlays are drawn on the first pyramid level no larger than this (an 8 MP frame is
+# halved once), thumbnails are scaled from the overlay
+OVERLAY_MAX_SIDE = 1640
+THUMBNAIL_MAX_SIDE = 256
+JPEG_QUALITY = 85
+
+OVERLAY_SUFFIX = "_overlay.jpg"
+THUMBNAIL_SUFFIX = "_thumb.jpg"
+
+# BGR marker color per size class (small, medium, large)
+SIZE_CLASS_COLORS = ((255, 255, 0), (0, 255, 0), (255, 0, 255))
+CONTOUR_COLOR = (0, 255, 0)
+MARKER_COLOR = (255, 0, 0)
+
+
+def pyramid_level(image, max_side):
+    """
+    Halve an image with cv2.pyrDown until its longer side is at most max_side.
+
+    Returns:
+        level (np.ndarray): The downscaled image (image itself if it's already small enough).
+        factor (int): Full-resolution pixels per level pixel (a power of 2).
+    """
+    factor = 1
+    while max(image.shape[:2]) > max_side:
+        image = cv2.pyrDown(image)
+        factor *= 2
+    return image, factor
+
+
+def draw_particles(canvas, particles, components=None, factor=1):
+    """
+    Draw counted particles onto a (possibly downscaled) copy of their frame, in place.
+
+    With the label image, each particle's outline is traced; without it, a circle of the
+    particle's area is drawn instead. Every particle also gets a centroid marker.
+
+    Args:
+        canvas (np.ndarray): BGR image to draw on, `factor` times smaller than the frame.
+        particles (np.ndarray): PARTICLE_DTYPE table of the counted particles.
+        components (np.ndarray | None): Full-resolution label image from measure().
+        factor (int): Downscale factor of canvas.
+    """
+    # cv2.drawContours(image, contours, contourIdx, color, thickness)
+    #   contourIdx: -1 means draw all contours
+    #   thickness: thickness of the contour lines in pixels
+    if components is not None:
+        # Contours are only traced here, for display; counting works from the feature table
+        counted = np.isin(components, particles["label"]).astype(np.uint8)
+        contours, _ = cv2.findContours(counted, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+        if factor > 1:
+            contours = [(contour // factor).astype(np.int32) for contour in contours]
+        cv2.drawContours(canvas, contours, -1, CONTOUR_COLOR, 1)
+    radii = np.maximum(np.sqrt(particles["area"] / np.pi) / factor, 2)
+    for cx, cy, radius, size_class in zip(particles["cx"], particles["cy"], radii, particles["size_class"]):
+        center = (int(round(cx / factor)), int(round(cy / factor)))
+        if components is None:
+            cv2.circle(canvas, center, int(round(radius)) + 1, SIZE_CLASS_COLORS[size_class], 1)
+        cv2.drawMarker(canvas, center, MARKER_COLOR, cv2.MARKER_CROSS, 5)
+    return canvas
+
+
+def render_overlay(image, particles, category=None, components=None, max_side=OVERLAY_MAX_SIDE):
+    """
+    Downscaled copy of a frame with its counted particles and the result drawn on it.
+
+    Returns:
+        np.ndarray: BGR overlay image (the frame itself is not modified).
+    """
+    level, factor = pyramid_level(image, max_side)
+    canvas = level.copy() if level is image else level
+    draw_particles(canvas, particles, components, factor)
+    label = f"{len(particles)} particles" + (f" - {category}" if category else "")
+    (text_width, text_height), baseline = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 1)
+    cv2.rectangle(canvas, (0, 0), (text_width + 10, text_height + baseline + 10), (0, 0, 0), -1)
+    cv2.putText(canvas, label, (5, text_height + 5), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1, cv2.LINE_AA)
+    return canvas
+
+
+def render_thumbnail(overlay, max_side=THUMBNAIL_MAX_SIDE):
+    """Small preview of an overlay: pyramid halving, then one area resize to max_side."""
+    level, _ = pyramid_level(overlay, 2 * max_side)
+    scale = max_side / max(level.shape[:2])
+    if scale >= 1:
+        return level
+    return cv2.resize(level, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+
+def output_paths(name, output_dir=DEFAULT_OUTPUT_DIR):
+    """(overlay, thumbnail) file paths for a result name, e.g. a capture's file stem."""
+    output_dir = Path(output_dir)
+    return output_dir / (name + OVERLAY_SUFFIX), output_dir / (name + THUMBNAIL_SUFFIX)
+
+
+def write_overlay(image, particles, name, output_dir=DEFAULT_OUTPUT_DIR, category=None, components=None):
+    """
+    Render and write the overlay and thumbnail of one result.
+
+    Returns:
+        tuple[Path, Path]: The overlay and thumbnail paths.
+    """
+    overlay_path, thumbnail_path = output_paths(name, output_dir)
+    overlay_path.parent.mkdir(parents=True, exist_ok=True)
+    overlay = render_overlay(image, particles, category, components)
+    params = [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY]
+    for path, picture in ((overlay_path, overlay), (thumbnail_path, render_thumbnail(overlay))):
+        # Write then rename, so the app never serves a half-written file
+        partial = path.with_name(path.name + ".partial.jpg")
+        if not cv2.imwrite(str(partial), picture, params):
+            raise OSError(f"Failed to write {path}")
+        os.replace(partial, path)
+    return overlay_path, thumbnail_path
+
+
+def is_up_to_date(image_path, output_dir=DEFAULT_OUTPUT_DIR):
+    """Whether a capture's overlay and thumbnail exist and are newer than the capture."""
+    source_mtime = os.path.getmtime(image_path)
+    return all(path.exists() and path.stat().st_mtime >= source_mtime for path in output_paths(Path(image_path).stem, output_dir))
+
+
+@dataclass
+class RenderStats:
+    """Counters of an OverlayRenderer."""
+    submitted: int = 0
+    rendered: int = 0
+    skipped: int = 0
+    failed: int = 0
+    # Jobs refused because the queue was full (the hot path never waits for rendering)
+    dropped: int = 0
+
+
+class OverlayRenderer:
+    """
+    Background overlay/thumbnail writer, kept off the analysis hot path.
+
+    submit() only puts a job on a bounded queue and returns; `workers` daemon threads
+    draw and encode the images (OpenCV releases the GIL while doing so). When the queue
+    is full, the job is dropped and counted instead of making the caller wait, so
+    analysis latency never includes visualization. Call close() (or use the renderer as
+    a context manager) to finish the queued jobs.
+
+    Jobs hold references to the frame and particle table, so pass arrays that won't be
+    modified afterwards (camera frames and measure_image results are fresh arrays).
+
+    Example:
+        with OverlayRenderer("overlays") as renderer:
+            for frame in frames:
+                particles, category = measure_image(frame)
+                renderer.submit(frame, particles, name=f"frame_{i}", category=category)
+    """
+
+    def __init__(self, output_dir=DEFAULT_OUTPUT_DIR, workers=1, queue_size=8, block=False):
+        """
+        Args:
+            output_dir (str): Directory the overlays and thumbnails are written to.
+            workers (int): Rendering threads.
+            queue_size (int): Jobs allowed to wait.
+            block (bool): Wait for room in the queue instead of dropping jobs (for batch
+                regeneration, where nothing else is waiting).
+
+        Raises:
+            ValueError: If workers or queue_size is less than 1
+        """
+        if workers < 1 or queue_size < 1:
+            raise ValueError("workers and queue_size must be at least 1")
+        self.output_dir = Path(output_dir)
+        self.block = block
+        self.stats = RenderStats()
+        self._lock = threading.Lock()
+        self._jobs = queue.Queue(maxsize=queue_size)
+        self._threads = [
+            threading.Thread(target=self._work, name=f"overlay-renderer-{i}", daemon=True) for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self.stats, name, getattr(self.stats, name) + 1)
+
+    def _work(self):
+        while True:
+            job = self._jobs.get()
+            try:
+                if job is None:
+                    return
+                function, args = job
+                try:
+                    self._count("rendered" if function(*args) else "skipped")
+                except Exception as exc:
+                    self._count("failed")
+                    print(f"Overlay rendering failed: {exc}")
+            finally:
+                self._jobs.task_done()
+
+    def _put(self, job):
+        self._count("submitted")
+        try:
+            self._jobs.put(job, block=self.block)
+            return True
+        except queue.Full:
+            self._count("dropped")
+            return False
+
+    def submit(self, image, particles, name, category=None, components=None):
+        """
+        Queue the overlay and thumbnail of an analyzed frame.
+
+        Returns:
+            bool: False if the job was dropped because the queue was full.
+        """
+        return self._put((self._render, (image, particles, name, category, components)))
+
+    def submit_path(self, image_path, force=False, **analysis_kwargs):
+        """
+        Queue the overlay of an image file; it is analyzed on the rendering thread.
+
+        Files whose overlay and thumbnail are newer than the file are skipped unless force.
+        """
+        return self._put((self._render_path, (str(image_path), force, analysis_kwargs)))
+
+    def _render(self, image, particles, name, category, components):
+        write_overlay(image, particles, name, self.output_dir, category, components)
+        return True
+
+    def _render_path(self, image_path, force, analysis_kwargs):
+        if not force and is_up_to_date(image_path, self.output_dir):
+            return False
+        image = load_image(image_path)
+        particles, category = measure_image(image, **analysis_kwargs)
+        write_overlay(image, particles, Path(image_path).stem, self.output_dir, category)
+        return True
+
+    def join(self):
+        """Wait until every queued job is done."""
+        self._jobs.join()
+
+    def close(self):
+        """Finish the queued jobs and stop the threads."""
+        for _ in self._threads:
+            self._jobs.put(None)
+        for thread in self._threads:
+            thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def regenerate(image_paths, output_dir=DEFAULT_OUTPUT_DIR, workers=None, force=False, **analysis_kwargs):
+    """
+    (Re)build the overlays and thumbnails of many captures, skipping up-to-date ones.
+
+    Returns:
+        RenderStats: rendered, skipped (up to date) and failed counts.
+    """
+    workers = workers or os.cpu_count() or 1
+    with OverlayRenderer(output_dir, workers=workers, queue_size=2 * workers, block=True) as renderer:
+        for image_path in image_paths:
+            renderer.submit_path(image_path, force=force, **analysis_kwargs)
+    return renderer.stats
+
+
+if __name__ == "__main__":
+    from software.batch_analysis import find_images
+
+    parser = argparse.ArgumentParser(description="Write result overlays and thumbnails of captured images for the app")
+    parser.add_argument("--input_dir", type=str, default="captures", help="Directory of captured images")
+    parser.add_argument("--pattern", type=str, default="*.jpg", help="Glob pattern of the images")
+    parser.add_argument("--output_dir", type=str, default=DEFAULT_OUTPUT_DIR, help="Directory for overlays and thumbnails")
+    parser.add_argument("--workers", type=int, default=None, help="Rendering threads (default: one per CPU core)")
+    parser.add_argument("--force", action="store_true", help="Regenerate overlays that are already up to date")
+    parser.add_argument("--min_area", type=int, default=10, help="Minimum particle area in pixels")
+    parser.add_argument("--max_area", type=int, default=5000, help="Maximum particle area in pixels")
+    args = parser.parse_args()
+
+    stats = regenerate(
+        find_images(args.input_dir, args.pattern),
+        args.output_dir,
+        workers=args.workers,
+        force=args.force,
+        min_area=args.min_area,
+        max_area=args.max_area,
+    )
+    print(f"Rendered {stats.rendered}, up to date {stats.skipped}, failed {stats.failed} → {args.output_dir}")
@@ -0,0 +1,234 @@
+import argparse
+import csv
+import itertools
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import cv2
+import numpy as np
+
+from software.analyze_microplastics import (
+    blur_mask,
+    categorize,
+    clean_mask,
+    measure,
+    segment,
+    threshold_mask,
+    to_hsv,
+)
+from software.batch_analysis import find_images
+
+# Sweep parameters, ordered from most upstream (costly to vary) to most downstream
+SWEEP_PARAMETERS = ["blur_ksize", "morph_ksize", "min_area", "max_area", "low_thresh", "high_thresh"]
+
+# Columns of the results table, in order
+SWEEP_FIELDS = ["image_path"] + SWEEP_PARAMETERS + ["count", "category", "error"]
+
+DEFAULT_GRID = {
+    "blur_ksize": [3],
+    "morph_ksize": [3],
+    "min_area": [10],
+    "max_area": [5000],
+    "low_thresh": [10],
+    "high_thresh": [30],
+}
+
+
+def _normalize_grid(grid):
+    """Fill in defaults for missing parameters and check the values are usable."""
+    unknown = set(grid) - set(SWEEP_PARAMETERS)
+    if unknown:
+        raise ValueError(f"Unknown sweep parameters: {', '.join(sorted(unknown))}")
+    grid = {name: list(grid.get(name, DEFAULT_GRID[name])) for name in SWEEP_PARAMETERS}
+    for name, values in grid.items():
+        if not values:
+            raise ValueError(f"{name} needs at least one value")
+    if any(k < 1 or k % 2 == 0 for k in grid["blur_ksize"]):
+        raise ValueError("blur_ksize values must be odd and positive")
+    if any(k < 1 for k in grid["morph_ksize"]):
+        raise ValueError("morph_ksize values must be positive")
+    return grid
+
+
+def _area_pairs(grid):
+    # Same normalization as _validate_parameters; pairs with min_area > max_area are skipped
+    return [(max(0, lo), max(0, hi)) for lo, hi in itertools.product(grid["min_area"], grid["max_area"]) if lo <= hi]
+
+
+def _thresh_pairs(grid):
+    # Pairs with high_thresh < low_thresh would just duplicate high_thresh = low_thresh, so they're skipped
+    return [(max(0, lo), hi) for lo, hi in itertools.product(grid["low_thresh"], grid["high_thresh"]) if max(0, lo) <= hi]
+
+
+def sweep_image(image, grid):
+    """
+    Evaluate every parameter combination of a grid on one decoded image.
+
+    Each stage runs once per distinct value of the parameters it depends on:
+    HSV conversion and segmentation once, blur and Otsu threshold once per blur_ksize,
+    morphology and particle measurement once per (blur_ksize, morph_ksize). The area
+    and category parameters never touch pixels: counts for every (min_area, max_area)
+    pair come from a binary search over the sorted particle areas, and categories for
+    every (low_thresh, high_thresh) pair from one categorize call over those counts.
+
+    Args:
+        image (np.ndarray): BGR image of shape (height, width, 3) and dtype uint8.
+        grid (dict): Parameter name (see SWEEP_PARAMETERS) → list of values. Missing
+            parameters use the analyze_microplastics defaults.
+
+    Returns:
+        list[dict]: One row per valid combination with the SWEEP_PARAMETERS plus
+        count and category. Combinations with min_area > max_area or
+        high_thresh < low_thresh are skipped.
+
+    Raises:
+        ValueError: If the grid has unknown parameters, empty value lists, or invalid kernel sizes
+    """
+    grid = _normalize_grid(grid)
+    area_pairs = _area_pairs(grid)
+    thresh_pairs = _thresh_pairs(grid)
+    min_areas = np.array([lo for lo, _ in area_pairs])
+    max_areas = np.array([hi for _, hi in area_pairs])
+    lows = np.array([lo for lo, _ in thresh_pairs])
+    highs = np.array([hi for _, hi in thresh_pairs])
+
+    rows = []
+    full_mask, _ = segment(to_hsv(image))
+    for blur_ksize in grid["blur_ksize"]:
+        binary = threshold_mask(blur_mask(full_mask, blur_ksize))
+        for morph_ksize in grid["morph_ksize"]:
+            particles, _ = measure(clean_mask(binary, morph_ksize))
+            areas = np.sort(particles["area"])
+            # Particles with min_area < area < max_area, for every pair at once
+            counts = np.searchsorted(areas, max_areas, side="left") - np.searchsorted(areas, min_areas, side="right")
+            counts = np.maximum(counts, 0)
+            # categories[i, j]: category of area pair i under threshold pair j
+            categories = categorize(counts[:, None], lows[None, :], highs[None, :]) if thresh_pairs else None
+            for i, (min_area, max_area) in enumerate(area_pairs):
+                for j, (low_thresh, high_thresh) in enumerate(thresh_pairs):
+                    rows.append({
+                        "blur_ksize": blur_ksize,
+                        "morph_ksize": morph_ksize,
+                        "min_area": min_area,
+                        "max_area": max_area,
+                        "low_thresh": low_thresh,
+                        "high_thresh": high_thresh,
+                        "count": int(counts[i]),
+                        "category": str(categories[i, j]),
+                    })
+    return rows
+
+
+def _sweep_one(image_path, grid):
+    """Worker entry point: decode one image and sweep the grid over it."""
+    image = cv2.imread(str(image_path))
+    if image is None:
+        error = "Image file not found" if not os.path.exists(image_path) else "Failed to load image"
+        return [{"image_path": str(image_path), "error": f"{error}: {image_path}"}]
+    try:
+        rows = sweep_image(image, grid)
+    except cv2.error as exc:
+        # One image OpenCV can't process shouldn't abort the whole sweep
+        return [{"image_path": str(image_path), "error": str(exc)}]
+    for row in rows:
+        row["image_path"] = str(image_path)
+        row["error"] = None
+    return rows
+
+
+def sweep(image_paths, grid, workers=None):
+    """
+    Sweep a parameter grid over many images across a process pool.
+
+    Args:
+        image_paths (iterable): Paths of the images to analyze.
+        grid (dict): Parameter name → list of values (see sweep_image).
+        workers (int | None): Number of worker processes (None = one per CPU core,
+            1 = run serially in the calling process).
+
+    Yields:
+        dict: One row per image and combination, with the keys in SWEEP_FIELDS. Images
+        arrive in completion order; an unreadable image, or one OpenCV fails on, yields
+        a single row with `error` set. At most two images per worker are queued at a time, and closing
+        the generator early cancels the queued ones.
+
+    Raises:
+        ValueError: If workers is less than 1 or the grid is invalid
+    """
+    if workers is not None and workers < 1:
+        raise ValueError("workers must be at least 1")
+    grid = _normalize_grid(grid)
+
+    if workers == 1:
+        for image_path in image_paths:
+            yield from _sweep_one(image_path, grid)
+        return
+
+    workers = workers or os.cpu_count() or 1
+    paths = iter(image_paths)
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        pending = set()
+        while True:
+            for path in itertools.islice(paths, 2 * workers - len(pending)):
+                pending.add(pool.submit(_sweep_one, path, grid))
+            if not pending:
+                return
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from future.result()
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
+def grid_size(grid):
+    """Number of valid combinations a grid expands to, per image."""
+    grid = _normalize_grid(grid)
+    return len(grid["blur_ksize"]) * len(grid["morph_ksize"]) * len(_area_pairs(grid)) * len(_thresh_pairs(grid))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep analysis parameters over a set of images")
+    parser.add_argument(
+        "--input_dir",
+        type=str,
+        default="./tests/test-images",
+        help="Directory containing the images to analyze"
+    )
+    parser.add_argument("--pattern", type=str, default="*.jpg", help="Glob pattern for images inside input_dir")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of worker processes (default: one per CPU core)"
+    )
+    parser.add_argument("--output", type=str, default="sweep_results.csv", help="Results table (CSV)")
+    parser.add_argument("--blur_ksize", type=int, nargs="+", default=DEFAULT_GRID["blur_ksize"], help="Gaussian blur kernel sizes (odd)")
+    parser.add_argument("--morph_ksize", type=int, nargs="+", default=DEFAULT_GRID["morph_ksize"], help="Morphological opening kernel sizes")
+    parser.add_argument("--min_area", type=int, nargs="+", default=DEFAULT_GRID["min_area"], help="Minimum particle areas in pixels")
+    parser.add_argument("--max_area", type=int, nargs="+", default=DEFAULT_GRID["max_area"], help="Maximum particle areas in pixels")
+    parser.add_argument("--low_thresh", type=int, nargs="+", default=DEFAULT_GRID["low_thresh"], help="Max counts for 'Low'")
+    parser.add_argument("--high_thresh", type=int, nargs="+", default=DEFAULT_GRID["high_thresh"], help="Max counts for 'Medium'")
+    args = parser.parse_args()
+
+    grid = {name: getattr(args, name) for name in SWEEP_PARAMETERS}
+    image_paths = find_images(args.input_dir, args.pattern)
+    print(f"Sweeping {grid_size(grid)} combinations over {len(image_paths)} images from {args.input_dir}...")
+
+    start = time.perf_counter()
+    rows = 0
+    directory = os.path.dirname(args.output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(args.output, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=SWEEP_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        for row in sweep(image_paths, grid, workers=args.workers):
+            writer.writerow(row)
+            rows += 1
+            if row["error"]:
+                print(f"{row['image_path']}: failed ({row['error']})")
+
+    elapsed = time.perf_counter() - start
+    print(f"Wrote {rows} rows in {elapsed:.1f}s → {args.output}")
@@ -0,0 +1,134 @@
+import cv2
+import numpy as np
+
+# One row per particle. Areas and boxes are in pixels; hue is OpenCV's 0-179 scale.
+PARTICLE_DTYPE = np.dtype([
+    ("label", np.int32),        # Component id in the label image (0 is background)
+    ("area", np.float32),       # Outer contour area (cv2.contourArea)
+    ("cx", np.float32),         # Centroid
+    ("cy", np.float32),
+    ("left", np.int32),         # Bounding box
+    ("top", np.int32),
+    ("width", np.int32),
+    ("height", np.int32),
+    ("mean_hue", np.float32),   # Circular mean, so reds either side of 0/179 don't average to cyan
+    ("size_class", np.uint8),   # Index into SIZE_CLASSES
+])
+
+# Particles with area below SIZE_CLASS_EDGES[i] (and at or above the previous edge) are SIZE_CLASSES[i]
+SIZE_CLASSES = ("small", "medium", "large")
+SIZE_CLASS_EDGES = (50, 500)
+
+CATEGORIES = ("Low", "Medium", "High")
+
+# Hue → angle lookup, used to average hue on the circle without a per-pixel trig call
+_HUE_ANGLE = np.arange(256) * (2 * np.pi / 180)
+_HUE_COS = np.cos(_HUE_ANGLE)
+_HUE_SIN = np.sin(_HUE_ANGLE)
+
+
+def measure_particles(cleaned, size_class_edges=SIZE_CLASS_EDGES, components=None):
+    """
+    Measure every particle in a binary mask.
+
+    Only outer contours are particles: a blob lying inside the hole of a bigger (ring-shaped)
+    one isn't reported, and a particle's area is the area enclosed by its outer contour, as
+    cv2.contourArea gives it, so holes don't make a particle smaller. Centroids and boxes
+    come from the 8-connected component the contour bounds.
+
+    mean_hue is left as NaN; fill it with measure_hue once the table has been filtered,
+    so the pixels of particles that won't be reported are never visited.
+
+    Args:
+        cleaned (np.ndarray): Binary mask (non-zero = particle).
+        size_class_edges (tuple[int]): Area edges between SIZE_CLASSES.
+        components (np.ndarray | None): Preallocated int32 label image to write into.
+
+    Returns:
+        particles (np.ndarray): PARTICLE_DTYPE table, one row per outer contour, ordered
+            by label.
+        components (np.ndarray): int32 label image matching the table's `label` column.
+    """
+    _, components, stats, centroids = cv2.connectedComponentsWithStats(
+        cleaned, labels=components, connectivity=8, ltype=cv2.CV_32S
+    )
+
+    contours, _ = cv2.findContours(cleaned, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    # The first point of an outer contour is a pixel of the component it bounds
+    labels = np.array([components[shape[0, 0, 1], shape[0, 0, 0]] for shape in contours], dtype=np.int32)
+    areas = np.array([cv2.contourArea(shape) for shape in contours], dtype=np.float32)
+    order = np.argsort(labels)
+    labels = labels[order]
+
+    particles = np.empty(len(labels), dtype=PARTICLE_DTYPE)
+    particles["label"] = labels
+    particles["area"] = areas[order]
+    particles["cx"] = centroids[labels, 0]
+    particles["cy"] = centroids[labels, 1]
+    particles["left"] = stats[labels, cv2.CC_STAT_LEFT]
+    particles["top"] = stats[labels, cv2.CC_STAT_TOP]
+    particles["width"] = stats[labels, cv2.CC_STAT_WIDTH]
+    particles["height"] = stats[labels, cv2.CC_STAT_HEIGHT]
+    particles["mean_hue"] = np.nan
+    particles["size_class"] = np.searchsorted(size_class_edges, particles["area"], side="right")
+    return particles, components
+
+
+def measure_hue(particles, components, hsv):
+    """
+    Fill in the circular mean hue of each particle in the table (in place).
+
+    Args:
+        particles (np.ndarray): PARTICLE_DTYPE table (typically already filtered).
+        components (np.ndarray): Label image returned by measure_particles.
+        hsv (np.ndarray): HSV image the mask was built from.
+
+    Returns:
+        np.ndarray: The same table, for chaining.
+    """
+    if len(particles) == 0:
+        return particles
+    # Map each label to its row (-1 = not in the table); only those pixels are summed
+    rows = np.full(int(components.max()) + 1, -1, dtype=np.int32)
+    rows[particles["label"]] = np.arange(len(particles))
+    row = rows[components]
+    selected = row >= 0
+    owners = row[selected]
+    hue = hsv[:, :, 0][selected]
+    cos_sum = np.bincount(owners, weights=_HUE_COS[hue], minlength=len(particles))
+    sin_sum = np.bincount(owners, weights=_HUE_SIN[hue], minlength=len(particles))
+    particles["mean_hue"] = np.mod(np.arctan2(sin_sum, cos_sum) * (180 / (2 * np.pi)), 180)
+    return particles
+
+
+def filter_particles(particles, min_area, max_area):
+    """Keep the particles whose area lies strictly between min_area and max_area."""
+    area = particles["area"]
+    return particles[(area > min_area) & (area < max_area)]
+
+
+def categorize_counts(counts, low_thresh, high_thresh):
+    """
+    Map particle counts to 'Low', 'Medium' or 'High' as an array operation.
+
+    Args:
+        counts (int | array-like): One count or many (e.g. one per image of a batch).
+        low_thresh (int | array-like): Counts below this are 'Low'.
+        high_thresh (int | array-like): Counts below this (and not Low) are 'Medium'; the
+            rest are 'High'. Thresholds broadcast against counts, so a grid of counts and
+            thresholds is categorized in one call.
+
+    Returns:
+        str | np.ndarray: The category, or an array of categories of the broadcast shape.
+    """
+    counts = np.asarray(counts)
+    index = (counts >= low_thresh).astype(np.intp) + (counts >= high_thresh)
+    categories = np.asarray(CATEGORIES)[index]
+    return str(categories) if categories.ndim == 0 else categories
+
+
+def size_class_counts(particles):
+    """Number of particles in each size class, as {name: count}."""
+    counts = np.bincount(particles["size_class"], minlength=len(SIZE_CLASSES))
+    return {name: int(n) for name, n in zip(SIZE_CLASSES, counts)}
@@ -0,0 +1,136 @@
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+
+import numpy as np
+
+
+@dataclass
+class StageTiming:
+    """Wall time and peak memory of one pipeline stage."""
+    name: str
+    elapsed_s: float
+    # Peak NumPy/Python memory allocated while the stage ran, in bytes (0 if not tracked)
+    peak_bytes: int = 0
+
+
+@dataclass
+class AnalysisProfile:
+    """Result of a profiled analysis: the usual (count, category) plus per-stage timings."""
+    count: int
+    category: str
+    stages: list[StageTiming] = field(default_factory=list)
+
+    @property
+    def total_s(self):
+        return sum(stage.elapsed_s for stage in self.stages)
+
+    def as_dict(self):
+        """Flatten to a JSON-friendly dict: {"count", "category", "stages": {name: {...}}}."""
+        return {
+            "count": self.count,
+            "category": self.category,
+            "stages": {
+                stage.name: {"elapsed_s": stage.elapsed_s, "peak_bytes": stage.peak_bytes}
+                for stage in self.stages
+            },
+        }
+
+
+class StageProfiler:
+    """
+    Records the wall time and peak memory of each analysis stage.
+
+    Pass one to analyze_image/analyze_microplastics as `profiler=`; each stage runs
+    inside `profiler.stage(name)`. Memory is measured with tracemalloc, which sees
+    NumPy arrays (including OpenCV outputs) but not OpenCV's internal scratch buffers.
+    tracemalloc slows allocation-heavy code down, so use track_memory=False when only
+    timings are needed.
+    """
+
+    def __init__(self, track_memory: bool = True):
+        self.track_memory = track_memory
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name: str):
+        started_tracing = False
+        if self.track_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started_tracing = True
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            peak = 0
+            if self.track_memory:
+                peak = max(0, tracemalloc.get_traced_memory()[1] - baseline)
+                if started_tracing:
+                    tracemalloc.stop()
+            self.stages.append(StageTiming(name, elapsed, peak))
+
+
+def stage_context(profiler):
+    """Return `profiler.stage`, or a no-op stage factory when profiling is off."""
+    if profiler is None:
+        return lambda name: nullcontext()
+    return profiler.stage
+
+
+def aggregate_stages(profiles):
+    """
+    Aggregate per-stage timings across many profiled runs.
+
+    Args:
+        profiles (iterable): AnalysisProfile objects or their as_dict() form.
+
+    Returns:
+        dict: Stage name → {"runs", "p50_s", "p95_s", "mean_s", "peak_bytes_p95"}, in
+        first-seen stage order.
+    """
+    elapsed = {}
+    peaks = {}
+    for profile in profiles:
+        stages = profile["stages"] if isinstance(profile, dict) else profile.as_dict()["stages"]
+        for name, stage in stages.items():
+            elapsed.setdefault(name, []).append(stage["elapsed_s"])
+            peaks.setdefault(name, []).append(stage["peak_bytes"])
+
+    summary = {}
+    for name, times in elapsed.items():
+        times = np.asarray(times)
+        summary[name] = {
+            "runs": len(times),
+            "p50_s": float(np.percentile(times, 50)),
+            "p95_s": float(np.percentile(times, 95)),
+            "mean_s": float(times.mean()),
+            "peak_bytes_p95": float(np.percentile(peaks[name], 95)),
+        }
+    return summary
+
+
+def format_stage_table(summary):
+    """
+    Render an aggregate_stages() summary as a fixed-width text table.
+
+    Args:
+        summary (dict): Output of aggregate_stages.
+
+    Returns:
+        str: Table with one row per stage plus a total row.
+    """
+    lines = [f"{'stage':<12} {'runs':>5} {'p50 ms':>9} {'p95 ms':>9} {'mean ms':>9} {'peak MB':>9}"]
+    total_p50 = 0.0
+    for name, stats in summary.items():
+        total_p50 += stats["p50_s"]
+        lines.append(
+            f"{name:<12} {stats['runs']:>5} {stats['p50_s'] * 1000:>9.2f} {stats['p95_s'] * 1000:>9.2f} "
+            f"{stats['mean_s'] * 1000:>9.2f} {stats['peak_bytes_p95'] / 1e6:>9.2f}"
+        )
+    lines.append(f"{'total (p50)':<12} {'':>5} {total_p50 * 1000:>9.2f}")
+    return "\n".join(lines)
@@ -0,0 +1,242 @@
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from software.analyze_microplastics import (
+    COLOR_RANGES,
+    _validate_image,
+    _validate_parameters,
+    analyze_image,
+    blur_mask,
+    categorize,
+    clean_mask,
+    count_particles,
+    measure,
+    segment,
+    to_hsv,
+)
+from software.tiled_analysis import TILE_HALO, otsu_threshold
+
+# Candidate regions covering more of the frame than this are not worth cropping;
+# the whole frame is analyzed at full resolution instead. On the 8 MP test captures,
+# regions covering 44% of the frame already took longer than one whole-frame run
+MAX_ROI_FRACTION = 0.1
+
+
+def candidate_mask(image, scale=8, color_ranges=COLOR_RANGES):
+    """
+    Coarse pyramid level marking the blocks of the frame that can contain particles.
+
+    Every pixel of the color mask has a value (brightest channel) of at least the lowest
+    V bound in color_ranges. Each scale x scale block is marked when any of its pixels
+    passes that bound, which takes one threshold and one area downscale over the raw
+    BGR bytes, with no HSV conversion. Block-wise any() keeps every particle, however
+    small. An averaging pyramid would blend small particles into the background and
+    drop them.
+
+    Args:
+        image (np.ndarray): BGR image of shape (height, width, 3) and dtype uint8.
+        scale (int): Block size in pixels (the downscale factor of the coarse level).
+        color_ranges (dict): Color ranges the mask is built from.
+
+    Returns:
+        np.ndarray: uint8 mask of shape (ceil(height / scale), ceil(width / scale)),
+        nonzero where the block holds a candidate pixel.
+    """
+    min_value = min(lower[2] for lower, _ in color_ranges.values())
+    height, width = image.shape[:2]
+    coarse_height, coarse_width = -(-height // scale), -(-width // scale)
+    # Viewed as (height, width * 3), a threshold on every byte is "any channel >= min_value"
+    _, bright = cv2.threshold(image.reshape(height, width * 3), min_value - 1, 255, cv2.THRESH_BINARY)
+    if coarse_height * scale != height or coarse_width * scale != width:
+        bright = cv2.copyMakeBorder(
+            bright, 0, coarse_height * scale - height, 0, 3 * (coarse_width * scale - width), cv2.BORDER_CONSTANT, value=0
+        )
+    # Each output pixel averages exactly scale rows and the 3 * scale bytes of scale pixels
+    return cv2.resize(bright, (coarse_width, coarse_height), interpolation=cv2.INTER_AREA)
+
+
+def candidate_regions(image, scale=8, color_ranges=COLOR_RANGES):
+    """
+    Full-resolution regions to analyze, from the coarse candidate mask.
+
+    Candidate blocks are grown by one block, so the blur's one-pixel spread stays inside
+    them. They are then grouped into 8-connected regions. A particle is a connected set
+    of pixels, so all of it falls inside one region.
+
+    Returns:
+        labels (np.ndarray): Coarse label image (0 = background, k = region k).
+        boxes (np.ndarray): (regions, 4) array of full-resolution (left, top, right, bottom)
+            bounds of regions 1..n, clipped to the frame.
+        fraction (float): Fraction of the frame covered by the regions.
+    """
+    height, width = image.shape[:2]
+    coarse = (candidate_mask(image, scale, color_ranges) > 0).view(np.uint8)
+    coarse = cv2.dilate(coarse, np.ones((3, 3), np.uint8))
+    num_labels, labels, stats, _ = cv2.connectedComponentsWithStats(coarse, connectivity=8)
+    stats = stats[1:]
+    left = stats[:, cv2.CC_STAT_LEFT] * scale
+    top = stats[:, cv2.CC_STAT_TOP] * scale
+    right = np.minimum(width, (stats[:, cv2.CC_STAT_LEFT] + stats[:, cv2.CC_STAT_WIDTH]) * scale)
+    bottom = np.minimum(height, (stats[:, cv2.CC_STAT_TOP] + stats[:, cv2.CC_STAT_HEIGHT]) * scale)
+    fraction = min(1.0, stats[:, cv2.CC_STAT_AREA].sum() * scale * scale / (height * width))
+    return labels, np.stack([left, top, right, bottom], axis=1), fraction
+
+
+def _region_mask(labels, region, box, scale):
+    """Full-resolution mask (0/1) of the pixels of box that belong to region."""
+    left, top, right, bottom = box
+    coarse_left, coarse_top = left // scale, top // scale
+    coarse_right, coarse_bottom = -(-right // scale), -(-bottom // scale)
+    owned = (labels[coarse_top:coarse_bottom, coarse_left:coarse_right] == region).view(np.uint8)
+    owned = cv2.resize(owned, (owned.shape[1] * scale, owned.shape[0] * scale), interpolation=cv2.INTER_NEAREST)
+    return owned[:bottom - top, :right - left]
+
+
+def _blurred_region(image, box):
+    """Blurred color mask of box plus up to TILE_HALO pixels of context, and the offset of box in it."""
+    height, width = image.shape[:2]
+    left, top, right, bottom = box
+    window_left, window_top = max(0, left - TILE_HALO), max(0, top - TILE_HALO)
+    window = image[window_top:min(height, bottom + TILE_HALO), window_left:min(width, right + TILE_HALO)]
+    full_mask, _ = segment(to_hsv(window))
+    return blur_mask(full_mask), (top - window_top, left - window_left)
+
+
+def analyze_image_pyramid(image, min_area=10, max_area=5000, low_thresh=10, high_thresh=30, scale=8, max_roi_fraction=MAX_ROI_FRACTION):
+    """
+    Coarse-to-fine analysis: find candidate regions on a downscaled level, then run the
+    full-resolution pipeline only inside them.
+
+    Gives the same count as analyze_image:
+      1. candidate_regions marks every block that could hold a mask pixel and groups
+         the blocks into regions.
+      2. Each region is segmented and blurred with TILE_HALO pixels of context, so its
+         pixels match the whole-frame blurred mask. Outside the regions the blurred mask
+         is 0, so the regions' histograms plus zeros for the remaining pixels give the
+         whole-frame Otsu threshold.
+      3. Each region is thresholded, cleaned and measured, keeping only its own pixels
+         (bounding boxes of neighbouring regions can overlap).
+
+    This only pays off on sparse samples (dark membrane, few particles), where a small
+    part of the frame is processed at full resolution. Typical captures have color-mask
+    pixels spread over the whole membrane, so even an exact block test would keep 40-100%
+    of the frame; when the regions cover more than max_roi_fraction of it, the whole
+    frame is analyzed directly instead, at the extra cost of the coarse pass. That's why
+    nothing uses this path by default.
+
+    Args:
+        image (np.ndarray): BGR image of shape (height, width, 3) and dtype uint8.
+        min_area (int): Minimum particle area to count (in pixels).
+        max_area (int): Maximum particle area to count.
+        low_thresh (int): Max count for 'Low' classification.
+        high_thresh (int): Max count for 'Medium' classification.
+        scale (int): Downscale factor of the coarse level.
+        max_roi_fraction (float): Candidate coverage above which the full frame is used.
+
+    Returns:
+        particle_count (int): Number of detected particles.
+        category (str): 'Low', 'Medium', or 'High'
+
+    Raises:
+        ValueError: If min_area > max_area, scale < 1, or image isn't a 3-channel uint8 array
+    """
+    min_area, max_area, low_thresh, high_thresh = _validate_parameters(min_area, max_area, low_thresh, high_thresh)
+    _validate_image(image)
+    if scale < 1:
+        raise ValueError("scale must be at least 1")
+
+    labels, boxes, fraction = candidate_regions(image, scale)
+    if fraction > max_roi_fraction:
+        return analyze_image(image, min_area, max_area, low_thresh, high_thresh)
+
+    print("Processing image for microplastics in candidate regions...")
+
+    # Pass 1: blurred mask and histogram of each region
+    regions = []
+    hist = np.zeros(256, dtype=np.float64)
+    for region, box in enumerate(boxes, start=1):
+        left, top, right, bottom = box
+        blurred, (row, col) = _blurred_region(image, box)
+        owned = _region_mask(labels, region, box, scale)
+        core = blurred[row:row + bottom - top, col:col + right - left]
+        hist += cv2.calcHist([core], [0], owned, [256], [0, 256]).ravel()
+        regions.append((blurred, owned, row, col))
+    # Every pixel outside the regions is 0 in the whole-frame blurred mask
+    hist[0] += image.shape[0] * image.shape[1] - hist.sum()
+    threshold = otsu_threshold(hist)
+
+    # Pass 2: threshold, clean and measure each region's own pixels
+    count = 0
+    for blurred, owned, row, col in regions:
+        _, binary = cv2.threshold(blurred, threshold, 255, cv2.THRESH_BINARY)
+        cleaned = clean_mask(binary)[row:row + owned.shape[0], col:col + owned.shape[1]]
+        particles, _ = measure(cv2.bitwise_and(cleaned, cleaned, mask=owned))
+        count += len(count_particles(particles, min_area, max_area))
+
+    return count, categorize(count, low_thresh, high_thresh)
+
+
+def compare_with_full(image, tolerance=0.0, scale=8, **analysis_kwargs):
+    """
+    Check the coarse-to-fine count against the full-resolution path.
+
+    Args:
+        image (np.ndarray): BGR image.
+        tolerance (float): Allowed relative count error (0.05 = 5%).
+        scale (int): Downscale factor of the coarse level.
+        **analysis_kwargs: min_area, max_area, low_thresh, high_thresh.
+
+    Returns:
+        dict: full_count, pyramid_count, relative_error, within_tolerance, roi_fraction,
+        and the time each path took (full_s, pyramid_s).
+    """
+    started = time.perf_counter()
+    full_count, _ = analyze_image(image, **analysis_kwargs)
+    full_s = time.perf_counter() - started
+    started = time.perf_counter()
+    pyramid_count, _ = analyze_image_pyramid(image, scale=scale, **analysis_kwargs)
+    pyramid_s = time.perf_counter() - started
+    error = abs(pyramid_count - full_count) / max(full_count, 1)
+    return {
+        "full_count": full_count,
+        "pyramid_count": pyramid_count,
+        "relative_error": error,
+        "within_tolerance": error <= tolerance,
+        "roi_fraction": candidate_regions(image, scale)[2],
+        "full_s": full_s,
+        "pyramid_s": pyramid_s,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyze an image coarse-to-fine, at full resolution only in candidate regions")
+    parser.add_argument(
+        "--image_path",
+        type=str,
+        default="./tests/test-images/test_image_1.jpg",
+        help="Path to the input image"
+    )
+    parser.add_argument("--scale", type=int, default=8, help="Downscale factor of the coarse level")
+    parser.add_argument(
+        "--compare",
+        action="store_true",
+        help="Also run the full-resolution analysis and check the counts agree within --tolerance"
+    )
+    parser.add_argument("--tolerance", type=float, default=0.0, help="Allowed relative count error for --compare")
+    args = parser.parse_args()
+
+    image = cv2.imread(args.image_path)
+    if image is None:
+        raise SystemExit(f"Failed to load image: {args.image_path}")
+    if args.compare:
+        result = compare_with_full(image, tolerance=args.tolerance, scale=args.scale)
+        print(f"Coarse-to-fine: {result['pyramid_count']} in {result['pyramid_s'] * 1000:.1f} ms "
+              f"({result['roi_fraction']:.1%} of the frame at full resolution)")
+        print(f"Full resolution: {result['full_count']} in {result['full_s'] * 1000:.1f} ms")
+        if not result["within_tolerance"]:
+            raise SystemExit(f"Count error {result['relative_error']:.1%} exceeds tolerance {args.tolerance:.1%}")
+    else:
+        count, level = analyze_image_pyramid(image, scale=args.scale)
+        print(f"Detected particles: {count} → Category: {level}")
@@ -0,0 +1,193 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from software.analyze_microplastics import (
+    COLOR_RANGES,
+    PIPELINE_VERSION,
+    _validate_parameters,
+    categorize,
+    measure_image,
+)
+from software.image_decode import decode_image, scale_area_limits
+from software.particles import PARTICLE_DTYPE
+
+DEFAULT_CACHE_DIR = ".analysis_cache"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Written into every version directory the cache creates; cleanup only ever removes
+# directories named v<int> that hold it, so a cache_dir shared with other files is safe
+MARKER_NAME = ".result_cache"
+
+
+def content_digest(data):
+    """SHA-256 hex digest of an encoded image's bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def cache_key(digest, min_area, max_area, color_ranges=COLOR_RANGES, decode_scale=1):
+    """
+    Build the cache key for one image under one set of measurement parameters.
+
+    Only the parameters that change which particles are measured are part of the key;
+    the category thresholds are applied to the cached table, so changing them is a hit.
+
+    Args:
+        digest (str): content_digest of the image file.
+        min_area (int): Minimum particle area.
+        max_area (int): Maximum particle area.
+        color_ranges (dict): Color ranges the mask is built from.
+        decode_scale (int): Reduced-decode scale the image was measured at.
+
+    Returns:
+        str: Hex key, safe to use as a file name.
+    """
+    params = {
+        "image": digest,
+        "min_area": min_area,
+        "max_area": max_area,
+        "color_ranges": {name: [list(lower), list(upper)] for name, (lower, upper) in color_ranges.items()},
+        "pipeline_version": PIPELINE_VERSION,
+        "decode_scale": decode_scale,
+    }
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+
+class ResultCache:
+    """
+    On-disk cache of per-image particle tables.
+
+    Each entry is the PARTICLE_DTYPE table measure_image produced for one image and one
+    (min_area, max_area) pair, stored as a .npy file named by cache_key. Entries live
+    in a directory per PIPELINE_VERSION; directories of other versions are deleted when
+    the cache is opened (only v<int> directories holding the cache's marker file), so
+    a pipeline change never serves stale results. The total size is kept under
+    max_bytes by evicting the least recently used entries (reads refresh an entry's
+    modification time).
+
+    Writes go through a temporary file and an atomic rename, so several batch worker
+    processes can share one cache directory.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        if max_bytes < 0:
+            raise ValueError("max_bytes must be non-negative")
+        self.root = Path(cache_dir)
+        self.directory = self.root / f"v{PIPELINE_VERSION}"
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.directory.mkdir(parents=True, exist_ok=True)
+        (self.directory / MARKER_NAME).touch()
+        for entry in self.root.iterdir():
+            if (
+                entry != self.directory
+                and re.fullmatch(r"v\d+", entry.name)
+                and (entry / MARKER_NAME).is_file()
+            ):
+                shutil.rmtree(entry, ignore_errors=True)
+
+    def _path(self, key):
+        return self.directory / f"{key}.npy"
+
+    def get(self, key):
+        """Return the cached particle table for key, or None."""
+        path = self._path(key)
+        try:
+            particles = np.load(path, allow_pickle=False)
+            os.utime(path)
+        except (FileNotFoundError, ValueError, OSError):
+            # Missing, evicted by another process, or a torn write from a crashed run
+            return None
+        if particles.dtype != PARTICLE_DTYPE:
+            return None
+        return particles
+
+    def put(self, key, particles):
+        """Store a particle table under key, then evict down to max_bytes."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, particles, allow_pickle=False)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self.evict()
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        for path in self.directory.glob("*.npy"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def size_bytes(self):
+        return sum(path.stat().st_size for path in self.directory.glob("*.npy"))
+
+    def clear(self):
+        for path in self.directory.glob("*.npy"):
+            path.unlink(missing_ok=True)
+
+    def measure(self, image_path, min_area=10, max_area=5000, low_thresh=10, high_thresh=30, profiler=None, decode_scale=1):
+        """
+        Cached measure_image for an image file.
+
+        Args:
+            image_path (str): Path to the captured image file.
+            min_area, max_area, low_thresh, high_thresh: As for analyze_microplastics.
+            profiler (StageProfiler | None): Records the pipeline stages on a miss.
+            decode_scale (int): Decode at 1/decode_scale resolution (see analyze_microplastics).
+                The table is then in reduced-decode pixels.
+
+        Returns:
+            particles (np.ndarray): PARTICLE_DTYPE table of the counted particles.
+            category (str): 'Low', 'Medium', or 'High'
+
+        Raises:
+            ValueError: If parameters are invalid or the image can't be decoded
+            FileNotFoundError: If the image file doesn't exist
+        """
+        min_area, max_area, low_thresh, high_thresh = _validate_parameters(min_area, max_area, low_thresh, high_thresh)
+        if not os.path.exists(image_path):
+            raise FileNotFoundError(f"Image file not found: {image_path}")
+
+        # The file is read once: hashed for the key, and decoded from memory on a miss
+        data = Path(image_path).read_bytes()
+        key = cache_key(content_digest(data), min_area, max_area, decode_scale=decode_scale)
+        particles = self.get(key)
+        if particles is None:
+            self.misses += 1
+            try:
+                image = decode_image(data, decode_scale)
+            except ValueError:
+                raise ValueError(f"Failed to load image: {image_path}")
+            scaled_min_area, scaled_max_area = scale_area_limits(min_area, max_area, decode_scale)
+            particles, _ = measure_image(image, scaled_min_area, scaled_max_area, low_thresh, high_thresh, profiler=profiler)
+            self.put(key, particles)
+        else:
+            self.hits += 1
+        return particles, categorize(len(particles), low_thresh, high_thresh)
+
+    def analyze(self, image_path, min_area=10, max_area=5000, low_thresh=10, high_thresh=30, profiler=None, decode_scale=1):
+        """Cached analyze_microplastics: returns (count, category)."""
+        particles, category = self.measure(image_path, min_area, max_area, low_thresh, high_thresh, profiler, decode_scale)
+        return len(particles), category
@@ -0,0 +1,280 @@
+import os
+import socket
+import sqlite3
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from software.analyze_microplastics import PIPELINE_VERSION
+from software.particles import PARTICLE_DTYPE, SIZE_CLASSES
+
+DEFAULT_DB_PATH = "results.db"
+
+# Particle columns stored per row (the label is only meaningful inside one label image)
+PARTICLE_COLUMNS = ["area", "cx", "cy", "left", "top", "width", "height", "mean_hue", "size_class"]
+
+# "left" is an SQL keyword, so it's quoted in statements
+_PARTICLE_SQL_COLUMNS = ", ".join(f'"{name}"' for name in PARTICLE_COLUMNS)
+
+SAMPLE_COLUMNS = ["id", "captured_at", "device", "image_path", "count", "category", "location", "pipeline_version"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    id INTEGER PRIMARY KEY,
+    captured_at REAL NOT NULL,
+    device TEXT NOT NULL,
+    image_path TEXT,
+    count INTEGER NOT NULL,
+    category TEXT NOT NULL,
+    location TEXT,
+    pipeline_version INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS samples_captured_at ON samples (captured_at);
+CREATE INDEX IF NOT EXISTS samples_device_time ON samples (device, captured_at);
+CREATE INDEX IF NOT EXISTS samples_category_time ON samples (category, captured_at);
+
+CREATE TABLE IF NOT EXISTS particles (
+    sample_id INTEGER NOT NULL REFERENCES samples (id),
+    area REAL NOT NULL,
+    cx REAL NOT NULL,
+    cy REAL NOT NULL,
+    "left" INTEGER NOT NULL,
+    top INTEGER NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    mean_hue REAL,
+    size_class INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS particles_sample ON particles (sample_id);
+"""
+
+
+def timestamp_from_path(image_path):
+    """
+    Capture time of an image, from its sample_YYYYMMDD_HHMMSS.jpg name or else its mtime.
+
+    Returns:
+        float: Unix timestamp (local time).
+    """
+    stem = Path(image_path).stem
+    try:
+        return datetime.strptime(stem[-15:], "%Y%m%d_%H%M%S").timestamp()
+    except ValueError:
+        return os.path.getmtime(image_path)
+
+
+def _timestamp(value):
+    """Accept datetimes or Unix timestamps."""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return float(value)
+
+
+class ResultsStore:
+    """
+    Append-only SQLite store of analysis results and their per-particle tables.
+
+    The database runs in WAL mode, so readers (e.g. a UI polling the history) never
+    block the writer. Rows are written in batches: add_result buffers particle rows and
+    commits every `batch_size` samples, once the oldest pending sample is `max_delay_s`
+    old, or on flush/close. One transaction and one executemany per batch keep inserts
+    fast even with millions of particle rows, while the delay bound keeps rows from
+    staying invisible to other connections (and other writers blocked) for long.
+    Queries always flush pending rows first. A process writing one sample at a time,
+    like the monitor, should use batch_size=1.
+
+    Example:
+        with ResultsStore("results.db") as store:
+            particles, category = measure_image(frame)
+            store.add_result(len(particles), category, particles=particles)
+            history = store.query_samples(start=time.time() - 86400)
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH, device=None, batch_size=100, max_delay_s=5.0):
+        """
+        Args:
+            path (str): SQLite database file (created if missing).
+            device (str | None): Name recorded with each result (defaults to the host name).
+            batch_size (int): Samples buffered per transaction.
+            max_delay_s (float): Longest time a sample stays uncommitted; checked when
+                the next result is added.
+
+        Raises:
+            ValueError: If batch_size is less than 1 or max_delay_s is negative
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        if max_delay_s < 0:
+            raise ValueError("max_delay_s must be non-negative")
+        directory = os.path.dirname(str(path))
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = str(path)
+        self.device = device or socket.gethostname()
+        self.batch_size = batch_size
+        self.max_delay_s = max_delay_s
+        self._connection = sqlite3.connect(self.path)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        # With WAL, NORMAL only risks the last transactions on power loss, never corruption
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(_SCHEMA)
+        self._pending_samples = 0
+        self._pending_particles = []
+        self._pending_since = None
+
+    def add_result(self, count, category, captured_at=None, image_path=None, particles=None, location=None, device=None):
+        """
+        Append one analysis result.
+
+        Args:
+            count (int): Particle count.
+            category (str): 'Low', 'Medium' or 'High'.
+            captured_at (datetime | float | None): Capture time (defaults to now).
+            image_path (str | None): Saved capture, if any.
+            particles (np.ndarray | None): PARTICLE_DTYPE table from measure_image.
+            location (str | None): Free-form sampling location.
+            device (str | None): Overrides the store's device name.
+
+        Returns:
+            int: Id of the new sample row.
+        """
+        captured_at = _timestamp(captured_at) if captured_at is not None else time.time()
+        if self._pending_since is None:
+            self._pending_since = time.monotonic()
+        cursor = self._connection.execute(
+            "INSERT INTO samples (captured_at, device, image_path, count, category, location, pipeline_version) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (captured_at, device or self.device, None if image_path is None else str(image_path),
+             int(count), str(category), location, PIPELINE_VERSION),
+        )
+        sample_id = cursor.lastrowid
+        if particles is not None and len(particles):
+            columns = particles[PARTICLE_COLUMNS].tolist()
+            self._pending_particles.extend((sample_id, *row) for row in columns)
+        self._pending_samples += 1
+        if self._pending_samples >= self.batch_size or time.monotonic() - self._pending_since >= self.max_delay_s:
+            self.flush()
+        return sample_id
+
+    def flush(self):
+        """Write buffered particle rows and commit the open transaction."""
+        if self._pending_particles:
+            self._connection.executemany(
+                f"INSERT INTO particles (sample_id, {_PARTICLE_SQL_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                self._pending_particles,
+            )
+            self._pending_particles = []
+        self._connection.commit()
+        self._pending_samples = 0
+        self._pending_since = None
+
+    def _where(self, start, end, device, category):
+        clauses, params = [], []
+        if start is not None:
+            clauses.append("captured_at >= ?")
+            params.append(_timestamp(start))
+        if end is not None:
+            clauses.append("captured_at < ?")
+            params.append(_timestamp(end))
+        if device is not None:
+            clauses.append("device = ?")
+            params.append(device)
+        if category is not None:
+            clauses.append("category = ?")
+            params.append(category)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def query_samples(self, start=None, end=None, device=None, category=None, limit=None, newest_first=False):
+        """
+        Samples captured in [start, end), optionally for one device and/or category.
+
+        Returns:
+            list[dict]: Rows with the keys in SAMPLE_COLUMNS, ordered by capture time.
+        """
+        self.flush()
+        where, params = self._where(start, end, device, category)
+        sql = f"SELECT {', '.join(SAMPLE_COLUMNS)} FROM samples{where} ORDER BY captured_at {'DESC' if newest_first else 'ASC'}"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        return [dict(zip(SAMPLE_COLUMNS, row)) for row in self._connection.execute(sql, params)]
+
+    def aggregate(self, start=None, end=None, device=None, bucket_s=3600):
+        """
+        Per-time-bucket summary of the samples in [start, end).
+
+        Args:
+            bucket_s (float): Bucket width in seconds (e.g. 3600 for hourly, 86400 for daily).
+
+        Returns:
+            list[dict]: One row per non-empty bucket, in time order, with bucket_start,
+            samples, mean_count, max_count and the number of Low/Medium/High samples.
+        """
+        if bucket_s <= 0:
+            raise ValueError("bucket_s must be positive")
+        self.flush()
+        where, params = self._where(start, end, device, None)
+        sql = (
+            "SELECT CAST(captured_at / ? AS INTEGER) * ? AS bucket_start, COUNT(*), AVG(count), MAX(count), "
+            "SUM(category = 'Low'), SUM(category = 'Medium'), SUM(category = 'High') "
+            f"FROM samples{where} GROUP BY bucket_start ORDER BY bucket_start"
+        )
+        keys = ["bucket_start", "samples", "mean_count", "max_count", "low", "medium", "high"]
+        return [dict(zip(keys, row)) for row in self._connection.execute(sql, [bucket_s, bucket_s] + params)]
+
+    def particle_summary(self, start=None, end=None, device=None):
+        """
+        Particle statistics over the samples in [start, end).
+
+        Returns:
+            dict: particles, mean_area, mean_hue (arithmetic, of the per-particle circular
+            means) and per-size-class counts.
+        """
+        self.flush()
+        where, params = self._where(start, end, device, None)
+        sample_filter = f"sample_id IN (SELECT id FROM samples{where})" if where else "1"
+        particles, mean_area, mean_hue = self._connection.execute(
+            f"SELECT COUNT(*), AVG(area), AVG(mean_hue) FROM particles WHERE {sample_filter}", params
+        ).fetchone()
+        by_class = dict(self._connection.execute(
+            f"SELECT size_class, COUNT(*) FROM particles WHERE {sample_filter} GROUP BY size_class", params
+        ).fetchall())
+        return {
+            "particles": particles,
+            "mean_area": mean_area,
+            "mean_hue": mean_hue,
+            "size_classes": {name: by_class.get(i, 0) for i, name in enumerate(SIZE_CLASSES)},
+        }
+
+    def particles_for(self, sample_id):
+        """
+        Particle table of one sample.
+
+        Returns:
+            np.ndarray: PARTICLE_DTYPE array (label is 0; labels aren't stored).
+        """
+        self.flush()
+        rows = self._connection.execute(
+            f"SELECT {_PARTICLE_SQL_COLUMNS} FROM particles WHERE sample_id = ? ORDER BY rowid",
+            (sample_id,),
+        ).fetchall()
+        particles = np.zeros(len(rows), dtype=PARTICLE_DTYPE)
+        if rows:
+            for name, values in zip(PARTICLE_COLUMNS, zip(*rows)):
+                particles[name] = values
+        return particles
+
+    def close(self):
+        """Commit pending rows and close the database."""
+        self.flush()
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,113 @@
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+# Each color range owns one bit of the uint8 label image
+MAX_COLOR_RANGES = 8
+
+
+def _freeze(color_ranges):
+    """Turn a {name: [(h, s, v), (h, s, v)]} dict into a hashable cache key."""
+    return tuple(
+        (name, tuple(int(v) for v in lower), tuple(int(v) for v in upper))
+        for name, (lower, upper) in color_ranges.items()
+    )
+
+
+@lru_cache(maxsize=16)
+def _build_lut(frozen_ranges):
+    if len(frozen_ranges) > MAX_COLOR_RANGES:
+        raise ValueError(f"At most {MAX_COLOR_RANGES} color ranges are supported")
+
+    # One 256-entry table per HSV channel. Entry v of a channel's table has bit i set
+    # when value v lies inside range i on that channel, so ANDing the three looked-up
+    # channels leaves exactly the bits of the ranges whose (H, S, V) box contains the pixel.
+    luts = np.zeros((3, 256), dtype=np.uint8)
+    for bit, (_, lower, upper) in enumerate(frozen_ranges):
+        for channel in range(3):
+            low = max(0, lower[channel])
+            high = min(255, upper[channel])
+            if low <= high:
+                luts[channel, low:high + 1] |= np.uint8(1 << bit)
+    luts.setflags(write=False)
+    names = tuple(name for name, _, _ in frozen_ranges)
+    return names, tuple(luts)
+
+
+def color_lut(color_ranges):
+    """
+    Get the per-channel lookup tables for a color-range configuration.
+
+    Tables are built once per configuration and cached, so repeated calls with the same
+    ranges are free.
+
+    Args:
+        color_ranges (dict): Range name → [(h_low, s_low, v_low), (h_high, s_high, v_high)].
+
+    Returns:
+        names (tuple[str]): Range names; range i is bit `1 << i` of the label image.
+        luts (tuple[np.ndarray]): Read-only 256-entry uint8 tables for the H, S and V channels.
+
+    Raises:
+        ValueError: If more than MAX_COLOR_RANGES ranges are given
+    """
+    return _build_lut(_freeze(color_ranges))
+
+
+def segment_hsv(hsv, color_ranges, full_mask=None, labels=None, scratch=None):
+    """
+    Build the combined color mask and per-pixel range labels in one vectorized pass.
+
+    Equivalent to OR-ing cv2.inRange over every range, but each pixel is looked up once
+    instead of once per range, and no per-range mask is allocated.
+
+    Args:
+        hsv (np.ndarray): HSV image as produced by cv2.cvtColor(..., cv2.COLOR_BGR2HSV).
+        color_ranges (dict): Range name → [(h_low, s_low, v_low), (h_high, s_high, v_high)].
+        full_mask, labels (np.ndarray | None): Preallocated single-channel uint8 outputs.
+        scratch (tuple[np.ndarray] | None): Two preallocated single-channel uint8 arrays
+            for the S and V channels. With labels and scratch given, nothing is allocated.
+
+    Returns:
+        full_mask (np.ndarray): 255 where the pixel falls in any range, 0 elsewhere.
+        labels (np.ndarray): uint8 bitset of the ranges each pixel falls in (see color_lut).
+    """
+    _, (hue_lut, sat_lut, val_lut) = color_lut(color_ranges)
+    if labels is None or scratch is None:
+        hue, sat, val = cv2.split(hsv)
+    else:
+        hue, (sat, val) = labels, scratch
+        cv2.mixChannels([hsv], [hue, sat, val], [0, 0, 1, 1, 2, 2])
+    # The lookups are element-wise, so they can overwrite their input channel
+    labels = cv2.LUT(hue, hue_lut, dst=hue)
+    cv2.bitwise_and(labels, cv2.LUT(sat, sat_lut, dst=sat), dst=labels)
+    cv2.bitwise_and(labels, cv2.LUT(val, val_lut, dst=val), dst=labels)
+    full_mask = cv2.compare(labels, 0, cv2.CMP_GT, dst=full_mask)
+    return full_mask, labels
+
+
+def range_mask(labels, color_ranges, *names):
+    """
+    Materialize the mask of one or more named ranges from a label image.
+
+    Only needed for visualization; counting works from the combined mask.
+
+    Args:
+        labels (np.ndarray): Label image returned by segment_hsv.
+        color_ranges (dict): The configuration labels was built with.
+        *names (str): Range names to include.
+
+    Returns:
+        np.ndarray: 255 where the pixel falls in any of the named ranges, 0 elsewhere.
+
+    Raises:
+        KeyError: If a name isn't one of the configured ranges
+    """
+    range_names, _ = color_lut(color_ranges)
+    bits = 0
+    for name in names:
+        if name not in range_names:
+            raise KeyError(f"Unknown color range: {name}")
+        bits |= 1 << range_names.index(name)
+    return cv2.compare(cv2.bitwise_and(labels, bits), 0, cv2.CMP_GT)
@@ -0,0 +1,287 @@
+import argparse
+
+import cv2
+import numpy as np
+
+from software.analyze_microplastics import (
+    _validate_image,
+    _validate_parameters,
+    analyze_image,
+    blur_mask,
+    categorize,
+    clean_mask,
+    segment,
+    to_hsv,
+)
+
+# Rows of context needed above and below a strip so its core rows come out exactly as in
+# a whole-frame run: 1 for the 3x3 Gaussian blur + 2 for the 3x3 morphological opening
+# (erode then dilate)
+TILE_HALO = 3
+
+# Same tolerance OpenCV uses when it skips degenerate class splits in Otsu's method
+_FLT_EPSILON = float(np.finfo(np.float32).eps)
+
+
+def otsu_threshold(hist):
+    """
+    Otsu's threshold for a 256-bin histogram.
+
+    Mirrors OpenCV's 8-bit implementation step for step, so a histogram accumulated
+    strip by strip gives exactly the threshold cv2.threshold(..., cv2.THRESH_OTSU)
+    would pick on the whole frame.
+
+    Args:
+        hist (np.ndarray): 256 pixel counts.
+
+    Returns:
+        int: Threshold value; pixels above it are foreground.
+    """
+    hist = np.asarray(hist, dtype=np.float64)
+    total = hist.sum()
+    if total == 0:
+        return 0
+    scale = 1.0 / total
+
+    mu = 0.0
+    for i in range(256):
+        mu += i * hist[i]
+    mu *= scale
+
+    mu1 = q1 = 0.0
+    max_sigma = 0.0
+    max_val = 0
+    for i in range(256):
+        p_i = hist[i] * scale
+        mu1 *= q1
+        q1 += p_i
+        q2 = 1.0 - q1
+        if min(q1, q2) < _FLT_EPSILON or max(q1, q2) > 1.0 - _FLT_EPSILON:
+            continue
+        mu1 = (mu1 + i * p_i) / q1
+        mu2 = (mu - q1 * mu1) / q2
+        sigma = q1 * q2 * (mu2 - mu1) * (mu2 - mu1)
+        if sigma > max_sigma:
+            max_sigma = sigma
+            max_val = i
+    return max_val
+
+
+def _blurred_rows(image, start, end, halo):
+    """Blurred color mask for rows [start, end) plus up to `halo` context rows on each side."""
+    top = max(0, start - halo)
+    bottom = min(image.shape[0], end + halo)
+    full_mask, _ = segment(to_hsv(image[top:bottom]))
+    return blur_mask(full_mask), start - top
+
+
+def _blurred_histogram(image, tile_rows):
+    """Pass 1: histogram of the blurred mask over the whole frame, one strip at a time."""
+    hist = np.zeros(256, dtype=np.float64)
+    for start in range(0, image.shape[0], tile_rows):
+        end = min(image.shape[0], start + tile_rows)
+        blurred, offset = _blurred_rows(image, start, end, halo=1)
+        hist += cv2.calcHist([blurred[offset:offset + end - start]], [0], None, [256], [0, 256]).ravel()
+    return hist
+
+
+def _cleaned_rows(image, start, end, threshold):
+    """Pass 2: thresholded, cleaned mask for rows [start, end), identical to the whole-frame rows."""
+    blurred, offset = _blurred_rows(image, start, end, halo=TILE_HALO)
+    _, binary = cv2.threshold(blurred, threshold, 255, cv2.THRESH_BINARY)
+    return clean_mask(binary)[offset:offset + end - start]
+
+
+class _DisjointSet:
+    """Union-find over integer ids, used to join background regions across strip seams."""
+
+    def __init__(self):
+        self.parent = []
+
+    def add(self, n):
+        """Add n new singleton ids and return the first one."""
+        first = len(self.parent)
+        self.parent.extend(range(first, first + n))
+        return first
+
+    def find(self, i):
+        root = i
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[i] != root:
+            self.parent[i], i = root, self.parent[i]
+        return root
+
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+        if a != b:
+            # Keep the smaller id as root so OUTSIDE (id 0) stays its own root
+            self.parent[max(a, b)] = min(a, b)
+
+
+def analyze_image_tiled(image, min_area=10, max_area=5000, low_thresh=10, high_thresh=30, tile_rows=256):
+    """
+    Analyze an image in horizontal strips so memory is bounded by the strip size.
+
+    Gives the same count as analyze_image. The frame is processed twice:
+      1. Each strip's blurred mask is added to a global histogram, from which the global
+         Otsu threshold is computed (a per-strip Otsu would differ from the whole frame).
+      2. Each strip is segmented, thresholded and cleaned with TILE_HALO rows of context,
+         so its rows match the whole-frame mask exactly, then:
+         - Particles touching the bottom of a strip are not counted there; the next strip
+           starts at the top of the highest such particle, so every particle is measured
+           whole exactly once. A countable particle taller than a strip makes that strip
+           grow until it fits.
+         - Seam particles that are already too big to count (area >= max_area) are not
+           carried over; their pixels in the overlap mark the particles they continue
+           into in the next strip as uncountable.
+         - A whole-frame run only counts outer contours, so a particle inside a hole of a
+           bigger blob is skipped. A strip can cut that blob open, so instead each
+           candidate remembers the background region around it; regions are joined
+           across seams and a candidate is counted only if its region reaches the frame
+           border.
+
+    Only the input frame is full size; every intermediate covers one strip plus halo.
+
+    Args:
+        image (np.ndarray): BGR image of shape (height, width, 3) and dtype uint8.
+        min_area (int): Minimum contour area to count (in pixels).
+        max_area (int): Maximum contour area to count.
+        low_thresh (int): Max count for 'Low' classification.
+        high_thresh (int): Max count for 'Medium' classification.
+        tile_rows (int): Rows per strip.
+
+    Returns:
+        particle_count (int): Number of detected particles.
+        category (str): 'Low', 'Medium', or 'High'
+
+    Raises:
+        ValueError: If min_area > max_area, tile_rows < 1, or image isn't a 3-channel uint8 array
+    """
+    min_area, max_area, low_thresh, high_thresh = _validate_parameters(min_area, max_area, low_thresh, high_thresh)
+    _validate_image(image)
+    if tile_rows < 1:
+        raise ValueError("tile_rows must be at least 1")
+
+    print("Processing image for microplastics in tiles...")
+
+    height, width = image.shape[:2]
+    threshold = otsu_threshold(_blurred_histogram(image, tile_rows))
+
+    # Background regions get global ids; id 0 stands for everything outside the frame
+    regions = _DisjointSet()
+    outside = regions.add(1)
+    # Background region ids of the particles that passed the area filter
+    candidates = []
+
+    start = 0
+    # Rows before counted_until belong to strips that have already been counted
+    counted_until = 0
+    # Overlap with the previous strip: its pixels of uncountable particles and the
+    # global ids of its background regions
+    poison = None
+    overlap_regions = None
+    rows = tile_rows
+    while start < height:
+        overlap = 0 if poison is None else poison.shape[0]
+        end = min(height, start + max(rows, overlap + 1))
+        cleaned = _cleaned_rows(image, start, end, threshold)
+        # Outer contours only, as in measure_particles
+        contours, _ = cv2.findContours(cleaned, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        num_labels, labels = cv2.connectedComponents(cleaned, connectivity=8)
+
+        poisoned = np.zeros(num_labels, dtype=bool)
+        if poison is not None:
+            poisoned[labels[:overlap][poison]] = True
+            poisoned[0] = False
+
+        next_start = end
+        strip_candidates = []
+        for shape in contours:
+            x, y = shape[0, 0]
+            label = labels[y, x]
+            if poisoned[label]:
+                continue
+            _, top, _, h = cv2.boundingRect(shape)
+            top += start
+            bottom = top + h - 1
+            area = cv2.contourArea(shape)
+            if end < height and bottom == end - 1:
+                if area >= max_area:
+                    # Already too big to count, and the rest of it can only add area
+                    poisoned[label] = True
+                else:
+                    # Touches the seam: measure it whole in the next strip
+                    next_start = min(next_start, top)
+            elif bottom >= counted_until - 1 and min_area < area < max_area:
+                # Particles ending above the previous seam were counted by the previous strip.
+                # The first contour point is the particle's first pixel in raster order, so
+                # the pixel to its left is background outside the particle.
+                strip_candidates.append((x, y))
+
+        if end < height:
+            # Always overlap by at least one row so seam state reaches the next strip
+            next_start = min(next_start, end - 1)
+        if next_start == start:
+            # A countable particle spans the whole strip; retry with a taller one
+            rows *= 2
+            continue
+
+        # Label this strip's background (4-connected, the dual of 8-connected particles)
+        # and join it with the regions it touches: the previous strip and the frame border
+        num_background, background = cv2.connectedComponents(cv2.bitwise_not(cleaned), connectivity=4)
+        first_region = regions.add(num_background)
+        if overlap_regions is not None:
+            # Each (previous id, current label) pair seen in the overlap is the same region
+            shared = background[:overlap] > 0
+            pairs = overlap_regions[shared].astype(np.int64) * num_background + background[:overlap][shared]
+            for pair in np.unique(pairs):
+                previous, label = divmod(int(pair), num_background)
+                regions.union(previous, first_region + label)
+        border = [background[:, 0], background[:, -1]]
+        if start == 0:
+            border.append(background[0])
+        if end == height:
+            border.append(background[-1])
+        for label in np.unique(np.concatenate(border)):
+            if label > 0:
+                regions.union(outside, first_region + int(label))
+
+        for x, y in strip_candidates:
+            # A particle touching the left edge can't be inside another blob
+            candidates.append(outside if x == 0 else first_region + int(background[y, x - 1]))
+
+        counted_until = end
+        poison = poisoned[labels[next_start - start:]]
+        overlap_regions = background[next_start - start:] + first_region
+        start = next_start
+        rows = tile_rows
+
+    count = sum(1 for region in candidates if regions.find(region) == regions.find(outside))
+    return count, categorize(count, low_thresh, high_thresh)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyze a full-resolution image for microplastics in strips")
+    parser.add_argument(
+        "--image_path",
+        type=str,
+        default="./tests/test-images/test_image_1.jpg",
+        help="Path to the input image"
+    )
+    parser.add_argument("--tile_rows", type=int, default=256, help="Rows per strip (bounds peak memory)")
+    parser.add_argument(
+        "--compare",
+        action="store_true",
+        help="Also run the whole-frame analysis and check the counts agree"
+    )
+    args = parser.parse_args()
+
+    image = cv2.imread(args.image_path)
+    if image is None:
+        raise SystemExit(f"Failed to load image: {args.image_path}")
+    count, level = analyze_image_tiled(image, tile_rows=args.tile_rows)
+    print(f"Detected particles: {count} → Category: {level}")
+    if args.compare:
+        whole_count, _ = analyze_image(image)
+        print(f"Whole-frame count: {whole_count} ({'match' if whole_count == count else 'MISMATCH'})")
@@ -0,0 +1,197 @@
+import json
+import os
+import signal
+import sys
+import time
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from software.analysis_service import AnalysisService, ServiceBusy, make_server, parse_parameters
+from software.analyze_microplastics import analyze_microplastics
+
+TEST_IMAGES_DIR = project_root / "tests" / "test-images"
+IMAGE = TEST_IMAGES_DIR / "test_image_1.jpg"
+
+
+@pytest.fixture(scope="module")
+def service():
+    with AnalysisService(workers=2, max_pending=8) as service:
+        yield service
+
+
+@pytest.fixture(scope="module")
+def base_url(service):
+    server = make_server(service, port=0, verbose=False)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def _request(url, data=None, content_type=None):
+    request = urllib.request.Request(url, data=data, headers={"Content-Type": content_type} if content_type else {})
+    try:
+        with urllib.request.urlopen(request, timeout=60) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as exc:
+        return exc.code, json.loads(exc.read())
+
+
+def _post_json(url, payload):
+    return _request(url, json.dumps(payload).encode(), "application/json")
+
+
+def test_health_and_metrics(base_url):
+    """Test that the health endpoint reports the warm workers and metrics report the queue"""
+    status, health = _request(base_url + "/health")
+    assert status == 200
+    assert health == {"status": "ok", "workers": 2}
+
+    status, metrics = _request(base_url + "/metrics")
+    assert status == 200
+    assert metrics["pending"] == 0
+    assert metrics["queue_depth"] == 0
+    assert metrics["max_pending"] == 8
+
+
+def test_analyze_upload_matches_direct_analysis(base_url):
+    """Test that an uploaded image gives the same result as analyzing the file directly"""
+    expected = analyze_microplastics(str(IMAGE), min_area=5)
+    status, result = _request(base_url + "/analyze?min_area=5", IMAGE.read_bytes(), "image/jpeg")
+    assert status == 200
+    assert (result["count"], result["category"]) == expected
+    assert result["elapsed_s"] >= 0
+
+
+def test_analyze_path_and_batch(base_url):
+    """Test path requests and batch requests, with per-image errors in a batch"""
+    expected = analyze_microplastics(str(IMAGE))
+    status, result = _post_json(base_url + "/analyze", {"image_path": str(IMAGE)})
+    assert status == 200
+    assert (result["count"], result["category"]) == expected
+
+    status, result = _post_json(base_url + "/analyze/batch", {"image_paths": [str(IMAGE), "missing.jpg"], "high_thresh": 5})
+    assert status == 200
+    first, missing = result["results"]
+    assert (first["count"], first["category"]) == analyze_microplastics(str(IMAGE), high_thresh=5)
+    assert missing["count"] is None
+    assert "not found" in missing["error"]
+
+
+def test_concurrent_requests(base_url, service):
+    """Test that concurrent uploads are all answered and counted in the metrics"""
+    data = IMAGE.read_bytes()
+    completed_before = service.completed
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        responses = list(pool.map(lambda _: _request(base_url + "/analyze", data, "image/jpeg"), range(6)))
+    assert all(status == 200 for status, _ in responses)
+    assert len({result["count"] for _, result in responses}) == 1
+    assert service.completed - completed_before == 6
+
+
+def test_request_errors(base_url):
+    """Test that bad requests get JSON errors with matching status codes"""
+    assert _request(base_url + "/analyze", b"not an image", "image/jpeg")[0] == 400
+    assert _request(base_url + "/analyze?min_area=abc", IMAGE.read_bytes(), "image/jpeg")[0] == 400
+    assert _request(base_url + "/analyze", b"{bad json", "application/json")[0] == 400
+    assert _post_json(base_url + "/analyze", {"image_path": "missing.jpg"})[0] == 404
+    assert _post_json(base_url + "/analyze/batch", {"image_paths": "x.jpg"})[0] == 400
+    assert _request(base_url + "/nowhere")[0] == 404
+
+
+def test_unexpected_errors_get_a_response(base_url, service):
+    """Test that errors other than bad input are answered with a 500 instead of a dropped request"""
+    with patch.object(service, "analyze_bytes", side_effect=RuntimeError("worker crashed")):
+        status, result = _request(base_url + "/analyze", IMAGE.read_bytes(), "image/jpeg")
+    assert status == 500
+    assert "worker crashed" in result["error"]
+    assert _request(base_url + "/health")[0] == 200
+
+
+def _serve(service):
+    server = make_server(service, port=0, verbose=False)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def _kill_worker(service):
+    pid = service._pool.submit(os.getpid).result()
+    os.kill(pid, signal.SIGKILL)
+    # Wait until the executor has noticed the dead process
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            service._pool.submit(os.getpid).result()
+        except BrokenProcessPool:
+            return
+        time.sleep(0.05)
+
+
+def test_service_recovers_from_a_dead_worker():
+    """Test that a killed worker neither leaks pending slots nor leaves the service stuck"""
+    with AnalysisService(workers=2, max_pending=4) as service:
+        server, url = _serve(service)
+        try:
+            _kill_worker(service)
+            statuses = [_request(url + "/analyze", IMAGE.read_bytes(), "image/jpeg")[0] for _ in range(6)]
+            assert statuses == [200] * 6
+            metrics = service.metrics()
+            assert metrics["pending"] == 0 and metrics["restarts"] == 1
+            assert _request(url + "/health") == (200, {"status": "ok", "workers": 2})
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+def test_health_reports_workers_that_cannot_restart():
+    """Test that /health answers 503 when the pool is broken and can't be recreated"""
+    with AnalysisService(workers=1, max_pending=4) as service:
+        server, url = _serve(service)
+        try:
+            _kill_worker(service)
+            with patch.object(service, "_start_pool", side_effect=OSError("no more processes")):
+                status, health = _request(url + "/health")
+                assert status == 503 and health["status"] == "unhealthy"
+                assert _request(url + "/analyze", IMAGE.read_bytes(), "image/jpeg")[0] == 500
+                assert service.metrics()["pending"] == 0
+            # Once workers can be started again, the service heals itself
+            assert _request(url + "/health")[0] == 200
+            assert _request(url + "/analyze", IMAGE.read_bytes(), "image/jpeg")[0] == 200
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+def test_workers_default_to_cpu_count():
+    """Test that the worker count is the one passed in, or one per CPU core"""
+    with patch("software.analysis_service.os.cpu_count", return_value=1), AnalysisService() as service:
+        assert service.workers == 1
+
+
+def test_busy_service_rejects_oversized_batches(base_url, service):
+    """Test that work beyond max_pending is refused instead of queued"""
+    status, result = _post_json(base_url + "/analyze/batch", {"image_paths": [str(IMAGE)] * 9})
+    assert status == 503
+    assert "limit 8" in result["error"]
+    with pytest.raises(ServiceBusy):
+        service.analyze_paths([IMAGE] * 9)
+    assert service.metrics()["pending"] == 0
+
+
+def test_parse_parameters():
+    """Test that analysis parameters are read from query strings and JSON"""
+    assert parse_parameters({"min_area": ["5"], "other": 1}) == {"min_area": 5}
+    assert parse_parameters({"high_thresh": 40}) == {"high_thresh": 40}
+    with pytest.raises(ValueError):
+        parse_parameters({"max_area": "big"})
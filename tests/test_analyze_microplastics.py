@@ -1,4 +1,6 @@
 import pytest
+import cv2
+import numpy as np
 import matplotlib
 from pathlib import Path
 
@@ -6,10 +8,11 @@ matplotlib.use('Agg')  # Use non-interactive backend
 
 project_root = Path(__file__).parent.parent
 
+import subprocess
 import sys
 sys.path.insert(0, str(project_root))
 
-from software.analyze_microplastics import analyze_microplastics
+from software.analyze_microplastics import analyze_microplastics, analyze_image, decode_image
 
 # Get the absolute path to the test-images directory
 TEST_IMAGES_DIR = project_root / "tests" / "test-images"
@@ -103,3 +106,50 @@ def test_all_test_images():
         count, category = analyze_microplastics(str(image_file), show_image_processing=False)
         assert count >= 0
         assert category in ["Low", "Medium", "High"]
+
+def test_analyze_image_matches_file_analysis():
+    """Test that analyzing an in-memory array gives the same result as analyzing the file"""
+    image_path = TEST_IMAGES_DIR / "test_image_1.jpg"
+    image = cv2.imread(str(image_path))
+    assert analyze_image(image) == analyze_microplastics(image_path)
+
+def test_decode_image_from_buffer():
+    """Test that JPEG bytes decode to the same array cv2.imread produces"""
+    image_path = TEST_IMAGES_DIR / "test_image_1.jpg"
+    image = decode_image(image_path.read_bytes())
+    assert np.array_equal(image, cv2.imread(str(image_path)))
+
+def test_decode_image_invalid_buffer():
+    """Test that undecodable buffers raise ValueError"""
+    with pytest.raises(ValueError):
+        decode_image(b"")
+    with pytest.raises(ValueError):
+        decode_image(b"not an image")
+
+def test_analyze_image_rejects_non_bgr_arrays():
+    """Test that analyze_image validates the array it is given"""
+    with pytest.raises(ValueError):
+        analyze_image(np.zeros((10, 10), dtype=np.uint8))
+    with pytest.raises(ValueError):
+        analyze_image(np.zeros((10, 10, 3), dtype=np.float32))
+
+def test_analyze_image_trace_records_intermediates():
+    """Test that trace mode stores every stage output without changing the result"""
+    image = cv2.imread(str(TEST_IMAGES_DIR / "test_image_1.jpg"))
+    trace = {}
+    result = analyze_image(image, trace=trace)
+    assert result == analyze_image(image)
+    for stage in ["hsv", "full_mask", "labels", "blurred", "bilateral_filtered", "binary", "cleaned", "components", "particles"]:
+        assert stage in trace
+    assert trace["cleaned"].shape == image.shape[:2]
+
+def test_show_image_processing_runs_headless():
+    """Test that the visualization grid renders with the Agg backend"""
+    image_path = TEST_IMAGES_DIR / "test_image_1.jpg"
+    assert analyze_microplastics(image_path, show_image_processing=True) == analyze_microplastics(image_path)
+
+def test_module_import_does_not_load_matplotlib():
+    """Test that headless imports of the analysis module skip matplotlib"""
+    code = "import sys, software.analyze_microplastics; print('matplotlib.pyplot' in sys.modules)"
+    output = subprocess.run([sys.executable, "-c", code], cwd=project_root, capture_output=True, text=True, check=True)
+    assert output.stdout.strip() == "False"
@@ -0,0 +1,156 @@
+import pytest
+import cv2
+import numpy as np
+import threading
+import tracemalloc
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+
+import sys
+sys.path.insert(0, str(project_root))
+
+from software.analyze_microplastics import (
+    Analyzer,
+    StageBuffers,
+    analyze_image,
+    blur_mask,
+    clean_mask,
+    count_particles,
+    measure,
+    measure_image,
+    segment,
+    threshold_mask,
+    to_hsv,
+)
+
+TEST_IMAGES_DIR = project_root / "tests" / "test-images"
+TEST_IMAGES = sorted(TEST_IMAGES_DIR.glob("test_image_*.jpg"))
+
+def _reference_count(image, min_area=10, max_area=5000):
+    """Count with the stage functions allocating every output (no buffers)."""
+    full_mask, _ = segment(to_hsv(image))
+    particles, _ = measure(clean_mask(threshold_mask(blur_mask(full_mask))))
+    return len(count_particles(particles, min_area, max_area))
+
+@pytest.mark.parametrize("image_path", TEST_IMAGES, ids=lambda path: path.name)
+def test_analyzer_matches_allocating_stages(image_path):
+    """Test that the buffer-reusing Analyzer counts exactly like the allocating stage functions"""
+    image = cv2.imread(str(image_path))
+    count, _ = Analyzer().analyze(image)
+    assert count == _reference_count(image)
+
+def test_analyzer_reuses_buffers_across_frames():
+    """Test that frames of one size are written into the same buffers, and a new size reallocates them"""
+    analyzer = Analyzer()
+    image = cv2.imread(str(TEST_IMAGES[0]))
+    analyzer.analyze(image)
+    buffers = analyzer.buffers
+    hsv, components = buffers.hsv, buffers.components
+    analyzer.analyze(image)
+    assert buffers.hsv is hsv and buffers.components is components
+
+    smaller = np.ascontiguousarray(image[: image.shape[0] // 2, : image.shape[1] // 2])
+    count, _ = analyzer.analyze(smaller)
+    assert buffers.hsv is not hsv
+    assert buffers.shape == smaller.shape[:2]
+    assert count == _reference_count(smaller)
+
+def test_analyzer_results_independent_of_previous_frame():
+    """Test that stale buffer contents from a busier frame don't leak into the next result"""
+    analyzer = Analyzer()
+    busy = cv2.imread(str(TEST_IMAGES[0]))
+    dark = np.zeros_like(busy)
+    analyzer.analyze(busy)
+    assert analyzer.analyze(dark) == (0, "Low")
+    assert analyzer.analyze(busy)[0] == _reference_count(busy)
+
+def test_analyzer_trace_outputs_are_copies():
+    """Test that traced intermediates survive the analyzer's next frame"""
+    analyzer = Analyzer()
+    image = cv2.imread(str(TEST_IMAGES[0]))
+    trace = {}
+    analyzer.analyze(image, trace=trace)
+    cleaned = trace["cleaned"].copy()
+    analyzer.analyze(np.zeros_like(image))
+    np.testing.assert_array_equal(trace["cleaned"], cleaned)
+    assert not np.shares_memory(trace["hsv"], analyzer.buffers.hsv)
+
+def test_analyzer_measure_matches_measure_image():
+    """Test that Analyzer.measure returns the same feature table as measure_image"""
+    image = cv2.imread(str(TEST_IMAGES[0]))
+    particles, category = Analyzer(min_area=20).measure(image)
+    expected, expected_category = measure_image(image, min_area=20)
+    np.testing.assert_array_equal(particles, expected)
+    assert category == expected_category
+
+def test_measure_without_hue_skips_only_the_hue():
+    """Test that hue=False gives the same particles with mean_hue left as NaN"""
+    image = cv2.imread(str(TEST_IMAGES[0]))
+    particles, category = measure_image(image)
+    without_hue, category_without_hue = measure_image(image, hue=False)
+    assert category_without_hue == category
+    assert np.isnan(without_hue["mean_hue"]).all()
+    for name in ("label", "area", "cx", "cy", "size_class"):
+        np.testing.assert_array_equal(without_hue[name], particles[name])
+
+@pytest.mark.parametrize("kwargs", [
+    {"min_area": 100, "max_area": 10},
+    {"blur_ksize": 4},
+    {"blur_ksize": 0},
+    {"morph_ksize": 0},
+])
+def test_analyzer_rejects_invalid_configuration(kwargs):
+    """Test that invalid parameters are rejected when the analyzer is created"""
+    with pytest.raises(ValueError):
+        Analyzer(**kwargs)
+
+def test_stage_buffers_release():
+    """Test that released buffers are reallocated on the next frame"""
+    buffers = StageBuffers()
+    buffers.ensure((4, 6))
+    assert buffers.hsv.shape == (4, 6, 3)
+    assert buffers.components.dtype == np.int32
+    buffers.release()
+    assert buffers.shape is None and not hasattr(buffers, "hsv")
+    buffers.ensure((4, 6))
+    assert buffers.labels.shape == (4, 6)
+
+def test_analyze_image_is_thread_safe():
+    """Test that concurrent analyze_image calls on different threads don't share buffers"""
+    images = [cv2.imread(str(path)) for path in TEST_IMAGES[:4]]
+    expected = [_reference_count(image) for image in images]
+    results = {}
+
+    def work(index):
+        for _ in range(3):
+            results.setdefault(index, []).append(analyze_image(images[index])[0])
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(len(images))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for index, counts in results.items():
+        assert counts == [expected[index]] * 3
+
+def test_analyze_image_follows_parameter_changes():
+    """Test that analyze_image uses the parameters of each call"""
+    image = cv2.imread(str(TEST_IMAGES[0]))
+    assert analyze_image(image, min_area=0)[0] == _reference_count(image, min_area=0)
+    assert analyze_image(image, min_area=50)[0] == _reference_count(image, min_area=50)
+
+def test_analyze_image_does_not_keep_buffers():
+    """Test that the stage buffers of an analyze_image call are freed when it returns"""
+    image = cv2.imread(str(TEST_IMAGES[0]))
+    analyze_image(image)
+    tracemalloc.start()
+    try:
+        analyze_image(image)
+        measure_image(image)
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    # The buffers hold several frame-sized arrays while the call runs, none afterwards
+    assert peak > 2 * image.nbytes
+    assert retained < image.nbytes / 4
@@ -0,0 +1,116 @@
+import pytest
+import csv
+import cv2
+import json
+import matplotlib
+from pathlib import Path
+from unittest.mock import patch
+
+matplotlib.use('Agg')  # Use non-interactive backend
+
+project_root = Path(__file__).parent.parent
+
+import sys
+sys.path.insert(0, str(project_root))
+
+from software.analyze_microplastics import analyze_microplastics
+from software.batch_analysis import analyze_batch, find_images, SummaryWriter, SUMMARY_FIELDS
+from software.result_cache import ResultCache
+
+TEST_IMAGES_DIR = project_root / "tests" / "test-images"
+
+def test_find_images_lists_test_images():
+    """Test that find_images returns every jpg in the directory, sorted"""
+    paths = find_images(str(TEST_IMAGES_DIR))
+    assert len(paths) == len(list(TEST_IMAGES_DIR.glob("*.jpg")))
+    assert paths == sorted(paths)
+
+def test_find_images_missing_directory():
+    """Test that a missing input directory raises FileNotFoundError"""
+    with pytest.raises(FileNotFoundError):
+        find_images("nonexistent_directory")
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_analyze_batch_matches_single_image_results(workers):
+    """Test that batch results match analyze_microplastics for each image"""
+    paths = find_images(str(TEST_IMAGES_DIR), "test_image_[1-3].jpg")
+    results = {r["image_path"]: r for r in analyze_batch(paths, workers=workers)}
+    assert set(results) == set(paths)
+    for path in paths:
+        count, category = analyze_microplastics(path)
+        assert results[path]["count"] == count
+        assert results[path]["category"] == category
+        assert results[path]["elapsed_s"] >= 0
+        assert results[path]["error"] is None
+
+def test_analyze_batch_reports_errors_per_image():
+    """Test that a missing image is reported in its row instead of aborting the batch"""
+    paths = [str(TEST_IMAGES_DIR / "test_image_1.jpg"), "nonexistent_image.jpg"]
+    results = {r["image_path"]: r for r in analyze_batch(paths, workers=1)}
+    assert results["nonexistent_image.jpg"]["error"]
+    assert results["nonexistent_image.jpg"]["count"] is None
+    assert results[paths[0]]["error"] is None
+
+def test_analyze_batch_reports_decoder_errors_per_image():
+    """Test that an OpenCV error on a corrupt capture becomes an error row"""
+    paths = [str(TEST_IMAGES_DIR / "test_image_1.jpg"), str(TEST_IMAGES_DIR / "test_image_2.jpg")]
+    original = analyze_microplastics
+
+    def corrupt_second(image_path, **kwargs):
+        if image_path == paths[1]:
+            raise cv2.error("Corrupt JPEG data")
+        return original(image_path, **kwargs)
+
+    with patch("software.batch_analysis.analyze_microplastics", side_effect=corrupt_second):
+        results = {r["image_path"]: r for r in analyze_batch(paths, workers=1)}
+    assert "Corrupt JPEG data" in results[paths[1]]["error"]
+    assert results[paths[1]]["count"] is None
+    assert results[paths[0]]["error"] is None
+
+def test_closing_batch_early_cancels_queued_images(tmp_path):
+    """Test that closing the generator doesn't analyze the rest of the batch"""
+    data = (TEST_IMAGES_DIR / "test_image_1.jpg").read_bytes()
+    paths = []
+    for i in range(60):
+        # Distinct content, so every image gets its own cache entry
+        path = tmp_path / f"capture_{i}.jpg"
+        path.write_bytes(data + i.to_bytes(2, "big"))
+        paths.append(str(path))
+    cache = ResultCache(tmp_path / "cache")
+    batch = analyze_batch(paths, workers=2, cache=cache)
+    next(batch)
+    batch.close()
+    # Only the images already running or queued (two per worker) were analyzed
+    assert len(list(cache.directory.glob("*.npy"))) <= 6
+
+def test_analyze_batch_shares_result_cache(tmp_path):
+    """Test that worker processes fill a shared cache that a re-run then reads"""
+    paths = find_images(str(TEST_IMAGES_DIR), "test_image_[1-3].jpg")
+    cache = ResultCache(tmp_path / "cache")
+    first = {r["image_path"]: r["count"] for r in analyze_batch(paths, workers=2, cache=cache)}
+    assert len(list(cache.directory.glob("*.npy"))) == len(paths)
+    second = {r["image_path"]: r["count"] for r in analyze_batch(paths, workers=1, cache=cache)}
+    assert first == second
+    assert cache.hits == len(paths)
+
+def test_analyze_batch_invalid_workers():
+    """Test that a non-positive worker count is rejected"""
+    with pytest.raises(ValueError):
+        list(analyze_batch([], workers=0))
+
+@pytest.mark.parametrize("suffix", [".csv", ".jsonl"])
+def test_summary_writer_formats(tmp_path, suffix):
+    """Test that the summary writer produces readable CSV and JSONL files"""
+    summary_path = str(tmp_path / f"summary{suffix}")
+    row = {"image_path": "a.jpg", "count": 3, "category": "Low", "elapsed_s": 0.1, "error": None}
+    with SummaryWriter(summary_path) as writer:
+        writer.write(row)
+
+    with open(summary_path) as f:
+        if suffix == ".jsonl":
+            rows = [json.loads(line) for line in f]
+        else:
+            rows = list(csv.DictReader(f))
+    assert len(rows) == 1
+    assert list(rows[0].keys()) == SUMMARY_FIELDS
+    assert str(rows[0]["count"]) == "3"
@@ -0,0 +1,74 @@
+import pytest
+import copy
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+
+import sys
+sys.path.insert(0, str(project_root))
+
+from software.analyze_microplastics import Analyzer
+from software.benchmark import (
+    _peak_bytes,
+    load_benchmark_images,
+    run_benchmark,
+    compare_to_baseline,
+    save_results,
+    load_results,
+)
+
+TEST_IMAGES_DIR = project_root / "tests" / "test-images"
+
+@pytest.fixture(scope="module")
+def small_results():
+    """A quick benchmark over two images at two resolutions"""
+    cases = load_benchmark_images(TEST_IMAGES_DIR, scales=(0.5, 1.0), pattern="test_image_[1-2].jpg")
+    return run_benchmark(cases, repeat=1, warmup=0)
+
+def test_load_benchmark_images_upscales():
+    """Test that each scale resizes every image"""
+    cases = load_benchmark_images(TEST_IMAGES_DIR, scales=(1.0, 2.0), pattern="test_image_1.jpg")
+    (_, original), = cases[1.0]
+    (_, upscaled), = cases[2.0]
+    assert upscaled.shape[:2] == (original.shape[0] * 2, original.shape[1] * 2)
+
+def test_load_benchmark_images_no_matches():
+    """Test that an empty image set is an error"""
+    with pytest.raises(FileNotFoundError):
+        load_benchmark_images(TEST_IMAGES_DIR, pattern="*.png")
+
+def test_run_benchmark_reports_metrics(small_results):
+    """Test that every case reports throughput, latency and memory"""
+    assert set(small_results["cases"]) == {"0.5x", "1x"}
+    for metrics in small_results["cases"].values():
+        assert metrics["images"] == 2
+        assert metrics["throughput_ips"] > 0
+        assert 0 < metrics["latency_p50_s"] <= metrics["latency_p95_s"]
+        assert metrics["peak_bytes"] > 0
+
+def test_compare_to_baseline_flags_slowdowns(small_results):
+    """Test that slowdowns beyond the tolerance are reported and others are not"""
+    assert compare_to_baseline(small_results, small_results, tolerance=0.1) == []
+
+    faster_baseline = copy.deepcopy(small_results)
+    faster_baseline["cases"]["1x"]["latency_p50_s"] /= 2
+    faster_baseline["cases"]["1x"]["throughput_ips"] *= 2
+    regressions = compare_to_baseline(small_results, faster_baseline, tolerance=0.1)
+    assert any("1x latency_p50_s" in r for r in regressions)
+    assert any("1x throughput_ips" in r for r in regressions)
+
+def test_results_round_trip(small_results, tmp_path):
+    """Test that results survive being saved as a JSON baseline"""
+    path = tmp_path / "baseline.json"
+    save_results(small_results, path)
+    assert load_results(path) == small_results
+
+def test_peak_bytes_counts_analyzer_buffers():
+    """Test that peak memory includes the stage buffers, with or without a held Analyzer"""
+    (_, image), = load_benchmark_images(TEST_IMAGES_DIR, pattern="test_image_1.jpg")[1.0]
+    analyzer = Analyzer()
+    analyzer.analyze(image)
+    held = _peak_bytes(analyzer.analyze, image, {})
+    fresh = _peak_bytes(Analyzer().analyze, image, {})
+    assert held > 2 * image.nbytes
+    assert held == pytest.approx(fresh, rel=0.1)
@@ -0,0 +1,169 @@
+import pytest
+import cv2
+import numpy as np
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+
+import sys
+sys.path.insert(0, str(project_root))
+
+from software.analyze_microplastics import Analyzer, analyze_image
+from software.calibration import (
+    MAX_GAIN,
+    Calibration,
+    build_calibration,
+    capture_calibration,
+    correct_frame,
+    load_calibration,
+    save_calibration,
+    settings_name,
+)
+from software.camera_session import CameraSession, FakeCameraBackend, camera_controls
+from software.monitor import FakeLights
+
+TEST_IMAGES_DIR = project_root / "tests" / "test-images"
+HEIGHT, WIDTH = 240, 320
+DARK_LEVEL = 10
+
+def _falloff():
+    """LED ring illumination: bright in the center, down to 10% in the corners."""
+    rows, cols = np.mgrid[0:HEIGHT, 0:WIDTH].astype(np.float32)
+    radius2 = (((cols - WIDTH / 2) / (WIDTH / 2)) ** 2 + ((rows - HEIGHT / 2) / (HEIGHT / 2)) ** 2) / 2
+    return np.clip(1 - 1.2 * radius2, 0.1, 1)[..., None]
+
+def _reference_frames(count=5, seed=0):
+    rng = np.random.default_rng(seed)
+    darks = [(DARK_LEVEL + rng.integers(0, 3, (HEIGHT, WIDTH, 3))).astype(np.uint8) for _ in range(count)]
+    flats = [
+        np.clip(200 * _falloff() + DARK_LEVEL + rng.normal(0, 2, (HEIGHT, WIDTH, 3)), 0, 255).astype(np.uint8)
+        for _ in range(count)
+    ]
+    return darks, flats
+
+def _vignetted_sample():
+    """A grid of orange particles under the falloff, and the number of particles."""
+    scene = np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8)
+    count = 0
+    for y in range(20, HEIGHT, 40):
+        for x in range(20, WIDTH, 40):
+            cv2.circle(scene, (x, y), 5, (0, 128, 255), -1)
+            count += 1
+    return np.clip(scene * _falloff() + DARK_LEVEL, 0, 255).astype(np.uint8), count
+
+def test_calibration_recovers_edge_particles():
+    """Test that flat-field correction recovers particles lost to the illumination falloff"""
+    raw, expected = _vignetted_sample()
+    calibration = build_calibration(*_reference_frames())
+    assert analyze_image(raw)[0] < expected
+    assert analyze_image(raw, calibration=calibration)[0] == expected
+
+def test_flat_correction_evens_out_illumination():
+    """Test that a corrected flat frame is nearly uniform"""
+    darks, flats = _reference_frames()
+    calibration = build_calibration(darks, flats, flat_sigma=0)
+    corrected = calibration.apply(flats[0]).astype(np.float32)
+    raw_spread = flats[0].astype(np.float32).std()
+    assert corrected.std() < raw_spread / 10
+
+def test_correction_matches_float_reference():
+    """Test that the vectorized correction equals (raw - dark) * gain computed in float"""
+    darks, flats = _reference_frames()
+    calibration = build_calibration(darks, flats)
+    raw, _ = _vignetted_sample()
+    expected = np.clip(np.rint(np.clip(raw.astype(np.float32) - calibration.dark, 0, None) * calibration.gain), 0, 255)
+    np.testing.assert_array_equal(calibration.apply(raw), expected.astype(np.uint8))
+    assert calibration.gain.dtype == np.float32 and calibration.gain.max() <= MAX_GAIN
+
+def test_dark_only_calibration():
+    """Test that a dark-only calibration just subtracts the dark frame, saturating at 0"""
+    darks, _ = _reference_frames()
+    calibration = build_calibration(dark_frames=darks)
+    assert calibration.gain is None
+    np.testing.assert_array_equal(calibration.apply(darks[0] // 2), np.zeros_like(darks[0]))
+
+def test_no_calibration_is_a_no_op():
+    """Test that the fast path returns the frame itself when there is no calibration"""
+    frame = cv2.imread(str(TEST_IMAGES_DIR / "test_image_1.jpg"))
+    assert correct_frame(frame) is frame
+    assert Calibration(None, None).apply(frame) is frame
+
+def test_shape_mismatch_raises():
+    """Test that a calibration can't be applied to frames of another size"""
+    calibration = build_calibration(*_reference_frames())
+    with pytest.raises(ValueError):
+        calibration.apply(np.zeros((HEIGHT // 2, WIDTH // 2, 3), dtype=np.uint8))
+
+def test_build_needs_frames():
+    """Test that building a calibration without reference frames raises"""
+    with pytest.raises(ValueError):
+        build_calibration()
+
+def test_save_and_load_memory_maps(tmp_path):
+    """Test that saved calibrations load back memory-mapped, per device and setting"""
+    calibration = build_calibration(*_reference_frames())
+    save_calibration(calibration, tmp_path, device="pi-1", settings="auto")
+    loaded = load_calibration(tmp_path, device="pi-1", settings="auto")
+    assert isinstance(loaded.gain, np.memmap) and isinstance(loaded.dark, np.memmap)
+    np.testing.assert_array_equal(loaded.gain, calibration.gain)
+    np.testing.assert_array_equal(loaded.dark, calibration.dark)
+    # Unchanged files map once; other devices and settings have no calibration
+    assert load_calibration(tmp_path, device="pi-1", settings="auto").gain is loaded.gain
+    assert load_calibration(tmp_path, device="pi-2", settings="auto") is None
+    assert load_calibration(tmp_path, device="pi-1", settings="ExposureTime-20000") is None
+
+def test_loaded_calibration_gives_same_result(tmp_path):
+    """Test that analysis with a memory-mapped calibration matches the in-memory one"""
+    calibration = build_calibration(*_reference_frames())
+    save_calibration(calibration, tmp_path, device="pi-1")
+    raw, _ = _vignetted_sample()
+    analyzer = Analyzer(calibration=load_calibration(tmp_path, device="pi-1"))
+    trace = {}
+    count, _ = analyzer.analyze(raw, trace=trace)
+    assert count == analyze_image(raw, calibration=calibration)[0]
+    np.testing.assert_array_equal(trace["corrected"], calibration.apply(raw))
+
+def test_settings_name():
+    """Test that camera controls map to stable, filesystem-safe names"""
+    assert settings_name({}) == "auto"
+    controls = camera_controls(shutter_us=20000, gain=2.0, awbgains="1.8,1.2")
+    name = settings_name(controls)
+    assert name == settings_name(dict(reversed(list(controls.items()))))
+    assert "ExposureTime-20000" in name and "/" not in name
+
+class _RecordingBackend(FakeCameraBackend):
+    """Fake backend that remembers the controls in effect for every captured frame."""
+
+    def __init__(self, frames):
+        super().__init__(frames=frames)
+        self.captured_with = []
+
+    def capture_array(self):
+        self.captured_with.append(dict(self.controls))
+        return super().capture_array()
+
+def test_capture_calibration_switches_lights():
+    """Test that flat frames are taken with the LEDs on and dark frames with them off"""
+    darks, flats = _reference_frames(count=2)
+    camera = CameraSession(backend=FakeCameraBackend(frames=flats + darks), shutter_us=20000)
+    lights = FakeLights()
+    with camera:
+        settings = settings_name(camera.controls)
+        calibration = capture_calibration(camera, lights, frames=2, settle_s=0)
+    assert lights.events == ["on", "off"]
+    assert not lights.is_on
+    assert calibration.settings == settings
+    np.testing.assert_array_equal(calibration.dark, build_calibration(darks, flats).dark)
+
+def test_capture_calibration_locks_auto_exposure():
+    """Test that in auto mode every reference frame is captured with AE and AWB locked"""
+    darks, flats = _reference_frames(count=2)
+    backend = _RecordingBackend(frames=flats + darks)
+    camera = CameraSession(backend=backend)
+    with camera:
+        calibration = capture_calibration(camera, FakeLights(), frames=2, settle_s=0)
+    assert calibration.settings == "auto"
+    assert len(backend.captured_with) == 4
+    for controls in backend.captured_with:
+        assert controls["AeEnable"] is False and controls["AwbEnable"] is False
+        assert controls["ExposureTime"] == backend.captured_with[0]["ExposureTime"]
@@ -0,0 +1,75 @@
+import pytest
+import numpy as np
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+
+import sys
+sys.path.insert(0, str(project_root))
+
+from software.camera_session import CameraSession, FakeCameraBackend, camera_controls
+
+TEST_IMAGES_DIR = project_root / "tests" / "test-images"
+
+def test_session_keeps_camera_open_across_captures():
+    """Test that many captures only start the camera once"""
+    backend = FakeCameraBackend()
+    with CameraSession(backend=backend) as camera:
+        for _ in range(5):
+            frame = camera.capture()
+            assert frame.shape == (480, 640, 3)
+        assert camera.frame_count == 5
+    assert backend.start_count == 1
+    assert not backend.running
+
+def test_session_replays_fake_frames():
+    """Test that the fake backend cycles through the given images"""
+    paths = [TEST_IMAGES_DIR / "test_image_1.jpg", TEST_IMAGES_DIR / "test_image_2.jpg"]
+    backend = FakeCameraBackend(frames=paths)
+    with CameraSession(backend=backend) as camera:
+        frames = [camera.capture() for _ in range(3)]
+    assert np.array_equal(frames[0], frames[2])
+    assert frames[0].shape[2] == 3
+
+def test_session_applies_fixed_controls():
+    """Test that manual settings are passed to the camera as fixed controls"""
+    backend = FakeCameraBackend()
+    with CameraSession(backend=backend, shutter_us=20000, gain=2.0, awbgains="1.8,1.2"):
+        assert backend.controls == {
+            "ExposureTime": 20000,
+            "AnalogueGain": 2.0,
+            "AeEnable": False,
+            "ColourGains": (1.8, 1.2),
+            "AwbEnable": False,
+        }
+
+def test_lock_settings_freezes_converged_values():
+    """Test that lock_settings disables AE/AWB using the converged values"""
+    backend = FakeCameraBackend()
+    with CameraSession(backend=backend) as camera:
+        locked = camera.lock_settings()
+    assert locked["AeEnable"] is False
+    assert locked["AwbEnable"] is False
+    assert "ExposureTime" in backend.controls
+
+def test_capture_requires_open_session():
+    """Test that capturing from a closed session raises RuntimeError"""
+    camera = CameraSession(backend=FakeCameraBackend())
+    with pytest.raises(RuntimeError):
+        camera.capture()
+
+def test_camera_controls_invalid_awbgains():
+    """Test that malformed AWB gains are rejected"""
+    with pytest.raises(ValueError):
+        camera_controls(awbgains="1.8")
+
+def test_capture_burst_yields_frames_lazily():
+    """Test that a burst yields the requested number of frames one at a time"""
+    backend = FakeCameraBackend()
+    with CameraSession(backend=backend) as camera:
+        burst = camera.capture_burst(3)
+        assert backend.capture_count == 0
+        assert len(list(burst)) == 3
+        with pytest.raises(ValueError):
+            list(camera.capture_burst(0))
+    assert camera.frame_count == 3
@@ -1,5 +1,6 @@
 import pytest
 import os
+import numpy as np
 from unittest.mock import patch, MagicMock
 from pathlib import Path
 
@@ -8,7 +9,7 @@ project_root = Path(__file__).parent.parent
 import sys
 sys.path.insert(0, str(project_root))
 
-from software.capture_image import capture_image
+from software.capture_image import capture_image, capture_frame, save_image_async
 
 def test_capture_image_creates_directory():
     """Test that capture_image creates output directory"""
@@ -44,4 +45,36 @@ def test_capture_image_failure():
         with pytest.raises(RuntimeError) as exc_info:
             capture_image()
         
-        assert "Image capture failed" in str(exc_info.value)
\ No newline at end of file
+        assert "Image capture failed" in str(exc_info.value)
+
+def test_capture_frame_decodes_stdout():
+    """Test that capture_frame decodes the image streamed on stdout without writing a file"""
+    jpeg = (project_root / "tests" / "test-images" / "test_image_1.jpg").read_bytes()
+    with patch('subprocess.run') as mock_run:
+        mock_run.return_value = MagicMock(returncode=0, stdout=jpeg)
+        frame = capture_frame()
+
+        cmd = mock_run.call_args[0][0]
+        assert cmd[cmd.index("-o") + 1] == "-"
+        assert frame.ndim == 3 and frame.shape[2] == 3
+
+def test_capture_frame_failure():
+    """Test that capture_frame raises on a failed or unreadable capture"""
+    with patch('subprocess.run') as mock_run:
+        mock_run.return_value = MagicMock(returncode=1, stdout=b"")
+        with pytest.raises(RuntimeError):
+            capture_frame()
+
+        mock_run.return_value = MagicMock(returncode=0, stdout=b"not a jpeg")
+        with pytest.raises(RuntimeError):
+            capture_frame()
+
+def test_save_image_async_writes_jpeg(tmp_path):
+    """Test that save_image_async writes a sample_*.jpg in the background"""
+    frame = np.zeros((8, 8, 3), dtype=np.uint8)
+    path, writer = save_image_async(frame, str(tmp_path))
+    writer.join()
+
+    assert Path(path).name.startswith("sample_")
+    assert path.endswith(".jpg")
+    assert os.path.exists(path)
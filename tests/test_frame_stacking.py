@@ -0,0 +1,113 @@
+import pytest
+import cv2
+import numpy as np
+import tracemalloc
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+
+import sys
+sys.path.insert(0, str(project_root))
+
+from software.analyze_microplastics import analyze_image
+from software.camera_session import CameraSession, FakeCameraBackend
+from software.frame_stacking import StackAccumulator, capture_stacked, stack_frames
+
+TEST_IMAGES_DIR = project_root / "tests" / "test-images"
+
+def _noisy_burst(image, count, sigma=8, speckle_rate=0.01, seed=0):
+    """Copies of image, each with its own salt speckle and Gaussian sensor noise"""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for _ in range(count):
+        noisy = image.astype(np.float32) + rng.normal(0, sigma, image.shape)
+        speckle = rng.random(image.shape[:2]) < speckle_rate
+        noisy[speckle] = 255
+        frames.append(np.clip(noisy, 0, 255).astype(np.uint8))
+    return frames
+
+def _shift(image, dx, dy):
+    matrix = np.float32([[1, 0, dx], [0, 1, dy]])
+    return cv2.warpAffine(image, matrix, image.shape[1::-1], flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REFLECT)
+
+@pytest.mark.parametrize("count", [4, 5])
+def test_median_matches_numpy(count):
+    """Test that the partition-based median equals np.median (rounded)"""
+    frames = _noisy_burst(np.full((20, 30, 3), 100, dtype=np.uint8), count)
+    expected = np.floor(np.median(np.stack(frames), axis=0) + 0.5).astype(np.uint8)
+    assert np.array_equal(stack_frames(frames, "median"), expected)
+
+def test_stacking_reduces_noise():
+    """Test that the median removes speckle and the mean averages down sensor noise"""
+    # Lift the (mostly black) image to mid-gray so clipping at 0 doesn't bias the noise
+    image = cv2.imread(str(TEST_IMAGES_DIR / "test_image_1.jpg")) // 2 + 64
+
+    def error(frame):
+        return np.abs(frame.astype(int) - image).mean()
+
+    speckled = _noisy_burst(image, 5, sigma=0, speckle_rate=0.02)
+    assert error(stack_frames(speckled, "median")) < error(speckled[0]) / 10
+
+    noisy = _noisy_burst(image, 9, speckle_rate=0)
+    # Averaging 9 frames should cut the noise by about 3x
+    assert error(stack_frames(noisy, "mean")) < error(noisy[0]) / 2
+
+def test_accumulator_matches_mean_stack():
+    """Test that the streaming mean equals the in-memory mean stack"""
+    frames = _noisy_burst(cv2.imread(str(TEST_IMAGES_DIR / "test_image_2.jpg")), 6)
+    accumulator = StackAccumulator()
+    for frame in frames:
+        accumulator.add(frame)
+    assert accumulator.count == 6
+    difference = np.abs(accumulator.result().astype(int) - stack_frames(frames, "mean"))
+    assert difference.max() <= 1
+
+def test_accumulator_memory_independent_of_burst_length():
+    """Test that adding more frames doesn't grow the accumulator's memory"""
+    frame = np.zeros((200, 200, 3), dtype=np.uint8)
+
+    def peak(count):
+        accumulator = StackAccumulator()
+        tracemalloc.start()
+        try:
+            for _ in range(count):
+                accumulator.add(frame)
+            accumulator.result()
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    assert peak(50) < peak(2) * 1.5
+
+def test_alignment_recovers_subpixel_shift():
+    """Test that aligned stacking undoes sub-pixel jitter between frames"""
+    image = cv2.imread(str(TEST_IMAGES_DIR / "test_image_1.jpg"))
+    frames = [image, _shift(image, 2.5, -1.25), _shift(image, -1.5, 0.75)]
+    inner = (slice(10, -10), slice(10, -10))
+    unaligned = np.abs(stack_frames(frames, "mean")[inner].astype(int) - image[inner]).mean()
+    aligned = np.abs(stack_frames(frames, "mean", align=True)[inner].astype(int) - image[inner]).mean()
+    assert aligned < unaligned / 2
+
+    accumulator = StackAccumulator(align=True)
+    for frame in frames:
+        accumulator.add(frame)
+    assert accumulator.shifts[0] == pytest.approx((2.5, -1.25), abs=0.5)
+
+def test_capture_stacked_from_session():
+    """Test that a burst from a camera session stacks to the analysis of the clean frame"""
+    image = cv2.imread(str(TEST_IMAGES_DIR / "test_image_1.jpg"))
+    backend = FakeCameraBackend(frames=[image])
+    with CameraSession(backend=backend) as camera:
+        for method in ["median", "mean"]:
+            stacked = capture_stacked(camera, 3, method)
+            assert analyze_image(stacked) == analyze_image(image)
+    assert backend.capture_count == 6
+
+def test_stack_frames_invalid_input():
+    """Test that empty bursts, mismatched shapes and unknown methods are rejected"""
+    with pytest.raises(ValueError):
+        stack_frames([])
+    with pytest.raises(ValueError):
+        stack_frames([np.zeros((2, 2, 3), np.uint8), np.zeros((3, 2, 3), np.uint8)])
+    with pytest.raises(ValueError):
+        stack_frames([np.zeros((2, 2, 3), np.uint8)], method="max")
@@ -0,0 +1,114 @@
+import pytest
+import cv2
+import numpy as np
+import threading
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+
+import sys
+sys.path.insert(0, str(project_root))
+
+from software.analyze_microplastics import analyze_microplastics
+from software.batch_analysis import analyze_batch, find_images
+from software.image_decode import (
+    choose_decode_scale,
+    decode_image,
+    load_image,
+    prefetch_images,
+    resolve_decode_scale,
+    scale_area_limits,
+)
+from software.result_cache import cache_key
+
+TEST_IMAGES_DIR = project_root / "tests" / "test-images"
+IMAGE = TEST_IMAGES_DIR / "test_image_1.jpg"
+
+@pytest.mark.parametrize("scale", [1, 2, 4, 8])
+def test_reduced_decode_shapes(scale):
+    """Test that a reduced decode has 1/scale of the native width and height"""
+    full = cv2.imread(str(IMAGE))
+    image = decode_image(IMAGE.read_bytes(), scale)
+    assert abs(image.shape[0] - full.shape[0] / scale) <= 1
+    assert abs(image.shape[1] - full.shape[1] / scale) <= 1
+    assert image.shape[2] == 3
+    assert image.dtype == np.uint8
+
+def test_load_image_from_memory_map():
+    """Test that decoding from a memory-mapped file gives the same pixels as cv2.imread"""
+    expected = cv2.imread(str(IMAGE))
+    np.testing.assert_array_equal(load_image(str(IMAGE), use_mmap=True), expected)
+    np.testing.assert_array_equal(load_image(str(IMAGE)), expected)
+
+@pytest.mark.parametrize("use_mmap", [False, True])
+def test_load_image_errors(tmp_path, use_mmap):
+    """Test that missing, empty and corrupt files raise the same errors as analyze_microplastics"""
+    with pytest.raises(FileNotFoundError):
+        load_image(str(tmp_path / "missing.jpg"), use_mmap=use_mmap)
+    for name, data in [("empty.jpg", b""), ("corrupt.jpg", b"not an image")]:
+        path = tmp_path / name
+        path.write_bytes(data)
+        with pytest.raises(ValueError, match="Failed to load image"):
+            load_image(str(path), use_mmap=use_mmap)
+    with pytest.raises(ValueError):
+        decode_image(IMAGE.read_bytes(), scale=3)
+
+def test_decode_scale_follows_min_area():
+    """Test that the automatic scale only reduces the decode for large min_area, and never below 1/2"""
+    assert choose_decode_scale(10) == 1
+    assert choose_decode_scale(200) == 1
+    assert choose_decode_scale(400) == 2
+    assert choose_decode_scale(10000) == 2
+    assert resolve_decode_scale("auto", 40) == 1
+    assert resolve_decode_scale("auto", 400) == 2
+    assert resolve_decode_scale(4, 10) == 4
+    with pytest.raises(ValueError):
+        resolve_decode_scale(3, 10)
+    assert scale_area_limits(40, 5000, 2) == (10, 1250)
+
+def test_reduced_decode_analysis_is_comparable():
+    """Test that analysis of a reduced decode uses rescaled areas and stays close to full resolution"""
+    full_count, _ = analyze_microplastics(str(IMAGE))
+    assert analyze_microplastics(str(IMAGE), decode_scale="auto") == (full_count, "Medium")
+    reduced_count, _ = analyze_microplastics(str(IMAGE), decode_scale=2)
+    assert abs(reduced_count - full_count) <= 0.3 * full_count
+
+@pytest.mark.parametrize("image_path", sorted(TEST_IMAGES_DIR.glob("*.jpg")), ids=lambda path: path.stem)
+@pytest.mark.parametrize("min_area", [10, 40, 200, 400, 800, 2000])
+def test_auto_decode_counts_match_full_resolution(image_path, min_area):
+    """Test that "auto" keeps counts within 10% (or 4 particles) of full resolution on every test image"""
+    full_count, _ = analyze_microplastics(str(image_path), min_area=min_area)
+    auto_count, _ = analyze_microplastics(str(image_path), min_area=min_area, decode_scale="auto")
+    assert abs(auto_count - full_count) <= max(0.1 * full_count, 4)
+
+def test_cache_key_depends_on_decode_scale():
+    """Test that reduced-decode measurements are cached separately"""
+    assert cache_key("abc", 10, 5000) != cache_key("abc", 10, 5000, decode_scale=2)
+
+def test_prefetch_yields_in_order_with_errors():
+    """Test that prefetching keeps the input order and reports unreadable files in place"""
+    paths = [str(TEST_IMAGES_DIR / "test_image_5.jpg"), "missing.jpg", str(TEST_IMAGES_DIR / "test_image_6.jpg")]
+    items = list(prefetch_images(paths, depth=1))
+    assert [path for path, _, _ in items] == paths
+    assert items[0][1].shape == cv2.imread(paths[0]).shape
+    assert items[1][1] is None
+    assert isinstance(items[1][2], FileNotFoundError)
+    assert items[2][2] is None
+
+def test_prefetch_stops_when_consumer_stops():
+    """Test that abandoning the generator stops the decode thread"""
+    paths = [str(IMAGE)] * 20
+    generator = prefetch_images(paths, depth=2)
+    next(generator)
+    generator.close()
+    assert not any(thread.name == "decode-ahead" for thread in threading.enumerate())
+    with pytest.raises(ValueError):
+        next(prefetch_images(paths, depth=0))
+
+def test_batch_prefetch_matches_plain_batch():
+    """Test that serial batches with decode-ahead give the same rows as without it"""
+    paths = find_images(str(TEST_IMAGES_DIR), "test_image_[1-4].jpg") + ["missing.jpg"]
+    plain = {r["image_path"]: (r["count"], r["category"], bool(r["error"])) for r in analyze_batch(paths, workers=1)}
+    ahead = [r for r in analyze_batch(paths, workers=1, prefetch=2, min_area=10)]
+    assert [r["image_path"] for r in ahead] == paths
+    assert {r["image_path"]: (r["count"], r["category"], bool(r["error"])) for r in ahead} == plain
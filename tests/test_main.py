@@ -1,19 +1,26 @@
-from unittest.mock import patch
+from unittest.mock import patch, MagicMock
 from pathlib import Path
 import sys
 
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
+import numpy as np
+
+from software.camera_session import CameraSession, FakeCameraBackend
 from software.main import run_capture_and_analysis
 
 def test_run_capture_and_analysis():
     """Test the main analysis pipeline"""
-    with patch('software.main.capture_image') as mock_capture, \
-         patch('software.main.analyze_microplastics') as mock_analyze:
+    with patch('software.main.capture_frame') as mock_capture, \
+         patch('software.main.save_image_async') as mock_save, \
+         patch('software.main.analyze_image') as mock_analyze:
         
         # Mock return values
-        mock_capture.return_value = "test_image.jpg"
+        frame = MagicMock()
+        writer = MagicMock()
+        mock_capture.return_value = frame
+        mock_save.return_value = ("captures/sample_test.jpg", writer)
         mock_analyze.return_value = (10, "Medium")
         
         # Run the function
@@ -21,4 +28,95 @@ def test_run_capture_and_analysis():
         
         # Verify calls
         mock_capture.assert_called_once()
-        mock_analyze.assert_called_once_with("test_image.jpg")
\ No newline at end of file
+        mock_save.assert_called_once_with(frame)
+        mock_analyze.assert_called_once_with(frame)
+        writer.join.assert_called_once()
+
+def test_run_capture_and_analysis_without_saving():
+    """Test that the capture is only analyzed in memory when saving is disabled"""
+    with patch('software.main.illuminate_sample'), \
+         patch('software.main.cleanup'), \
+         patch('software.main.capture_frame') as mock_capture, \
+         patch('software.main.save_image_async') as mock_save, \
+         patch('software.main.analyze_image') as mock_analyze:
+
+        mock_analyze.return_value = (10, "Medium")
+
+        run_capture_and_analysis(save_capture=False)
+
+        mock_save.assert_not_called()
+        mock_analyze.assert_called_once_with(mock_capture.return_value)
+
+def test_run_capture_and_analysis_records_to_store():
+    """Test that a given results store receives the count, category and particle table"""
+    with patch('software.main.illuminate_sample'), \
+         patch('software.main.cleanup'), \
+         patch('software.main.capture_frame') as mock_capture, \
+         patch('software.main.save_image_async') as mock_save, \
+         patch('software.main.measure_image') as mock_measure:
+
+        particles = [MagicMock(), MagicMock()]
+        mock_save.return_value = ("captures/sample_test.jpg", MagicMock())
+        mock_measure.return_value = (particles, "Low")
+        store = MagicMock()
+
+        run_capture_and_analysis(store=store)
+
+        mock_measure.assert_called_once_with(mock_capture.return_value)
+        store.add_result.assert_called_once_with(2, "Low", image_path="captures/sample_test.jpg", particles=particles)
+
+def test_run_capture_and_analysis_queues_overlay():
+    """Test that a given renderer is handed the frame and particle table after the count"""
+    with patch('software.main.illuminate_sample'), \
+         patch('software.main.cleanup'), \
+         patch('software.main.capture_frame') as mock_capture, \
+         patch('software.main.save_image_async') as mock_save, \
+         patch('software.main.measure_image') as mock_measure:
+
+        particles = [MagicMock()]
+        mock_save.return_value = ("captures/sample_test.jpg", MagicMock())
+        mock_measure.return_value = (particles, "Low")
+        renderer = MagicMock()
+
+        run_capture_and_analysis(renderer=renderer)
+
+        mock_measure.assert_called_once_with(mock_capture.return_value, hue=False)
+        renderer.submit.assert_called_once_with(mock_capture.return_value, particles, "sample_test", category="Low")
+
+def test_burst_is_captured_in_one_camera_session():
+    """Test that a burst runs through one session, locked after the first frame, and is stacked"""
+    frames = [np.full((4, 6, 3), value, dtype=np.uint8) for value in (10, 20, 90)]
+    backend = FakeCameraBackend(frames=frames)
+    camera = CameraSession(backend=backend)
+    with patch('software.main.illuminate_sample'), \
+         patch('software.main.cleanup'), \
+         patch('software.main.CameraSession', return_value=camera), \
+         patch('software.main.capture_frame') as mock_capture, \
+         patch('software.main.analyze_image') as mock_analyze:
+
+        mock_analyze.return_value = (0, "Low")
+
+        run_capture_and_analysis(save_capture=False, burst=3)
+
+        mock_capture.assert_not_called()
+        assert backend.start_count == 1 and backend.capture_count == 3
+        assert backend.controls["AeEnable"] is False and backend.controls["AwbEnable"] is False
+        assert not camera.is_open
+        np.testing.assert_array_equal(mock_analyze.call_args.args[0], frames[1])
+
+def test_mean_burst_is_accumulated_frame_by_frame():
+    """Test that a mean burst is stacked as it arrives instead of being collected first"""
+    frames = [np.full((4, 6, 3), value, dtype=np.uint8) for value in (10, 20, 90)]
+    camera = CameraSession(backend=FakeCameraBackend(frames=frames))
+    with patch('software.main.illuminate_sample'), \
+         patch('software.main.cleanup'), \
+         patch('software.main.CameraSession', return_value=camera), \
+         patch('software.main.stack_frames') as mock_stack, \
+         patch('software.main.analyze_image') as mock_analyze:
+
+        mock_analyze.return_value = (0, "Low")
+
+        run_capture_and_analysis(save_capture=False, burst=3, stack_method="mean")
+
+        mock_stack.assert_not_called()
+        np.testing.assert_array_equal(mock_analyze.call_args.args[0], np.full((4, 6, 3), 40, dtype=np.uint8))
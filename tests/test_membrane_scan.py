@@ -0,0 +1,119 @@
+import pytest
+import cv2
+import numpy as np
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+
+import sys
+sys.path.insert(0, str(project_root))
+
+from software.analyze_microplastics import Analyzer
+from software.membrane_scan import MembraneScan
+
+TEST_IMAGES_DIR = project_root / "tests" / "test-images"
+FRAME_HEIGHT, FRAME_WIDTH = 400, 500
+
+def _membrane(particles=250, height=780, width=1300, seed=3):
+    """Synthetic membrane with well-separated orange particles on a noisy dark background."""
+    rng = np.random.default_rng(seed)
+    membrane = np.zeros((height, width, 3), dtype=np.uint8)
+    centers = []
+    while len(centers) < particles:
+        center = rng.integers(10, [width - 10, height - 10])
+        if all(np.hypot(*(center - other)) > 20 for other in centers):
+            centers.append(center)
+    for x, y in centers:
+        cv2.circle(membrane, (int(x), int(y)), int(rng.integers(3, 7)), (0, 128, 255), -1)
+    membrane = cv2.add(membrane, rng.integers(0, 20, membrane.shape).astype(np.uint8))
+    return membrane, len(centers)
+
+def _serpentine(membrane, step_x=200, step_y=190):
+    """Overlapping fields of a serpentine scan, as (frame, (x, y)) in scan order."""
+    height, width = membrane.shape[:2]
+    fields = []
+    for row, y in enumerate(range(0, height - FRAME_HEIGHT + 1, step_y)):
+        columns = list(range(0, width - FRAME_WIDTH + 1, step_x))
+        for x in columns if row % 2 == 0 else columns[::-1]:
+            fields.append((membrane[y:y + FRAME_HEIGHT, x:x + FRAME_WIDTH].copy(), (x, y)))
+    return fields
+
+def test_scan_counts_each_particle_once():
+    """Test that registered, de-duplicated scan counts match the particles on the membrane"""
+    membrane, expected = _membrane()
+    scan = MembraneScan()
+    results = [scan.add_frame(frame) for frame, _ in _serpentine(membrane)]
+    assert scan.total == expected
+    # Counting every frame independently double-counts the overlaps
+    assert sum(result.particles for result in results) > 2 * expected
+    assert [result.total for result in results] == sorted(result.total for result in results)
+
+def test_registration_recovers_positions():
+    """Test that incremental registration places every frame within a pixel of its true position"""
+    membrane, _ = _membrane()
+    scan = MembraneScan()
+    for frame, (x, y) in _serpentine(membrane):
+        result = scan.add_frame(frame)
+        assert result.position == pytest.approx((x, y), abs=1.0)
+
+def test_known_positions_skip_registration():
+    """Test that stage positions passed to add_frame give the same total as registration"""
+    membrane, expected = _membrane()
+    scan = MembraneScan()
+    for frame, position in _serpentine(membrane):
+        result = scan.add_frame(frame, position)
+        assert result.position == position and result.response == 1.0
+    assert scan.total == expected
+
+def test_window_bounds_memory():
+    """Test that only the last `window` frames are kept for de-duplication"""
+    membrane, _ = _membrane()
+    scan = MembraneScan(window=3)
+    for frame, position in _serpentine(membrane):
+        scan.add_frame(frame, position)
+    assert len(scan._window) == 3
+
+def test_too_small_window_double_counts():
+    """Test that a window shorter than two scan rows misses the overlap with the row before last"""
+    membrane, expected = _membrane()
+    scan = MembraneScan(window=4)
+    for frame, position in _serpentine(membrane):
+        scan.add_frame(frame, position)
+    assert scan.total > expected
+
+def test_non_overlapping_frames_are_all_new():
+    """Test that frames without overlap never de-duplicate each other"""
+    frame = cv2.imread(str(TEST_IMAGES_DIR / "test_image_1.jpg"))
+    analyzer = Analyzer()
+    count, _ = analyzer.analyze(frame)
+    scan = MembraneScan(analyzer=analyzer)
+    scan.add_frame(frame, (0, 0))
+    result = scan.add_frame(frame, (frame.shape[1], 0))
+    assert result.duplicates == 0
+    assert scan.total == 2 * count
+
+def test_mosaic_covers_the_scan():
+    """Test that the preview mosaic grows to the scanned area at the mosaic scale"""
+    membrane, _ = _membrane()
+    scan = MembraneScan(mosaic_scale=4)
+    for frame, position in _serpentine(membrane):
+        scan.add_frame(frame, position)
+    height, width = membrane.shape[:2]
+    assert scan.mosaic.shape[0] == pytest.approx(height / 4, abs=2)
+    assert scan.mosaic.shape[1] == pytest.approx(width / 4, abs=2)
+    assert MembraneScan().mosaic is None
+
+def test_unregistrable_frame_raises():
+    """Test that a frame with nothing in common with the previous one is rejected"""
+    rng = np.random.default_rng(0)
+    scan = MembraneScan()
+    scan.add_frame(np.zeros((FRAME_HEIGHT, FRAME_WIDTH, 3), dtype=np.uint8))
+    with pytest.raises(ValueError):
+        scan.add_frame(rng.integers(0, 255, (FRAME_HEIGHT, FRAME_WIDTH, 3)).astype(np.uint8))
+
+def test_frame_size_change_raises():
+    """Test that all frames of a scan must have the same size"""
+    scan = MembraneScan()
+    scan.add_frame(np.zeros((FRAME_HEIGHT, FRAME_WIDTH, 3), dtype=np.uint8))
+    with pytest.raises(ValueError):
+        scan.add_frame(np.zeros((FRAME_HEIGHT // 2, FRAME_WIDTH, 3), dtype=np.uint8))
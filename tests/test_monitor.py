@@ -0,0 +1,132 @@
+import pytest
+import cv2
+import threading
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+
+import sys
+sys.path.insert(0, str(project_root))
+
+from software.analyze_microplastics import analyze_image
+from software.camera_session import CameraSession, FakeCameraBackend
+from software.monitor import FakeLights, Monitor
+
+TEST_IMAGES_DIR = project_root / "tests" / "test-images"
+
+class TrackingLights(FakeLights):
+    """Fake lights that also record whether they were on during each capture"""
+
+    def __init__(self, backend):
+        super().__init__()
+        self.lit_during_capture = []
+        original_capture = backend.capture_array
+        def capture_array():
+            self.lit_during_capture.append(self.is_on)
+            return original_capture()
+        backend.capture_array = capture_array
+
+def _session(*images):
+    return CameraSession(backend=FakeCameraBackend(frames=[TEST_IMAGES_DIR / name for name in images]))
+
+def test_monitor_analyzes_every_frame():
+    """Test that each captured frame is analyzed with the same result as analyze_image"""
+    camera = _session("test_image_1.jpg", "test_image_2.jpg")
+    expected = [analyze_image(frame) for frame in camera.backend.frames]
+    results = Monitor(camera, FakeLights(), settle_s=0).run(max_frames=4)
+    assert sorted(r.index for r in results) == [0, 1, 2, 3]
+    for result in results:
+        assert (result.count, result.category) == expected[result.index % 2]
+    assert camera.backend.start_count == 1
+
+def test_lights_only_on_during_capture():
+    """Test that the LEDs are lit for each exposure and off while frames are analyzed"""
+    camera = _session("test_image_1.jpg")
+    lights = TrackingLights(camera.backend)
+    lit_during_analysis = []
+    def analyze(frame):
+        lit_during_analysis.append(lights.is_on)
+        time.sleep(0.02)
+        return 0, "Low"
+    Monitor(camera, lights, analyze=analyze, settle_s=0, queue_size=1).run(max_frames=5)
+    assert lights.lit_during_capture == [True] * 5
+    assert lights.events == ["on", "off"] * 5
+    assert not lights.is_on
+
+def test_capture_overlaps_analysis():
+    """Test that the next frame is captured while the previous one is being analyzed"""
+    camera = _session("test_image_1.jpg")
+    analyzing = threading.Event()
+    captured_while_analyzing = []
+    original_capture = camera.backend.capture_array
+    def capture_array():
+        captured_while_analyzing.append(analyzing.is_set())
+        return original_capture()
+    camera.backend.capture_array = capture_array
+    def analyze(frame):
+        analyzing.set()
+        time.sleep(0.05)
+        analyzing.clear()
+        return 0, "Low"
+    Monitor(camera, FakeLights(), analyze=analyze, settle_s=0).run(max_frames=4)
+    assert any(captured_while_analyzing)
+
+def test_bounded_queue_applies_backpressure():
+    """Test that a slow analysis makes capture wait instead of buffering every frame"""
+    camera = _session("test_image_1.jpg")
+    def slow_analyze(frame):
+        time.sleep(0.03)
+        return 0, "Low"
+    monitor = Monitor(camera, FakeLights(), analyze=slow_analyze, settle_s=0, queue_size=1)
+    results = monitor.run(max_frames=6)
+    assert len(results) == 6
+    assert monitor.stats.backpressure_waits > 0
+    # Nothing is dropped: every captured frame is eventually analyzed
+    assert monitor.stats.captured == monitor.stats.analyzed == 6
+    assert monitor.stats.frames_per_minute > 0
+
+def test_monitor_keeps_running_after_bad_frame():
+    """Test that an analysis error is counted and the run continues"""
+    camera = _session("test_image_1.jpg")
+    calls = []
+    def flaky_analyze(frame):
+        calls.append(frame)
+        if len(calls) == 2:
+            raise ValueError("bad frame")
+        return 1, "Low"
+    monitor = Monitor(camera, FakeLights(), analyze=flaky_analyze, settle_s=0)
+    results = monitor.run(max_frames=3)
+    assert len(results) == 2
+    assert monitor.stats.failed == 1
+
+def test_monitor_keeps_running_after_opencv_error():
+    """Test that an OpenCV error in analysis is counted like a bad frame and the run continues"""
+    camera = _session("test_image_1.jpg")
+    calls = []
+    def flaky_analyze(frame):
+        calls.append(frame)
+        if len(calls) == 2:
+            raise cv2.error("bad frame")
+        return 1, "Low"
+    monitor = Monitor(camera, FakeLights(), analyze=flaky_analyze, settle_s=0)
+    results = monitor.run(max_frames=3)
+    assert len(results) == 2
+    assert monitor.stats.failed == 1
+
+def test_monitor_invalid_arguments():
+    """Test that queue size and worker count must be positive"""
+    with pytest.raises(ValueError):
+        Monitor(_session("test_image_1.jpg"), FakeLights(), queue_size=0)
+    with pytest.raises(ValueError):
+        Monitor(_session("test_image_1.jpg"), FakeLights(), workers=0)
+
+def test_monitor_burst_stacks_under_one_illumination():
+    """Test that burst mode captures several frames per lit window and analyzes one stacked frame"""
+    camera = _session("test_image_1.jpg")
+    lights = TrackingLights(camera.backend)
+    results = Monitor(camera, lights, settle_s=0, burst=3).run(max_frames=2)
+    assert len(results) == 2
+    assert camera.backend.capture_count == 6
+    assert lights.lit_during_capture == [True] * 6
+    assert lights.events == ["on", "off"] * 2
@@ -0,0 +1,133 @@
+import pytest
+import cv2
+import numpy as np
+import os
+import threading
+from pathlib import Path
+from unittest.mock import patch
+
+project_root = Path(__file__).parent.parent
+
+import sys
+sys.path.insert(0, str(project_root))
+
+from software.analyze_microplastics import analyze_image, measure_image
+from software.overlays import (
+    OVERLAY_MAX_SIDE,
+    THUMBNAIL_MAX_SIDE,
+    OverlayRenderer,
+    draw_particles,
+    is_up_to_date,
+    output_paths,
+    pyramid_level,
+    regenerate,
+    render_overlay,
+    write_overlay,
+)
+
+TEST_IMAGES_DIR = project_root / "tests" / "test-images"
+IMAGE = TEST_IMAGES_DIR / "test_image_1.jpg"
+LARGE_IMAGE = TEST_IMAGES_DIR / "sample_20250616_233426.jpg"
+
+def test_pyramid_level_halves_until_small_enough():
+    """Test that pyramid levels halve the frame until it fits max_side"""
+    image = np.zeros((2464, 3280, 3), dtype=np.uint8)
+    level, factor = pyramid_level(image, OVERLAY_MAX_SIDE)
+    assert factor == 2 and level.shape == (1232, 1640, 3)
+    small, factor = pyramid_level(level, 4000)
+    assert small is level and factor == 1
+
+def test_overlay_and_thumbnail_sizes(tmp_path):
+    """Test that a full-resolution capture gets a downscaled overlay and a small thumbnail"""
+    image = cv2.imread(str(LARGE_IMAGE))
+    particles, category = measure_image(image)
+    overlay_path, thumbnail_path = write_overlay(image, particles, "sample", tmp_path, category)
+    overlay = cv2.imread(str(overlay_path))
+    thumbnail = cv2.imread(str(thumbnail_path))
+    assert max(overlay.shape[:2]) <= OVERLAY_MAX_SIDE
+    assert max(thumbnail.shape[:2]) == THUMBNAIL_MAX_SIDE
+    assert not list(tmp_path.glob("*.partial*"))
+
+def test_overlay_marks_particles_without_touching_frame():
+    """Test that markers are drawn on a copy at each particle's centroid"""
+    image = cv2.imread(str(IMAGE))
+    original = image.copy()
+    particles, category = measure_image(image)
+    assert len(particles) > 0
+    overlay = render_overlay(image, particles, category)
+    np.testing.assert_array_equal(image, original)
+    cx, cy = (int(round(v)) for v in (particles["cx"][0], particles["cy"][0]))
+    if cy > 40:  # clear of the text banner
+        np.testing.assert_array_equal(overlay[cy, cx], (255, 0, 0))
+
+def test_contours_drawn_from_label_image():
+    """Test that passing the label image outlines particles instead of drawing circles"""
+    image = cv2.imread(str(IMAGE))
+    trace = {}
+    analyze_image(image, trace=trace)
+    with_contours = draw_particles(image.copy(), trace["particles"], trace["components"])
+    with_circles = draw_particles(image.copy(), trace["particles"])
+    assert not np.array_equal(with_contours, with_circles)
+
+def test_submit_does_not_wait_for_rendering(tmp_path):
+    """Test that submit returns immediately and drops jobs when the queue is full"""
+    image = cv2.imread(str(IMAGE))
+    particles, category = measure_image(image)
+    release = threading.Event()
+
+    def slow_write(*args, **kwargs):
+        release.wait(5)
+
+    with patch("software.overlays.write_overlay", side_effect=slow_write):
+        renderer = OverlayRenderer(tmp_path, workers=1, queue_size=1)
+        accepted = [renderer.submit(image, particles, f"frame_{i}", category) for i in range(5)]
+        release.set()
+        renderer.close()
+    assert accepted[0] and not all(accepted)
+    assert renderer.stats.dropped == accepted.count(False)
+    assert renderer.stats.rendered == accepted.count(True)
+
+def test_renderer_writes_submitted_results(tmp_path):
+    """Test that queued results are written once the renderer is closed"""
+    image = cv2.imread(str(IMAGE))
+    particles, category = measure_image(image)
+    with OverlayRenderer(tmp_path, workers=2) as renderer:
+        for i in range(3):
+            renderer.submit(image, particles, f"frame_{i}", category)
+    for i in range(3):
+        assert all(path.exists() for path in output_paths(f"frame_{i}", tmp_path))
+    assert renderer.stats.rendered == 3 and renderer.stats.failed == 0
+
+def test_failed_render_is_counted(tmp_path):
+    """Test that a failing job is counted and doesn't stop the worker"""
+    image = cv2.imread(str(IMAGE))
+    particles, _ = measure_image(image)
+    with OverlayRenderer(tmp_path) as renderer:
+        renderer.submit(np.zeros((0, 0, 3), dtype=np.uint8), particles, "broken")
+        renderer.submit(image, particles, "good")
+    assert renderer.stats.failed == 1 and renderer.stats.rendered == 1
+
+def test_regenerate_skips_up_to_date_overlays(tmp_path):
+    """Test that batch regeneration only renders new or changed captures unless forced"""
+    images = sorted(TEST_IMAGES_DIR.glob("test_image_*.jpg"))[:3]
+    stats = regenerate(images, tmp_path, workers=2)
+    assert stats.rendered == 3 and stats.skipped == 0
+    assert all(is_up_to_date(path, tmp_path) for path in images)
+
+    stats = regenerate(images, tmp_path, workers=2)
+    assert stats.rendered == 0 and stats.skipped == 3
+
+    # An overlay older than its capture is stale
+    overlay_path, _ = output_paths(images[0].stem, tmp_path)
+    os.utime(overlay_path, (0, 0))
+    stats = regenerate(images, tmp_path, workers=2)
+    assert stats.rendered == 1 and stats.skipped == 2
+
+    assert regenerate(images, tmp_path, workers=2, force=True).rendered == 3
+
+def test_invalid_renderer_configuration():
+    """Test that workers and queue_size must be positive"""
+    with pytest.raises(ValueError):
+        OverlayRenderer(workers=0)
+    with pytest.raises(ValueError):
+        OverlayRenderer(queue_size=0)
@@ -0,0 +1,126 @@
+import pytest
+import cv2
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+
+import sys
+sys.path.insert(0, str(project_root))
+
+from software.analyze_microplastics import (
+    analyze_image,
+    blur_mask,
+    categorize,
+    clean_mask,
+    count_particles,
+    measure,
+    segment,
+    threshold_mask,
+    to_hsv,
+)
+from software import parameter_sweep
+from software.parameter_sweep import SWEEP_FIELDS, grid_size, sweep, sweep_image
+
+TEST_IMAGES_DIR = project_root / "tests" / "test-images"
+
+GRID = {
+    "blur_ksize": [3, 5],
+    "morph_ksize": [3, 5],
+    "min_area": [5, 10, 40],
+    "max_area": [500, 5000],
+    "low_thresh": [5, 10],
+    "high_thresh": [30, 100],
+}
+
+def _reference(image, blur_ksize, morph_ksize, min_area, max_area, low_thresh, high_thresh):
+    """One full pipeline run per combination, composed from the stage functions"""
+    hsv = to_hsv(image)
+    full_mask, _ = segment(hsv)
+    particles, _ = measure(clean_mask(threshold_mask(blur_mask(full_mask, blur_ksize)), morph_ksize))
+    count = len(count_particles(particles, min_area, max_area))
+    return count, categorize(count, low_thresh, high_thresh)
+
+def test_sweep_image_matches_per_combination_runs():
+    """Test that every swept combination matches running the pipeline for it alone"""
+    image = cv2.imread(str(TEST_IMAGES_DIR / "test_image_1.jpg"))
+    rows = sweep_image(image, GRID)
+    assert len(rows) == grid_size(GRID) == 2 * 2 * 6 * 4
+    for row in rows:
+        params = {name: row[name] for name in GRID}
+        assert (row["count"], row["category"]) == _reference(image, **params)
+
+def test_sweep_default_grid_matches_analyze_image():
+    """Test that the default grid reproduces analyze_image"""
+    image = cv2.imread(str(TEST_IMAGES_DIR / "test_image_4.jpg"))
+    (row,) = sweep_image(image, {})
+    assert (row["count"], row["category"]) == analyze_image(image)
+
+def test_sweep_skips_invalid_pairs():
+    """Test that min_area > max_area and high_thresh < low_thresh combinations are dropped"""
+    grid = {"min_area": [10, 600], "max_area": [500], "low_thresh": [10, 40], "high_thresh": [30]}
+    assert grid_size(grid) == 1
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_sweep_over_images(workers):
+    """Test that sweep yields a full table per image and reports unreadable images"""
+    paths = [str(TEST_IMAGES_DIR / "test_image_1.jpg"), str(TEST_IMAGES_DIR / "test_image_2.jpg"), "nonexistent_image.jpg"]
+    rows = list(sweep(paths, {"min_area": [5, 10]}, workers=workers))
+    assert len(rows) == 2 * 2 + 1
+    assert all(set(row) <= set(SWEEP_FIELDS) for row in rows)
+    errors = [row for row in rows if row["error"]]
+    assert [row["image_path"] for row in errors] == ["nonexistent_image.jpg"]
+
+def _record_start(image_path, grid):
+    """Stand-in for _sweep_one that leaves a marker file for every image it starts."""
+    Path(f"{image_path}.started").touch()
+    time.sleep(0.2)
+    return [{"image_path": str(image_path), "error": None}]
+
+class _RecordingPool(ProcessPoolExecutor):
+    """Process pool that keeps every future it hands out."""
+
+    futures = []
+
+    def submit(self, *args, **kwargs):
+        future = super().submit(*args, **kwargs)
+        self.futures.append(future)
+        return future
+
+def test_closing_sweep_early_cancels_queued_images(tmp_path, monkeypatch):
+    """Test that closing the generator early leaves the remaining images unstarted"""
+    monkeypatch.setattr(parameter_sweep, "_sweep_one", _record_start)
+    monkeypatch.setattr(parameter_sweep, "ProcessPoolExecutor", _RecordingPool)
+    monkeypatch.setattr(_RecordingPool, "futures", [])
+    paths = [str(tmp_path / f"image_{i}.jpg") for i in range(30)]
+
+    rows = sweep(paths, {"min_area": [5]}, workers=2)
+    next(rows)
+    rows.close()
+
+    # At most two images per worker were ever handed to the pool, and closing left
+    # none of them pending
+    assert len(_RecordingPool.futures) <= 4
+    assert all(future.done() for future in _RecordingPool.futures)
+    started = sorted(tmp_path.glob("*.started"))
+    assert 1 <= len(started) <= 4
+    time.sleep(0.5)
+    assert sorted(tmp_path.glob("*.started")) == started
+
+def test_sweep_reports_opencv_errors_per_image(monkeypatch):
+    """Test that an OpenCV error on one image becomes an error row instead of ending the sweep"""
+    def failing_sweep_image(image, grid):
+        raise cv2.error("bad image")
+    monkeypatch.setattr(parameter_sweep, "sweep_image", failing_sweep_image)
+    path = str(TEST_IMAGES_DIR / "test_image_1.jpg")
+    rows = list(sweep([path, path], {"min_area": [5]}, workers=1))
+    assert [row["image_path"] for row in rows] == [path, path]
+    assert all("bad image" in row["error"] for row in rows)
+
+def test_sweep_invalid_grid():
+    """Test that unknown parameters and even blur kernels are rejected"""
+    with pytest.raises(ValueError):
+        sweep_image(None, {"blur": [3]})
+    with pytest.raises(ValueError):
+        list(sweep([], {"blur_ksize": [4]}))
@@ -0,0 +1,87 @@
+import pytest
+import cv2
+import numpy as np
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+
+import sys
+sys.path.insert(0, str(project_root))
+
+from software.analyze_microplastics import analyze_image, measure_image
+from software.particles import (
+    PARTICLE_DTYPE,
+    SIZE_CLASSES,
+    categorize_counts,
+    filter_particles,
+    measure_hue,
+    measure_particles,
+    size_class_counts,
+)
+
+TEST_IMAGES_DIR = project_root / "tests" / "test-images"
+
+def _mask_with_blocks():
+    """Mask with a 2x2, a 10x10 and a 30x30 block"""
+    mask = np.zeros((100, 100), dtype=np.uint8)
+    mask[5:7, 5:7] = 255
+    mask[20:30, 40:50] = 255
+    mask[60:90, 10:40] = 255
+    return mask
+
+def test_measure_particles_table():
+    """Test that the table holds the contour area, centroid, box and size class of every particle"""
+    particles, components = measure_particles(_mask_with_blocks())
+    assert particles.dtype == PARTICLE_DTYPE
+    # cv2.contourArea of the outline through the outer pixel centers
+    assert particles["area"].tolist() == [1, 81, 841]
+    assert particles["left"].tolist() == [5, 40, 10]
+    assert particles["top"].tolist() == [5, 20, 60]
+    assert particles["width"].tolist() == [2, 10, 30]
+    assert particles["cx"][1] == pytest.approx(44.5)
+    assert particles["cy"][1] == pytest.approx(24.5)
+    assert [SIZE_CLASSES[c] for c in particles["size_class"]] == ["small", "medium", "large"]
+    assert np.isnan(particles["mean_hue"]).all()
+    assert components[25, 45] == particles["label"][1]
+
+def test_measure_particles_skips_particles_inside_rings():
+    """Test that only outer contours are particles and a ring's area includes its hole"""
+    mask = np.zeros((100, 100), dtype=np.uint8)
+    mask[10:90, 10:90] = 255
+    mask[20:80, 20:80] = 0
+    mask[45:55, 45:55] = 255
+    particles, components = measure_particles(mask)
+    assert particles["area"].tolist() == [79 * 79]
+    assert components[50, 50] not in particles["label"]
+
+def test_measure_hue_wraps_around_red():
+    """Test that a particle mixing hues 178 and 2 averages to red (0), not cyan (90)"""
+    mask = _mask_with_blocks()
+    hsv = np.zeros((100, 100, 3), dtype=np.uint8)
+    hsv[20:30, 40:45, 0] = 178
+    hsv[20:30, 45:50, 0] = 2
+    hsv[60:90, 10:40, 0] = 30
+    particles, components = measure_particles(mask)
+    measure_hue(particles, components, hsv)
+    assert min(particles["mean_hue"][1], 180 - particles["mean_hue"][1]) == pytest.approx(0, abs=1e-3)
+    assert particles["mean_hue"][2] == pytest.approx(30, abs=1e-3)
+
+def test_filter_particles_is_strict():
+    """Test that areas equal to min_area or max_area are excluded"""
+    particles, _ = measure_particles(_mask_with_blocks())
+    assert filter_particles(particles, 1, 841)["area"].tolist() == [81]
+    assert size_class_counts(filter_particles(particles, 0, 1000)) == {"small": 1, "medium": 1, "large": 1}
+
+def test_categorize_counts_vectorized():
+    """Test that categorization works on one count or an array of counts"""
+    assert categorize_counts(9, 10, 30) == "Low"
+    assert categorize_counts([0, 10, 29, 30], 10, 30).tolist() == ["Low", "Medium", "Medium", "High"]
+
+@pytest.mark.parametrize("test_image", ["test_image_1.jpg", "sample_20250617_225954.jpg"])
+def test_measure_image_matches_count(test_image):
+    """Test that the feature table has one row per counted particle"""
+    image = cv2.imread(str(TEST_IMAGES_DIR / test_image))
+    particles, category = measure_image(image)
+    assert (len(particles), category) == analyze_image(image)
+    assert ((particles["area"] > 10) & (particles["area"] < 5000)).all()
+    assert ((particles["mean_hue"] >= 0) & (particles["mean_hue"] < 180)).all()
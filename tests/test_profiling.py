@@ -0,0 +1,57 @@
+import pytest
+import numpy as np
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+
+import sys
+sys.path.insert(0, str(project_root))
+
+from software.analyze_microplastics import analyze_microplastics, profile_analysis
+from software.batch_analysis import analyze_batch, find_images
+from software.profiling import StageProfiler, aggregate_stages, format_stage_table
+
+TEST_IMAGES_DIR = project_root / "tests" / "test-images"
+
+PIPELINE_STAGES = ["decode", "hsv", "segment", "blur", "threshold", "morphology", "measure", "count"]
+
+def test_profile_analysis_records_every_stage():
+    """Test that a profiled run returns the normal result plus one timing per stage"""
+    image_path = TEST_IMAGES_DIR / "test_image_1.jpg"
+    profile = profile_analysis(image_path)
+    assert (profile.count, profile.category) == analyze_microplastics(image_path)
+    assert [stage.name for stage in profile.stages] == PIPELINE_STAGES
+    assert all(stage.elapsed_s >= 0 for stage in profile.stages)
+    assert profile.total_s == pytest.approx(sum(stage.elapsed_s for stage in profile.stages))
+
+def test_stage_profiler_tracks_peak_memory():
+    """Test that the profiler sees NumPy allocations made inside a stage"""
+    profiler = StageProfiler()
+    with profiler.stage("alloc"):
+        buffer = np.ones(1_000_000, dtype=np.uint8)
+    del buffer
+    assert profiler.stages[0].peak_bytes >= 1_000_000
+
+def test_stage_profiler_without_memory_tracking():
+    """Test that memory tracking can be turned off"""
+    profiler = StageProfiler(track_memory=False)
+    with profiler.stage("alloc"):
+        np.ones(1_000_000, dtype=np.uint8)
+    assert profiler.stages[0].peak_bytes == 0
+
+def test_aggregate_stages_percentiles():
+    """Test p50/p95 aggregation across runs"""
+    profiles = [{"stages": {"hsv": {"elapsed_s": t, "peak_bytes": 10}}} for t in [0.1, 0.2, 0.3, 0.4, 1.0]]
+    summary = aggregate_stages(profiles)
+    assert summary["hsv"]["runs"] == 5
+    assert summary["hsv"]["p50_s"] == pytest.approx(0.3)
+    assert summary["hsv"]["p50_s"] <= summary["hsv"]["p95_s"] <= 1.0
+    assert "hsv" in format_stage_table(summary)
+
+def test_batch_profile_rows_include_stages():
+    """Test that profiled batch rows carry per-stage timings that aggregate cleanly"""
+    paths = find_images(str(TEST_IMAGES_DIR), "test_image_[1-2].jpg")
+    rows = list(analyze_batch(paths, workers=1, profile=True))
+    summary = aggregate_stages(rows)
+    assert list(summary) == PIPELINE_STAGES
+    assert all(stats["runs"] == 2 for stats in summary.values())
@@ -0,0 +1,81 @@
+import pytest
+import cv2
+import numpy as np
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+
+import sys
+sys.path.insert(0, str(project_root))
+
+import software.pyramid_analysis as pyramid_analysis
+from software.analyze_microplastics import analyze_image, segment, to_hsv
+from software.pyramid_analysis import analyze_image_pyramid, candidate_mask, candidate_regions, compare_with_full
+
+TEST_IMAGES_DIR = project_root / "tests" / "test-images"
+
+def _sparse_image(seed=0, particles=25, shape=(1200, 1600)):
+    """Dark membrane with a few orange particles of various sizes"""
+    rng = np.random.default_rng(seed)
+    image = rng.integers(0, 30, (*shape, 3), dtype=np.uint8)
+    for _ in range(particles):
+        center = (int(rng.integers(0, shape[1])), int(rng.integers(0, shape[0])))
+        cv2.circle(image, center, int(rng.integers(1, 12)), (0, int(rng.integers(60, 200)), 255), thickness=-1)
+    return image
+
+@pytest.mark.parametrize("test_image", ["test_image_1.jpg", "test_image_3.jpg", "test_image_9.jpg", "sample_20250616_235741.jpg"])
+@pytest.mark.parametrize("scale", [1, 3, 8])
+def test_pyramid_count_matches_full_resolution(test_image, scale):
+    """Test that coarse-to-fine analysis gives exactly the full-resolution count"""
+    image = cv2.imread(str(TEST_IMAGES_DIR / test_image))
+    for kwargs in [{}, {"min_area": 1, "max_area": 100000}]:
+        result = analyze_image_pyramid(image, scale=scale, max_roi_fraction=1.0, **kwargs)
+        assert result == analyze_image(image, **kwargs)
+
+def test_pyramid_processes_little_of_a_sparse_frame():
+    """Test that on a sparse sample only a small part of the frame is analyzed at full resolution"""
+    image = _sparse_image()
+    _, boxes, fraction = candidate_regions(image, scale=8)
+    assert fraction < 0.05
+    assert 0 < len(boxes) <= 25
+    assert analyze_image_pyramid(image, scale=8) == analyze_image(image)
+    # Particles touching the frame edges and frame sizes that aren't a multiple of the scale
+    cropped = image[5:1003, 7:1450]
+    assert analyze_image_pyramid(cropped, scale=8, min_area=1) == analyze_image(cropped, min_area=1)
+
+def test_candidate_mask_covers_every_mask_pixel():
+    """Test that no color-mask pixel falls outside a candidate block"""
+    scale = 4
+    for image in [_sparse_image(seed=1), cv2.imread(str(TEST_IMAGES_DIR / "test_image_4.jpg"))]:
+        full_mask, _ = segment(to_hsv(image))
+        coarse = candidate_mask(image, scale)
+        expanded = np.repeat(np.repeat(coarse > 0, scale, axis=0), scale, axis=1)[:image.shape[0], :image.shape[1]]
+        assert not np.any((full_mask > 0) & ~expanded)
+
+def test_dense_frames_fall_back_to_full_resolution(monkeypatch):
+    """Test that frames mostly covered by candidates are analyzed whole"""
+    image = cv2.imread(str(TEST_IMAGES_DIR / "test_image_2.jpg"))
+    calls = []
+    monkeypatch.setattr(pyramid_analysis, "analyze_image", lambda *args: calls.append(args) or (0, "Low"))
+    assert analyze_image_pyramid(image, scale=8) == (0, "Low")
+    assert len(calls) == 1
+
+def test_empty_frame_counts_nothing():
+    """Test that a frame without candidates is categorized without any full-resolution work"""
+    image = np.full((64, 64, 3), 10, dtype=np.uint8)
+    assert candidate_regions(image)[1].shape == (0, 4)
+    assert analyze_image_pyramid(image) == (0, "Low")
+
+def test_compare_with_full_reports_tolerance():
+    """Test the tolerance check against the full-resolution path"""
+    result = compare_with_full(_sparse_image(seed=2), tolerance=0.0, scale=8)
+    assert result["pyramid_count"] == result["full_count"]
+    assert result["relative_error"] == 0
+    assert result["within_tolerance"]
+    assert result["roi_fraction"] < 0.05
+
+def test_pyramid_rejects_invalid_scale():
+    """Test that the downscale factor must be positive"""
+    image = cv2.imread(str(TEST_IMAGES_DIR / "test_image_5.jpg"))
+    with pytest.raises(ValueError):
+        analyze_image_pyramid(image, scale=0)
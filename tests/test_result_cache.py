@@ -0,0 +1,109 @@
+import pytest
+import io
+import os
+import shutil
+import time
+import numpy as np
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+
+import sys
+sys.path.insert(0, str(project_root))
+
+import software.result_cache as result_cache
+from software.analyze_microplastics import analyze_microplastics
+from software.particles import PARTICLE_DTYPE
+from software.result_cache import ResultCache, cache_key, content_digest
+
+TEST_IMAGES_DIR = project_root / "tests" / "test-images"
+
+@pytest.fixture
+def image_copy(tmp_path):
+    path = tmp_path / "capture.jpg"
+    shutil.copy(TEST_IMAGES_DIR / "test_image_1.jpg", path)
+    return path
+
+@pytest.fixture
+def measure_calls(monkeypatch):
+    """Count how often the pixel pipeline actually runs"""
+    calls = []
+    original = result_cache.measure_image
+    def counting_measure_image(*args, **kwargs):
+        calls.append(args)
+        return original(*args, **kwargs)
+    monkeypatch.setattr(result_cache, "measure_image", counting_measure_image)
+    return calls
+
+def test_cached_result_matches_uncached(tmp_path, image_copy, measure_calls):
+    """Test that a hit returns the same result as a fresh analysis without reprocessing"""
+    cache = ResultCache(tmp_path / "cache")
+    expected = analyze_microplastics(image_copy)
+    assert analyze_microplastics(image_copy, cache=cache) == expected
+    assert analyze_microplastics(image_copy, cache=cache) == expected
+    assert len(measure_calls) == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_threshold_change_reuses_measurements(tmp_path, image_copy, measure_calls):
+    """Test that changing only the category thresholds is served from the cache"""
+    cache = ResultCache(tmp_path / "cache")
+    count, _ = cache.analyze(image_copy)
+    assert cache.analyze(image_copy, low_thresh=0, high_thresh=count + 1) == (count, "Medium")
+    assert cache.analyze(image_copy, low_thresh=count + 1, high_thresh=count + 2) == (count, "Low")
+    assert len(measure_calls) == 1
+
+def test_area_or_content_change_misses(tmp_path, image_copy, measure_calls):
+    """Test that new area limits or new image bytes are reprocessed"""
+    cache = ResultCache(tmp_path / "cache")
+    cache.analyze(image_copy)
+    cache.analyze(image_copy, min_area=20)
+    shutil.copy(TEST_IMAGES_DIR / "test_image_2.jpg", image_copy)
+    cache.analyze(image_copy)
+    assert len(measure_calls) == 3
+
+def test_pipeline_version_change_invalidates(tmp_path, image_copy, measure_calls, monkeypatch):
+    """Test that entries from another pipeline version are dropped"""
+    ResultCache(tmp_path / "cache").analyze(image_copy)
+    monkeypatch.setattr(result_cache, "PIPELINE_VERSION", 999)
+    cache = ResultCache(tmp_path / "cache")
+    cache.analyze(image_copy)
+    assert len(measure_calls) == 2
+    assert [p.name for p in (tmp_path / "cache").iterdir()] == ["v999"]
+
+def test_cleanup_spares_unrelated_directories(tmp_path, monkeypatch):
+    """Test that opening a cache only removes version directories the cache created"""
+    for name in ("venv", "videos", "v7", "v1_backup"):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / "keep.txt").write_text("keep")
+    ResultCache(tmp_path)
+    monkeypatch.setattr(result_cache, "PIPELINE_VERSION", 999)
+    ResultCache(tmp_path)
+    names = sorted(p.name for p in tmp_path.iterdir())
+    assert names == ["v1_backup", "v7", "v999", "venv", "videos"]
+    assert all((tmp_path / name / "keep.txt").exists() for name in ("venv", "videos", "v7", "v1_backup"))
+
+def test_lru_eviction_bounds_size(tmp_path):
+    """Test that the least recently used entries are evicted beyond max_bytes"""
+    table = np.zeros(100, dtype=PARTICLE_DTYPE)
+    buffer = io.BytesIO()
+    np.save(buffer, table)
+    entry_bytes = buffer.tell()
+
+    cache = ResultCache(tmp_path / "cache", max_bytes=2 * entry_bytes)
+    cache.put("a", table)
+    cache.put("b", table)
+    # Age both entries, then read "a" so "b" becomes the least recently used
+    for key in ["a", "b"]:
+        os.utime(cache._path(key), (time.time() - 100, time.time() - 100))
+    assert cache.get("a") is not None
+    cache.put("c", table)
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.size_bytes() <= 2 * entry_bytes
+
+def test_cache_key_depends_on_color_ranges():
+    """Test that different color ranges give different keys"""
+    digest = content_digest(b"image")
+    ranges = {"red": [(0, 50, 50), (22, 255, 255)]}
+    assert cache_key(digest, 10, 5000) != cache_key(digest, 10, 5000, ranges)
+    assert cache_key(digest, 10, 5000) == cache_key(digest, 10, 5000)
@@ -0,0 +1,165 @@
+import sqlite3
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pytest
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from software.analyze_microplastics import PIPELINE_VERSION, measure_image
+from software.particles import PARTICLE_DTYPE
+from software.results_store import ResultsStore, timestamp_from_path
+
+TEST_IMAGES_DIR = project_root / "tests" / "test-images"
+
+T0 = datetime(2025, 6, 1).timestamp()
+
+
+def _particles(areas):
+    particles = np.zeros(len(areas), dtype=PARTICLE_DTYPE)
+    particles["area"] = areas
+    particles["cx"] = np.arange(len(areas))
+    particles["mean_hue"] = 20.0
+    particles["size_class"] = np.digitize(areas, (50, 500))
+    return particles
+
+
+def test_store_uses_wal_mode(tmp_path):
+    """Test that the database is opened in write-ahead-log mode with the schema in place"""
+    with ResultsStore(tmp_path / "results.db") as store:
+        assert store._connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        indexes = {row[0] for row in store._connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {"samples_captured_at", "samples_device_time", "samples_category_time", "particles_sample"} <= indexes
+
+
+def test_rows_are_committed_in_batches(tmp_path):
+    """Test that rows become visible to other connections once a batch fills up or is flushed"""
+    path = tmp_path / "results.db"
+    store = ResultsStore(path, batch_size=3)
+    reader = sqlite3.connect(path)
+
+    def committed():
+        return reader.execute("SELECT COUNT(*) FROM samples").fetchone()[0]
+
+    store.add_result(1, "Low", captured_at=T0)
+    store.add_result(2, "Low", captured_at=T0 + 1)
+    assert committed() == 0
+    store.add_result(3, "Low", captured_at=T0 + 2)
+    assert committed() == 3
+    store.add_result(4, "Low", captured_at=T0 + 3)
+    store.close()
+    assert committed() == 4
+    reader.close()
+
+
+def test_pending_rows_are_committed_after_max_delay(tmp_path):
+    """Test that a second connection sees rows once the oldest pending one is max_delay_s old"""
+    path = tmp_path / "results.db"
+    store = ResultsStore(path, batch_size=100, max_delay_s=0.2)
+    reader = sqlite3.connect(path)
+
+    def committed():
+        return reader.execute("SELECT COUNT(*) FROM samples").fetchone()[0]
+
+    store.add_result(1, "Low", captured_at=T0)
+    store.add_result(2, "Low", captured_at=T0 + 1)
+    assert committed() == 0
+    time.sleep(0.25)
+    store.add_result(3, "Low", captured_at=T0 + 2)
+    assert committed() == 3
+    # The write transaction is closed, so another connection can write
+    reader.execute("INSERT INTO samples (captured_at, device, count, category, pipeline_version) VALUES (0, 'other', 0, 'Low', 1)")
+    reader.commit()
+    store.close()
+    reader.close()
+
+
+def test_single_sample_batches_are_visible_immediately(tmp_path):
+    """Test that with batch_size=1, as the monitor uses, every result is committed when added"""
+    path = tmp_path / "results.db"
+    reader = sqlite3.connect(path)
+    with ResultsStore(path, batch_size=1) as store:
+        for i in range(3):
+            store.add_result(i, "Low", captured_at=T0 + i)
+            assert reader.execute("SELECT COUNT(*) FROM samples").fetchone()[0] == i + 1
+    reader.close()
+
+
+def test_query_samples_filters_time_range_device_and_category(tmp_path):
+    """Test that query_samples returns the samples in [start, end) matching the filters, in time order"""
+    with ResultsStore(tmp_path / "results.db", device="pi-1") as store:
+        for i, (count, category) in enumerate([(5, "Low"), (15, "Medium"), (40, "High"), (8, "Low")]):
+            store.add_result(count, category, captured_at=T0 + 60 * i, location="Lake")
+        store.add_result(50, "High", captured_at=T0 + 30, device="pi-2")
+
+        rows = store.query_samples(start=T0, end=T0 + 180)
+        assert [row["count"] for row in rows] == [5, 50, 15, 40]
+        assert rows[0]["location"] == "Lake"
+        assert rows[0]["pipeline_version"] == PIPELINE_VERSION
+
+        assert [row["count"] for row in store.query_samples(device="pi-1", category="Low")] == [5, 8]
+        assert [row["count"] for row in store.query_samples(newest_first=True, limit=2)] == [8, 40]
+        assert store.query_samples(start=datetime.fromtimestamp(T0 + 3600)) == []
+
+
+def test_aggregate_buckets_counts_and_categories(tmp_path):
+    """Test that aggregate summarizes samples per time bucket"""
+    with ResultsStore(tmp_path / "results.db") as store:
+        for hour, counts in enumerate([[5, 15], [40]]):
+            for i, count in enumerate(counts):
+                category = "Low" if count < 10 else "Medium" if count < 30 else "High"
+                store.add_result(count, category, captured_at=T0 + 3600 * hour + i)
+
+        buckets = store.aggregate(bucket_s=3600)
+        assert [b["bucket_start"] for b in buckets] == [T0, T0 + 3600]
+        assert buckets[0]["samples"] == 2
+        assert buckets[0]["mean_count"] == 10
+        assert buckets[0]["max_count"] == 15
+        assert (buckets[0]["low"], buckets[0]["medium"], buckets[0]["high"]) == (1, 1, 0)
+        assert (buckets[1]["low"], buckets[1]["medium"], buckets[1]["high"]) == (0, 0, 1)
+
+        with pytest.raises(ValueError):
+            store.aggregate(bucket_s=0)
+
+
+def test_particle_tables_round_trip(tmp_path):
+    """Test that per-particle tables are stored and summarized per time range"""
+    with ResultsStore(tmp_path / "results.db", batch_size=2) as store:
+        first = store.add_result(3, "Low", captured_at=T0, particles=_particles([20, 100, 1000]))
+        store.add_result(0, "Low", captured_at=T0 + 10)
+        store.add_result(1, "Low", captured_at=T0 + 7200, particles=_particles([30]))
+
+        stored = store.particles_for(first)
+        assert stored.dtype == PARTICLE_DTYPE
+        np.testing.assert_array_equal(stored["area"], [20, 100, 1000])
+        np.testing.assert_array_equal(stored["size_class"], [0, 1, 2])
+
+        summary = store.particle_summary(start=T0, end=T0 + 3600)
+        assert summary["particles"] == 3
+        assert summary["mean_area"] == pytest.approx(1120 / 3)
+        assert summary["size_classes"] == {"small": 1, "medium": 1, "large": 1}
+        assert store.particle_summary()["particles"] == 4
+
+
+def test_store_measured_image(tmp_path):
+    """Test storing the particle table of a real sample image"""
+    image = cv2.imread(str(TEST_IMAGES_DIR / "sample_20250616_233426.jpg"))
+    particles, category = measure_image(image, 10, 5000, 10, 30)
+    with ResultsStore(tmp_path / "results.db") as store:
+        sample_id = store.add_result(len(particles), category, particles=particles)
+        stored = store.particles_for(sample_id)
+    np.testing.assert_array_equal(stored["area"], particles["area"])
+    np.testing.assert_allclose(stored["cx"], particles["cx"])
+
+
+def test_timestamp_from_path(tmp_path):
+    """Test that capture times are read from sample file names, falling back to the file time"""
+    assert timestamp_from_path("captures/sample_20250613_115104.jpg") == datetime(2025, 6, 13, 11, 51, 4).timestamp()
+    other = tmp_path / "frame.jpg"
+    other.write_bytes(b"")
+    assert timestamp_from_path(other) == other.stat().st_mtime
@@ -0,0 +1,58 @@
+import pytest
+import cv2
+import numpy as np
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+
+import sys
+sys.path.insert(0, str(project_root))
+
+from software.analyze_microplastics import COLOR_RANGES
+from software.segmentation import color_lut, segment_hsv, range_mask
+
+TEST_IMAGES_DIR = project_root / "tests" / "test-images"
+
+def _in_range_masks(hsv, color_ranges):
+    """Reference implementation: one cv2.inRange per color range"""
+    return {name: cv2.inRange(hsv, np.array(lower), np.array(upper)) for name, (lower, upper) in color_ranges.items()}
+
+@pytest.mark.parametrize("test_image", ["test_image_1.jpg", "test_image_4.jpg", "sample_20250617_225954.jpg"])
+def test_segment_hsv_matches_in_range(test_image):
+    """Test that the LUT mask equals OR-ing cv2.inRange over every range"""
+    hsv = cv2.cvtColor(cv2.imread(str(TEST_IMAGES_DIR / test_image)), cv2.COLOR_BGR2HSV)
+    masks = _in_range_masks(hsv, COLOR_RANGES)
+    expected = np.zeros_like(hsv[:, :, 0])
+    for mask in masks.values():
+        expected = cv2.bitwise_or(expected, mask)
+
+    full_mask, labels = segment_hsv(hsv, COLOR_RANGES)
+    assert np.array_equal(full_mask, expected)
+    assert np.array_equal(range_mask(labels, COLOR_RANGES, "orange", "yellow"),
+                          cv2.bitwise_or(masks["orange"], masks["yellow"]))
+
+def test_segment_hsv_overlapping_ranges():
+    """Test that per-range labels are correct when ranges overlap and use different S/V bounds"""
+    ranges = {"a": [(0, 0, 0), (20, 255, 255)], "b": [(10, 100, 100), (30, 200, 200)]}
+    hsv = np.random.default_rng(0).integers(0, 256, (64, 64, 3), dtype=np.uint8)
+    hsv[:, :, 0] %= 180
+    masks = _in_range_masks(hsv, ranges)
+    _, labels = segment_hsv(hsv, ranges)
+    assert np.array_equal(range_mask(labels, ranges, "a"), masks["a"])
+    assert np.array_equal(range_mask(labels, ranges, "b"), masks["b"])
+
+def test_color_lut_is_cached():
+    """Test that the lookup tables are built once per configuration"""
+    assert color_lut(COLOR_RANGES) is color_lut(dict(COLOR_RANGES))
+
+def test_color_lut_too_many_ranges():
+    """Test that more ranges than label bits are rejected"""
+    ranges = {str(i): [(i, 0, 0), (i, 255, 255)] for i in range(9)}
+    with pytest.raises(ValueError):
+        color_lut(ranges)
+
+def test_range_mask_unknown_name():
+    """Test that asking for an unconfigured range raises KeyError"""
+    _, labels = segment_hsv(np.zeros((4, 4, 3), dtype=np.uint8), COLOR_RANGES)
+    with pytest.raises(KeyError):
+        range_mask(labels, COLOR_RANGES, "green")
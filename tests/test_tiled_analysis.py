@@ -0,0 +1,67 @@
+import pytest
+import cv2
+import numpy as np
+import tracemalloc
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+
+import sys
+sys.path.insert(0, str(project_root))
+
+from software.analyze_microplastics import analyze_image
+from software.tiled_analysis import analyze_image_tiled, otsu_threshold
+
+TEST_IMAGES_DIR = project_root / "tests" / "test-images"
+
+@pytest.mark.parametrize("test_image", ["test_image_1.jpg", "test_image_4.jpg", "sample_20250617_225954.jpg"])
+@pytest.mark.parametrize("tile_rows", [1, 37, 256])
+def test_tiled_count_matches_whole_image(test_image, tile_rows):
+    """Test that strip processing gives exactly the whole-frame count, whatever the strip size"""
+    image = cv2.imread(str(TEST_IMAGES_DIR / test_image))
+    for kwargs in [{}, {"min_area": 1, "max_area": 100000}]:
+        assert analyze_image_tiled(image, tile_rows=tile_rows, **kwargs) == analyze_image(image, **kwargs)
+
+def test_tiled_counts_particles_spanning_seams_once():
+    """Test that particles taller than a strip are counted once, and particles inside rings not at all"""
+    image = np.zeros((120, 120, 3), dtype=np.uint8)
+    orange = (0, 128, 255)
+    cv2.circle(image, (60, 60), 45, orange, thickness=6)
+    cv2.circle(image, (60, 60), 6, orange, thickness=-1)
+    cv2.rectangle(image, (5, 5), (9, 115), orange, thickness=-1)
+
+    expected = analyze_image(image, max_area=100000)
+    assert expected[0] == 2  # the ring and the rectangle, not the dot inside the ring
+    for tile_rows in [5, 16, 40]:
+        assert analyze_image_tiled(image, max_area=100000, tile_rows=tile_rows) == expected
+        # Once the ring is too big to count it is dropped across every seam it crosses
+        assert analyze_image_tiled(image, max_area=600, tile_rows=tile_rows) == analyze_image(image, max_area=600)
+
+def test_otsu_threshold_matches_opencv():
+    """Test that the histogram Otsu picks the same threshold as cv2.threshold"""
+    rng = np.random.default_rng(0)
+    for _ in range(20):
+        image = rng.normal(rng.integers(0, 256), rng.integers(1, 80), (50, 50)).clip(0, 255).astype(np.uint8)
+        expected, _ = cv2.threshold(image, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        hist = np.bincount(image.ravel(), minlength=256)
+        assert otsu_threshold(hist) == int(expected)
+
+def test_tiled_bounds_memory():
+    """Test that peak memory follows the strip size rather than the frame size"""
+    image = cv2.imread(str(TEST_IMAGES_DIR / "sample_20250617_225954.jpg"))
+
+    def peak(analyze):
+        tracemalloc.start()
+        try:
+            analyze(image)
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    assert peak(lambda img: analyze_image_tiled(img, tile_rows=64)) < peak(analyze_image) / 2
+
+def test_tiled_invalid_tile_rows():
+    """Test that strips need at least one row"""
+    image = np.zeros((10, 10, 3), dtype=np.uint8)
+    with pytest.raises(ValueError):
+        analyze_image_tiled(image, tile_rows=0)